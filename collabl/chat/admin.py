@@ -1,5 +1,5 @@
 # Register your models here.
-from chat.models import Message
+from chat.models import Message, MessageArchive
 from django.contrib import admin
 
 
@@ -36,3 +36,27 @@ class MessageAdmin(admin.ModelAdmin):
         "updated_at",
         "deleted_at",
     )
+
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(admin.ModelAdmin):
+    ordering = ("-month",)
+
+    list_display = (
+        "month",
+        "group",
+        "collaboration",
+        "message_count",
+    )
+
+    list_filter = ("month",)
+
+    readonly_fields = (
+        "group",
+        "collaboration",
+        "month",
+        "file",
+        "message_count",
+        "created_at",
+        "updated_at",
+    )
@@ -0,0 +1,148 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+
+from chat.models import Message, MessageArchive
+from chat.partitions import add_months, month_start
+
+"""
+Cold archival of old chat messages.
+
+Once a month of a chat is older than CHAT_ARCHIVE_AFTER_DAYS, its messages are moved out of the message table into
+an archive segment (see MessageArchive) - a gzip-compressed JSONL file in the default file storage. This keeps the
+message table, and its indexes, down to the chat that is actually read. Reading older pages of a chat carries on into
+its segments (see chat.utils.get_message_page), decoding them as a stream, so no history is lost.
+
+Archiving is run nightly by the archive_old_messages Celery task.
+"""
+
+
+def encode_message(message) -> str:
+    """
+    Encodes a message as a line of an archive segment. Times are kept to the microsecond (unlike DjangoJSONEncoder),
+    so (created_at, id) cursors still find their place in the archive.
+    """
+    return json.dumps(
+        {
+            "id": str(message.id),
+            "created_at": message.created_at.isoformat(),
+            "updated_at": message.updated_at.isoformat(),
+            "user_id": str(message.user_id),
+            "message": message.message,
+            "version": message.version,
+        }
+    )
+
+
+def decode_message(line, archive) -> Message:
+    """Decodes a line of an archive segment back into an (unsaved) message, marked as archived"""
+    data = json.loads(line)
+    message = Message(
+        id=uuid.UUID(data["id"]),
+        created_at=datetime.fromisoformat(data["created_at"]),
+        updated_at=datetime.fromisoformat(data["updated_at"]),
+        user_id=uuid.UUID(data["user_id"]),
+        message=data["message"],
+        version=data["version"],
+        group_id=archive.group_id,
+        collaboration_id=archive.collaboration_id,
+    )
+    message.archived = True
+    return message
+
+
+def read_archive(archive):
+    """Streams the messages of an archive segment (newest first), decoding them as they are read"""
+    with archive.file.open("rb") as file, gzip.open(file, "rt") as lines:
+        for line in lines:
+            yield decode_message(line, archive)
+
+
+def archive_chat_month(group_id, collaboration_id, month) -> int:
+    """
+    Moves a month of a group or collaboration chat's messages into its archive segment (merging them into the
+    segment, if the month has been archived before), returning the number of messages moved. Deleted messages are
+    dropped, rather than archived.
+    """
+    chat = {"group_id": group_id, "collaboration_id": collaboration_id}
+    messages = Message.objects.filter(
+        **chat, created_at__gte=month, created_at__lt=add_months(month, 1)
+    )
+
+    with transaction.atomic():
+        # 1: Gather the month's messages (and any already archived), newest first
+        moving = list(messages.select_for_update().order_by("-created_at", "-id"))
+        archive = MessageArchive.objects.filter(**chat, month=month).first()
+        archived = list(read_archive(archive)) if archive else []
+        kept = sorted(
+            [message for message in moving if message.deleted_at is None] + archived,
+            key=lambda message: (message.created_at, message.pk),
+            reverse=True,
+        )
+
+        # 2: Write the segment, and drop the messages from the table
+        old_file = archive.file.name if archive else None
+        archive = archive or MessageArchive(**chat, month=month)
+        archive.message_count = len(kept)
+        archive.file.save(
+            f"{month:%Y-%m}.jsonl.gz",
+            ContentFile(
+                gzip.compress(
+                    "".join(f"{encode_message(message)}\n" for message in kept).encode()
+                )
+            ),
+            save=False,
+        )
+        archive.save()
+        messages.filter(pk__in=[message.pk for message in moving]).delete()
+
+        if old_file:
+            storage = archive.file.storage
+            transaction.on_commit(lambda: storage.delete(old_file))
+
+    return len(moving)
+
+
+def archive_messages_before(cutoff) -> int:
+    """
+    Archives every chat month which ended before the cutoff (see archive_chat_month), returning the number of messages
+    moved
+    """
+    chat_months = list(
+        Message.objects.filter(created_at__lt=month_start(cutoff))
+        .annotate(month=TruncMonth("created_at", tzinfo=timezone.utc))
+        .values_list("group_id", "collaboration_id", "month")
+        .order_by()
+        .distinct()
+    )
+    return sum(
+        archive_chat_month(group_id, collaboration_id, month)
+        for group_id, collaboration_id, month in chat_months
+    )
+
+
+def get_archived_messages(chat, before=None):
+    """
+    Streams a group or collaboration's archived messages (newest first), older than the given (created_at, id) if
+    given - only the segments which could hold them are opened
+    """
+    archives = chat.message_archives.order_by("-month")
+    if before:
+        archives = archives.filter(month__lte=before[0])
+
+    for archive in archives:
+        for message in read_archive(archive):
+            if before is None or (message.created_at, message.pk) < before:
+                yield message
+
+
+def get_newest_archived_month(chat):
+    """Gets the month of a group or collaboration's newest archive segment, or None if it has none"""
+    return (
+        chat.message_archives.order_by("-month").values_list("month", flat=True).first()
+    )
@@ -1,4 +1,4 @@
-"""MESSAGE TYPE """
+"""MESSAGE TYPE"""
 
 MESSAGE_TYPE_GROUP: str = "Group Message"
 MESSAGE_TYPE_COLLABORATION: str = "Collaboration Message"
@@ -7,3 +7,29 @@ MESSAGE_TYPES: tuple = (
     (MESSAGE_TYPE_GROUP, "Group Message"),
     (MESSAGE_TYPE_COLLABORATION, "Collaboration Message"),
 )
+
+"""CHAT PAGINATION"""
+
+# Number of messages rendered at a time - older messages are loaded a page at a time, as the user scrolls down
+CHAT_PAGE_SIZE: int = 25
+
+# Separates the created_at and id of the last message on a page, in the cursor for the next page
+CHAT_CURSOR_SEPARATOR: str = "~"
+
+# How often open chats poll for changes (see chat.utils.get_message_changes) - changes are pushed to them as they
+# happen (see collabl.events), so this is only a fallback, in case the event stream drops
+CHAT_POLL_SECONDS: int = 30
+
+"""CHAT PARTITIONS"""
+
+# The chat message table is partitioned by month (see chat.partitions) - partitions are made this many months ahead
+CHAT_PARTITION_MONTHS_AHEAD: int = 3
+
+# Chat pages are read a month at a time (newest first), each read touching a single partition. After this many
+# months, the rest of the page is read in one go, so quiet chats don't take a read per empty month.
+CHAT_PAGE_WINDOW_MONTHS: int = 3
+
+"""CHAT UNREAD COUNTS"""
+
+# How long a user's cached unread count for a chat is kept (see chat.unread) - after this, it is counted again
+CHAT_UNREAD_CACHE_SECONDS: int = 60 * 60 * 24 * 7
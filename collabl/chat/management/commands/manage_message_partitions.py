@@ -0,0 +1,83 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+import chat.constants as c
+from chat.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    create_partition,
+    detach_partition,
+    get_partition_name,
+    get_partitions,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    """
+    Looks after the monthly partitions of the chat message table (see chat.partitions) - creates the partitions for
+    the coming months (and for any messages which missed them), and detaches old months' partitions, so they can be
+    archived or dropped. Should be run at least monthly.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=c.CHAT_PARTITION_MONTHS_AHEAD,
+            help="Number of months ahead to create partitions for",
+        )
+        parser.add_argument(
+            "--detach-before",
+            help="Detach the partitions of months before this one (YYYY-MM)",
+        )
+
+    def success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def error(self, text):
+        self.stdout.write(self.style.ERROR(text))
+
+    def handle(self, *args, **options):
+
+        detach_before = None
+        if options["detach_before"]:
+            try:
+                detach_before = datetime.strptime(
+                    options["detach_before"], "%Y-%m"
+                ).replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                self.error("--detach-before should be a month, as YYYY-MM")
+                return
+            if detach_before > month_start(timezone.now()):
+                self.error("Only past months' partitions can be detached")
+                return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+
+            # 1: Create this month's partition, the coming months', and those of any months whose messages were
+            # caught by the default partition (which moves them into place)
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', created_at, 'UTC') FROM {DEFAULT_PARTITION}"
+            )
+            months = {month_start(month) for (month,) in cursor.fetchall()}
+            month = month_start(timezone.now())
+            for _ in range(options["ahead"] + 1):
+                months.add(month)
+                month = add_months(month, 1)
+
+            for month in sorted(months):
+                if create_partition(cursor, month):
+                    self.success(f"Created {get_partition_name(month)}")
+
+            # 2: Detach old months' partitions
+            if detach_before:
+                for name, month in get_partitions(cursor):
+                    if month < detach_before:
+                        detach_partition(cursor, name)
+                        self.success(f"Detached {name}")
+
+        self.success("Success - message partitions are up to date")
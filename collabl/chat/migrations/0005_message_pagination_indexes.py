@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={
+                "ordering": ["-created_at", "-id"],
+                "verbose_name_plural": "Chat Messages",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["group", "-created_at", "-id"],
+                name="chat_messag_group_i_7336f0_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["collaboration", "-created_at", "-id"],
+                name="chat_messag_collabo_1e2a0a_idx",
+            ),
+        ),
+    ]
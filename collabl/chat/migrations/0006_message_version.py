@@ -0,0 +1,35 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_message_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="The version of the chat (see Group/Collaboration.chat_version) when the message last changed",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["group", "version"], name="chat_messag_group_i_da5407_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["collaboration", "version"],
+                name="chat_messag_collabo_e61a95_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from search.operations import SearchVectorTrigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_message_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="The searchable text of the message (kept up to date by a database trigger - see search.operations)",
+                null=True,
+            ),
+        ),
+        # Fill in the vectors before building the indexes, so each index is built in one go
+        SearchVectorTrigger("chat_message", {"message": "A"}),
+        migrations.AddIndex(
+            model_name="message",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="chat_messag_search__9be221_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.3 on 2026-10-17 08:02
+
+from django.db import migrations
+
+from chat.partitions import partition_table, unpartition_table
+
+# Months ahead partitioned when the migration was written - see chat.constants.CHAT_PARTITION_MONTHS_AHEAD
+MONTHS_AHEAD = 3
+
+
+def partition_messages(apps, schema_editor):
+    """
+    Rebuilds the message table partitioned by month, on created_at (see chat.partitions) - the model itself is
+    unchanged
+    """
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(cursor, MONTHS_AHEAD)
+
+
+def unpartition_messages(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        unpartition_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0007_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_messages, unpartition_messages),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:46
+
+import collabl.storages
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groups", "0012_search_vector"),
+        ("collaborations", "0019_search_vector"),
+        ("chat", "0008_partition_messages"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageArchive",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Timestamp of when this object was first created.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Timestamp of when this object was last updated.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Timestamp of when (if) this object was soft deleted.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "month",
+                    models.DateTimeField(
+                        help_text="The start of the (UTC) month the messages were written in"
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        help_text="The messages, as gzip-compressed JSONL",
+                        max_length=300,
+                        upload_to=collabl.storages.chat_archive_upload_to,
+                    ),
+                ),
+                (
+                    "message_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="The number of messages in the segment"
+                    ),
+                ),
+                (
+                    "collaboration",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The collaboration whose chat the messages are from - blank if it is a group chat",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="message_archives",
+                        to="collaborations.collaboration",
+                    ),
+                ),
+                (
+                    "group",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The group whose chat the messages are from",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="message_archives",
+                        to="groups.group",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Chat Message Archives",
+                "ordering": ["-month"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="messagearchive",
+            constraint=models.UniqueConstraint(
+                fields=("group", "month"), name="unique_group_archive_month"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="messagearchive",
+            constraint=models.UniqueConstraint(
+                fields=("collaboration", "month"),
+                name="unique_collaboration_archive_month",
+            ),
+        ),
+    ]
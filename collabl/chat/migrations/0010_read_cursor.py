@@ -0,0 +1,78 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("chat", "0009_message_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReadCursor",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Timestamp of when this object was first created.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Timestamp of when this object was last updated.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "channel",
+                    models.CharField(
+                        help_text="The channel of the chat (e.g. group:<id>)",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "last_read_at",
+                    models.DateTimeField(
+                        help_text="When the user last read the chat - messages since are unread"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="User who read the chat",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="read_cursors",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Chat Read Cursors",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="readcursor",
+            constraint=models.UniqueConstraint(
+                fields=("user", "channel"), name="unique_user_channel_cursor"
+            ),
+        ),
+    ]
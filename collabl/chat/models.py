@@ -1,8 +1,17 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from chat.unread import count_message, restart_chat_total
+from collabl.events import EVENT_CHAT, collaboration_channel, group_channel, publish
+from collabl.storages import chat_archive_upload_to
+from groups.models import GroupStats
 from users.utils import get_sentinel_user
 
 # Create your models here.
-from collabl.base.models import TimeStampedSoftDeleteBase
+from collabl.base.models import TimeStampedBase, TimeStampedSoftDeleteBase
 
 
 class Message(TimeStampedSoftDeleteBase):
@@ -12,8 +21,14 @@ class Message(TimeStampedSoftDeleteBase):
     Group messages are saved with a group, collaboration messages are saved with a collaboration (only)
 
     There are not intended to be viewed together, but rather are filtered by either group or collaboration.
+
+    The table is partitioned by month, on created_at (see chat.partitions). Old messages are moved out of it
+    altogether, into archive segments (see MessageArchive).
     """
 
+    # Set on messages read back from an archive segment, which can no longer be edited
+    archived = False
+
     user = models.ForeignKey(
         "users.User",
         help_text="User who wrote the message",
@@ -41,13 +56,179 @@ class Message(TimeStampedSoftDeleteBase):
 
     message = models.TextField(help_text="The message itself")
 
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The version of the chat (see Group/Collaboration.chat_version) when the message last changed",
+    )
+
+    search_vector = SearchVectorField(
+        editable=False,
+        help_text="The searchable text of the message (kept up to date by a database trigger - see search.operations)",
+        null=True,
+    )
+
+    def get_chat(self):
+        """Returns a queryset of the group or collaboration whose chat the message belongs to"""
+        field = "group" if self.group_id else "collaboration"
+        return self._meta.get_field(field).related_model.objects.filter(
+            pk=getattr(self, f"{field}_id")
+        )
+
+    def get_channel(self) -> str:
+        """Returns the channel of the group or collaboration whose chat the message belongs to (see collabl.events)"""
+        return (
+            group_channel(self.group_id)
+            if self.group_id
+            else collaboration_channel(self.collaboration_id)
+        )
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Override save to stamp the message with the next version of its chat, so polling clients can ask for just the
+        messages which have changed since the version they last saw (see chat.utils.get_message_changes).
+        Bumping the version locks the chat's row until the transaction commits, so versions are committed in order.
+        Pages following the chat are then told to fetch the change (see collabl.events), and new messages are added to
+        the chat's unread counts (see chat.unread), and to their group's stats (see groups.models.GroupStats).
+        """
+        chat, channel, adding = self.get_chat(), self.get_channel(), self._state.adding
+        with transaction.atomic():
+            chat.update(chat_version=F("chat_version") + 1)
+            self.version = chat.values_list("chat_version", flat=True).get()
+            super(Message, self).save(*args, **kwargs)
+            publish(channel, EVENT_CHAT)
+            if adding:
+                transaction.on_commit(lambda: count_message(channel))
+                if self.group_id:
+                    GroupStats.add(self.group_id, message_count=1)
+        return
+
+    def remove(self) -> None:
+        """
+        Soft deletes the message, so that polling clients can be told it has gone (it is left out of the chat, and
+        its group's stats, from then on). The chat's running total is restarted, so unread counts are counted again
+        without it (see chat.unread.restart_chat_total).
+        """
+        with transaction.atomic():
+            removing = self.deleted_at is None
+            self.deleted_at = timezone.now()
+            self.save()
+            if removing:
+                channel = self.get_channel()
+                transaction.on_commit(lambda: restart_chat_total(channel))
+                if self.group_id:
+                    GroupStats.add(self.group_id, message_count=-1)
+
     def __str__(self):
         return f"{self.created_at:[ %d%b'%y %I:%M%p ]} {self.user}: '{self.message}'"
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
         verbose_name_plural = "Chat Messages"
 
         indexes = [
             models.Index(fields=["created_at"]),
+            # For paging through a chat (see chat.utils.get_message_page)
+            models.Index(fields=["group", "-created_at", "-id"]),
+            models.Index(fields=["collaboration", "-created_at", "-id"]),
+            # For finding what has changed since a version (see chat.utils.get_message_changes)
+            models.Index(fields=["group", "version"]),
+            models.Index(fields=["collaboration", "version"]),
+            # For searching messages (see search.utils.get_search_results)
+            GinIndex(fields=["search_vector"]),
+        ]
+
+
+class MessageArchive(TimeStampedSoftDeleteBase):
+    """
+    An archive segment - one month of a group or collaboration chat's old messages, moved out of the message table
+    into a gzip-compressed JSONL file (one message per line, newest first) in the default file storage.
+    Older chat pages carry on reading into the segments, so no history is lost (see chat.archive).
+    """
+
+    group = models.ForeignKey(
+        "groups.Group",
+        help_text="The group whose chat the messages are from",
+        on_delete=models.CASCADE,
+        related_name="message_archives",
+        blank=True,
+        null=True,
+    )
+
+    collaboration = models.ForeignKey(
+        "collaborations.Collaboration",
+        help_text="The collaboration whose chat the messages are from - blank if it is a group chat",
+        on_delete=models.CASCADE,
+        related_name="message_archives",
+        blank=True,
+        null=True,
+    )
+
+    month = models.DateTimeField(
+        help_text="The start of the (UTC) month the messages were written in"
+    )
+
+    file = models.FileField(
+        help_text="The messages, as gzip-compressed JSONL",
+        max_length=300,
+        upload_to=chat_archive_upload_to,
+    )
+
+    message_count = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of messages in the segment",
+    )
+
+    def __str__(self):
+        return (
+            f"{self.group or self.collaboration}'s chat archive for {self.month:%b %Y}"
+        )
+
+    class Meta:
+        ordering = ["-month"]
+        verbose_name_plural = "Chat Message Archives"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["group", "month"], name="unique_group_archive_month"
+            ),
+            models.UniqueConstraint(
+                fields=["collaboration", "month"],
+                name="unique_collaboration_archive_month",
+            ),
+        ]
+
+
+class ReadCursor(TimeStampedBase):
+    """
+    How far a user has read a group or collaboration chat (identified by its channel - see collabl.events). Messages
+    since last_read_at are unread (see chat.utils.get_unread_counts).
+    """
+
+    user = models.ForeignKey(
+        "users.User",
+        help_text="User who read the chat",
+        on_delete=models.CASCADE,
+        related_name="read_cursors",
+    )
+
+    channel = models.CharField(
+        help_text="The channel of the chat (e.g. group:<id>)",
+        max_length=100,
+    )
+
+    last_read_at = models.DateTimeField(
+        help_text="When the user last read the chat - messages since are unread"
+    )
+
+    def __str__(self):
+        return f"{self.user} read {self.channel} at {self.last_read_at}"
+
+    class Meta:
+        verbose_name_plural = "Chat Read Cursors"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "channel"], name="unique_user_channel_cursor"
+            ),
         ]
@@ -0,0 +1,174 @@
+from datetime import datetime, timezone
+
+"""
+Monthly range partitioning of the chat message table, on created_at.
+
+Each month's messages live in their own partition (e.g. chat_message_p2022_03), with anything outside them caught by
+a default partition. Chat pages are read a month at a time (see chat.utils.get_message_page), so Postgres prunes
+each read to a single partition - usually the newest. Old months can be detached, leaving a standalone table which
+can be archived, vacuumed or dropped without touching the rest of the chat.
+
+The table is partitioned by migration 0008, and partitions are made ahead of time (and detached) with
+    python manage.py manage_message_partitions
+
+The partition key has to be part of the primary key, so in the database it is (id, created_at) - ids are UUIDs,
+so id alone is still unique, and Django carries on treating it as the primary key.
+"""
+
+TABLE = "chat_message"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_PREFIX = f"{TABLE}_p"
+
+
+def month_start(moment) -> datetime:
+    """Gets the start of the (UTC) month a moment falls in"""
+    return moment.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def add_months(month, months) -> datetime:
+    """Moves the start of a month on (or back) by a number of months"""
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return month.replace(year=year, month=index + 1)
+
+
+def get_partition_name(month) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def get_partition_month(name) -> datetime:
+    """Gets the month a partition (see get_partition_name) holds, raising ValueError if it isn't a month's partition"""
+    return datetime.strptime(name.removeprefix(PARTITION_PREFIX), "%Y_%m").replace(
+        tzinfo=timezone.utc
+    )
+
+
+def get_partitions(cursor) -> list:
+    """Gets the (name, month) of each month's partition currently attached to the table, oldest first"""
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        """,
+        [TABLE],
+    )
+    return sorted(
+        (name, get_partition_month(name))
+        for (name,) in cursor.fetchall()
+        if name != DEFAULT_PARTITION
+    )
+
+
+def create_partition(cursor, month) -> bool:
+    """
+    Creates the partition for a month, if it doesn't exist yet (returning whether it was created). Any of the month's
+    messages which were caught by the default partition are moved into it. The partition is filled before it is
+    attached, and then takes on the table's indexes, foreign keys and triggers.
+    """
+    name = get_partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    bounds = [month, add_months(month, 1)]
+    cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        bounds,
+    )
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+    return True
+
+
+def detach_partition(cursor, name) -> None:
+    """Detaches a month's partition - it is left as a standalone table, which the chat no longer reads"""
+    cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+
+
+def get_table_definitions(cursor) -> list:
+    """Gets the SQL to recreate the table's indexes, foreign keys and triggers (everything but the primary key)"""
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+        [TABLE],
+    )
+    definitions = [definition for (definition,) in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [TABLE],
+    )
+    definitions += [
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}"
+        for name, definition in cursor.fetchall()
+    ]
+    cursor.execute(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+        [TABLE],
+    )
+    return definitions + [definition for (definition,) in cursor.fetchall()]
+
+
+def rebuild_table(cursor, partitioned, months=()) -> None:
+    """
+    Rebuilds the table as a partitioned table (with the given months' partitions, and a default partition) or as a
+    plain table, copying the messages across. The indexes, foreign keys and triggers are recreated (under the same
+    names) once the messages are in, so they are each built in one go.
+    """
+    new_table = f"{TABLE}_rebuilt"
+    definitions = get_table_definitions(cursor)
+
+    # 1: Create the new table, and its partitions
+    cursor.execute(
+        f"CREATE TABLE {new_table} (LIKE {TABLE} INCLUDING DEFAULTS)"
+        + (" PARTITION BY RANGE (created_at)" if partitioned else "")
+    )
+    if partitioned:
+        cursor.execute(
+            f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {new_table} DEFAULT"
+        )
+        for month in months:
+            cursor.execute(
+                f"CREATE TABLE {get_partition_name(month)} PARTITION OF {new_table} FOR VALUES FROM (%s) TO (%s)",
+                [month, add_months(month, 1)],
+            )
+
+    # 2: Copy the messages across, and swap the tables over (dropping a partitioned table drops its partitions)
+    cursor.execute(f"INSERT INTO {new_table} SELECT * FROM {TABLE}")
+    cursor.execute(f"DROP TABLE {TABLE}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {TABLE}")
+
+    # 3: Recreate the primary key, indexes, foreign keys and triggers
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY "
+        + ("(id, created_at)" if partitioned else "(id)")
+    )
+    for definition in definitions:
+        cursor.execute(definition)
+
+
+def partition_table(cursor, months_ahead) -> None:
+    """Partitions the (plain) table by month, with partitions from its oldest message's month to months_ahead"""
+    cursor.execute(f"SELECT min(created_at), now() FROM {TABLE}")
+    oldest, now = cursor.fetchone()
+    month, last = month_start(oldest or now), add_months(month_start(now), months_ahead)
+
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+
+    rebuild_table(cursor, partitioned=True, months=months)
+
+
+def unpartition_table(cursor) -> None:
+    """Turns the partitioned table back into a plain table (messages in detached partitions are left out)"""
+    rebuild_table(cursor, partitioned=False)
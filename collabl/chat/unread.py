@@ -0,0 +1,95 @@
+import uuid
+
+from django.core.cache import caches
+
+import chat.constants as c
+
+"""
+Cached unread counts for group and collaboration chats.
+
+Each user has a read cursor per chat (see ReadCursor), and their unread count is the number of messages since it -
+a range count on the chat's (chat, created_at) index (see chat.utils.get_unread_counts). So that lists of chats
+don't count every time, counts are cached in the "counters" cache (Redis, shared by every web node):
+    - each chat (by channel, see collabl.events) keeps a running total of its messages, incremented as they are
+      created, and restarted as they are removed
+    - each user's count is cached as the chat's total when it was counted (or read) less the count, so their count
+      is then the chat's total less that - it goes up as messages arrive, without anything being written per user
+A chat's total starts at zero whenever it is (re)started, under a new epoch, so counts cached against an old total
+are never mixed up with it - they are simply counted again. Removing a message can't just take one off the total, as
+only the users who hadn't read it yet should have one less unread.
+"""
+
+
+def get_total_key(channel) -> str:
+    return f"chat-unread:{channel}:total"
+
+
+def get_epoch_key(channel) -> str:
+    return f"chat-unread:{channel}:epoch"
+
+
+def get_seen_key(channel, user_id) -> str:
+    return f"chat-unread:{channel}:seen:{user_id}"
+
+
+def count_message(channel) -> None:
+    """Adds a newly created message to its chat's running total (if the chat has one)"""
+    try:
+        caches["counters"].incr(get_total_key(channel))
+    except ValueError:
+        pass
+
+
+def restart_chat_total(channel) -> None:
+    """Drops a chat's running total, so it is restarted under a new epoch, and everyone's unread count is recounted"""
+    caches["counters"].delete_many([get_total_key(channel), get_epoch_key(channel)])
+
+
+def get_cached_unread_counts(user_id, channels) -> tuple:
+    """
+    Reads a user's cached unread counts for the given chats (by channel), in a single cache read. Returns
+        unread - the counts which were cached, by channel
+        totals - the (epoch, total) of every chat, to cache newly counted counts against (see cache_unread_counts)
+    Chats without a running total are started on one.
+    """
+    keys = {
+        channel: (
+            get_total_key(channel),
+            get_epoch_key(channel),
+            get_seen_key(channel, user_id),
+        )
+        for channel in channels
+    }
+    cache = caches["counters"]
+    cached = cache.get_many([key for chat_keys in keys.values() for key in chat_keys])
+
+    unread, totals, started = {}, {}, {}
+    for channel, (total_key, epoch_key, seen_key) in keys.items():
+        total, epoch = cached.get(total_key), cached.get(epoch_key)
+        if total is None or epoch is None:
+            total, epoch = 0, uuid.uuid4().hex
+            started.update({total_key: total, epoch_key: epoch})
+
+        seen = cached.get(seen_key)
+        if seen and seen[0] == epoch:
+            unread[channel] = max(total - seen[1], 0)
+        totals[channel] = (epoch, total)
+
+    if started:
+        cache.set_many(started)
+
+    return unread, totals
+
+
+def cache_unread_counts(user_id, unread, totals) -> None:
+    """Caches a user's unread counts (by channel), against the chats' totals they were counted at"""
+    caches["counters"].set_many(
+        {
+            get_seen_key(channel, user_id): (
+                totals[channel][0],
+                totals[channel][1] - count,
+            )
+            for channel, count in unread.items()
+        },
+        timeout=c.CHAT_UNREAD_CACHE_SECONDS,
+    )
@@ -1,5 +1,20 @@
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from django.utils import timezone
+
+import chat.constants as c
+from chat.archive import get_archived_messages, get_newest_archived_month
+from chat.models import Message, ReadCursor
+from chat.partitions import add_months, month_start
+from chat.unread import cache_unread_counts, get_cached_unread_counts
+from collabl.events import collaboration_channel, group_channel
 from groups.constants import MEMBERSHIP_STATUS_ADMIN
 from groups.utils import get_membership_level
+from users.utils import get_sentinel_user
 
 
 def user_is_message_owner(user, message):
@@ -28,3 +43,208 @@ def user_is_message_owner_or_admin(user, message):
             get_membership_level(user, get_message_group(message))
             == MEMBERSHIP_STATUS_ADMIN
         )
+
+
+def get_message_cursor(message) -> str:
+    """Gets the (created_at, id) cursor of a message, as used by get_message_page and get_message_changes"""
+    return f"{message.created_at.isoformat()}{c.CHAT_CURSOR_SEPARATOR}{message.pk}"
+
+
+def parse_message_cursor(cursor) -> tuple:
+    """Splits a cursor (see get_message_cursor) into its created_at and id, raising ValueError if it isn't valid"""
+    created_at, pk = cursor.rsplit(c.CHAT_CURSOR_SEPARATOR, 1)
+    return datetime.fromisoformat(created_at), uuid.UUID(pk)
+
+
+def get_chat_version(chat) -> int:
+    """Reads the current version of a group or collaboration chat from the database"""
+    return (
+        type(chat)
+        .objects.filter(pk=chat.pk)
+        .values_list("chat_version", flat=True)
+        .get()
+    )
+
+
+def get_message_page(chat, before=None) -> dict:
+    """
+    Gets a page of a group or collaboration's chat messages (newest first), for the chat templates, as
+        chat_messages - the messages on the page (with their users)
+        next_cursor - the cursor for the next (older) page, or None if this is the last one
+    and, for the first page, what polling clients need to ask for changes (see get_message_changes)
+        chat_version - the version of the chat the page was read at
+        newest_cursor - the cursor of the newest message
+
+    Pages are found by (created_at, id) cursor, rather than by offset, so each page is a range scan of the
+    (group/collaboration, created_at, id) indexes, however far back it is. They are read a month at a time, so each
+    read is pruned to one of the table's monthly partitions (see chat.partitions) - a page of a busy chat only ever
+    touches the month it starts in. Once the page reaches the chat's archived months (see chat.archive), it carries on
+    into their archive segments, decoding only as many messages as the page needs. Raises ValueError if the cursor
+    given as before isn't valid.
+    """
+    messages = (
+        chat.chat_messages.filter(deleted_at__isnull=True)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+
+    context = {}
+    if before:
+        created_at, pk = parse_message_cursor(before)
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    else:
+        created_at, pk = timezone.now(), None
+        # Read before the messages, so anything committed in between is picked up by the next poll
+        context["chat_version"] = get_chat_version(chat)
+
+    # Read back a month at a time (newest first) until the page is full - messages can't be older than their chat, so
+    # its first month is as far back as this goes. The newest month is left open-ended, in case of clock skew, and
+    # after CHAT_PAGE_WINDOW_MONTHS months the rest of the chat is read in one go, so quiet chats aren't read month
+    # by empty month. Archived months are no longer in the table, so aren't read from it.
+    first_month = month_start(chat.created_at)
+    newest_archived_month = get_newest_archived_month(chat)
+    if newest_archived_month:
+        first_month = max(first_month, add_months(newest_archived_month, 1))
+    page, month, end = [], month_start(created_at), None
+    for window in range(c.CHAT_PAGE_WINDOW_MONTHS + 1):
+        if month < first_month or len(page) > c.CHAT_PAGE_SIZE:
+            break
+        if window == c.CHAT_PAGE_WINDOW_MONTHS:
+            month = first_month
+        in_window = messages.filter(created_at__gte=month)
+        if end:
+            in_window = in_window.filter(created_at__lt=end)
+        page += in_window[: c.CHAT_PAGE_SIZE + 1 - len(page)]
+        month, end = add_months(month, -1), month
+
+    # Carry on into the archive segments, if the page still isn't full
+    if newest_archived_month and len(page) <= c.CHAT_PAGE_SIZE:
+        archived = list(
+            islice(
+                get_archived_messages(chat, before=(created_at, pk) if pk else None),
+                c.CHAT_PAGE_SIZE + 1 - len(page),
+            )
+        )
+        users = get_user_model().objects.in_bulk(
+            {message.user_id for message in archived}
+        )
+        for message in archived:
+            message.user = users.get(message.user_id) or get_sentinel_user()
+        page += archived
+
+    next_cursor = None
+    if len(page) > c.CHAT_PAGE_SIZE:
+        page = page[: c.CHAT_PAGE_SIZE]
+        next_cursor = get_message_cursor(page[-1])
+
+    if not before:
+        context["newest_cursor"] = get_message_cursor(page[0]) if page else ""
+
+    return {"chat_messages": page, "next_cursor": next_cursor, **context}
+
+
+def get_message_changes(chat, since, after) -> dict | None:
+    """
+    Gets the changes to a group or collaboration's chat since the given version, for polling clients, as
+        new_messages - messages newer than the given (created_at, id) cursor (newest first)
+        changed_messages - older messages which have since been edited or deleted
+        chat_version - the current version of the chat
+        newest_cursor - the cursor of the newest message
+    or None if nothing has changed - which is worked out from the chat's version alone, without touching the
+    messages. Raises ValueError if the cursor given as after isn't valid.
+    """
+    chat_version = get_chat_version(chat)
+    if chat_version == since:
+        return None
+
+    changes = (
+        chat.chat_messages.filter(version__gt=since)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+    newest = parse_message_cursor(after) if after else None
+
+    new_messages, changed_messages = [], []
+    for message in changes:
+        if newest is None or (message.created_at, message.pk) > newest:
+            if message.deleted_at is None:
+                new_messages.append(message)
+        else:
+            changed_messages.append(message)
+
+    return {
+        "new_messages": new_messages,
+        "changed_messages": changed_messages,
+        "chat_version": chat_version,
+        "newest_cursor": get_message_cursor(new_messages[0]) if new_messages else after,
+    }
+
+
+def get_chat_channel(chat) -> str:
+    """Gets the channel of a group or collaboration chat (see collabl.events)"""
+    if chat._meta.model_name == "group":
+        return group_channel(chat.pk)
+    return collaboration_channel(chat.pk)
+
+
+def mark_chat_read(user, chat) -> None:
+    """Moves the user's read cursor for a group or collaboration chat up to now, so none of it is unread"""
+    channel = get_chat_channel(chat)
+
+    # Read the chat's total before the cursor moves, so a message arriving in between is left unread, rather than lost
+    _, totals = get_cached_unread_counts(user.pk, [channel])
+    ReadCursor.objects.update_or_create(
+        user=user, channel=channel, defaults={"last_read_at": timezone.now()}
+    )
+    cache_unread_counts(user.pk, {channel: 0}, totals)
+
+
+def get_unread_counts(user, chats, joined) -> dict:
+    """
+    Gets the user's unread count (by pk) for each of the given group or collaboration chats - the number of messages
+    since their read cursor, or since they joined (given by chat pk in joined) if they have never read the chat.
+
+    Counts come from the cache where they can (see chat.unread), and the rest are counted together in one query -
+    a range count per chat on its (chat, created_at) index - so a list of chats takes a fixed number of queries,
+    however long it is.
+    """
+    channels = {get_chat_channel(chat): chat for chat in chats}
+    unread, totals = get_cached_unread_counts(user.pk, channels)
+
+    if missing := [channel for channel in channels if channel not in unread]:
+        cursors = dict(
+            ReadCursor.objects.filter(user=user, channel__in=missing).values_list(
+                "channel", "last_read_at"
+            )
+        )
+
+        # 1: Count the messages since each chat's cursor (or since the user joined it)
+        ranges, counted = Q(), {}
+        for channel in missing:
+            chat = channels[channel]
+            if since := cursors.get(channel) or joined.get(chat.pk):
+                ranges |= Q(**{chat._meta.model_name: chat.pk, "created_at__gt": since})
+            counted[channel] = 0
+
+        if ranges:
+            counts = (
+                Message.alive_objects.filter(ranges)
+                .values("group", "collaboration")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for count in counts:
+                channel = (
+                    group_channel(count["group"])
+                    if count["group"]
+                    else collaboration_channel(count["collaboration"])
+                )
+                counted[channel] = count["count"]
+
+        # 2: Cache them, for next time
+        cache_unread_counts(user.pk, counted, totals)
+        unread.update(counted)
+
+    return {chat.pk: unread[channel] for channel, chat in channels.items()}
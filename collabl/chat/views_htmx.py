@@ -1,6 +1,10 @@
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
-from django.shortcuts import render
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotModified,
+)
+from django.shortcuts import get_object_or_404, render
 from django.views.decorators.http import require_http_methods
 
 from chat.forms import (
@@ -10,7 +14,13 @@ from chat.forms import (
     CollaborationMessageUpdateForm,
 )
 from chat.models import Message
-from chat.utils import user_is_message_owner, user_is_message_owner_or_admin
+from chat.utils import (
+    get_message_changes,
+    get_message_page,
+    mark_chat_read,
+    user_is_message_owner,
+    user_is_message_owner_or_admin,
+)
 from collaborations.models import Collaboration
 from groups.models import Group
 from groups.utils import user_has_active_membership
@@ -30,15 +40,15 @@ def group_message_create_view(request, slug):
 
     # Get data
     message = str(request.POST["message"])
-    group = Group.objects.get(slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
 
     # Check Permissions
     if not user_has_active_membership(request.user, group):
         return HttpResponseForbidden()
 
-    # Create Message
+    # Create Message (the user has now read the chat)
     Message.objects.create(group=group, user=request.user, message=message)
-    messages = Message.objects.filter(group=group)
+    mark_chat_read(request.user, group)
 
     # Return Response
     return render(
@@ -46,13 +56,73 @@ def group_message_create_view(request, slug):
         "app/group/partials/chat/main.html",
         {
             "membership_level": get_membership_level(request.user, group),
-            "chat_messages": messages,
+            **get_message_page(group),
             "group": group,
             "chat_form": GroupMessageForm(initial={"group": group}),
         },
     )
 
 
+@login_required()
+@require_http_methods(["GET"])
+def group_message_page_view(request, slug):
+    """
+    HTMX VIEW - Sends back the next page of older chat messages (app/group/partials/chat/messages.html), to replace
+    the 'load older' trigger at the end of the previous page
+    """
+
+    # Get data (as on the group page, any logged in user can read the chat)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
+
+    try:
+        page = get_message_page(group, before=request.GET.get("before"))
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    # Return Response
+    return render(
+        request,
+        "app/group/partials/chat/messages.html",
+        {**page, "group": group},
+    )
+
+
+@login_required()
+@require_http_methods(["GET"])
+def group_message_changes_view(request, slug):
+    """
+    HTMX VIEW - Polled by the group chat, with the chat version and newest message it has (since & after).
+    Sends back any new messages (app/group/partials/chat/changes.html), to go above the ones already shown, with
+    any edited or deleted messages swapped in out of band - or 304 Not Modified, if nothing has changed.
+    """
+
+    # Get data (as on the group page, any logged in user can read the chat)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
+
+    try:
+        changes = get_message_changes(
+            group,
+            since=int(request.GET.get("since", 0)),
+            after=request.GET.get("after"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    if changes is None:
+        return HttpResponseNotModified()
+
+    # The changes are about to be shown, so the user (if a member) has read the chat
+    if user_has_active_membership(request.user, group):
+        mark_chat_read(request.user, group)
+
+    # Return Response
+    return render(
+        request,
+        "app/group/partials/chat/changes.html",
+        {**changes, "group": group},
+    )
+
+
 @login_required()
 @require_http_methods(["GET", "POST"])
 def group_message_update_view(request, slug, pk):
@@ -80,7 +150,7 @@ def group_message_update_view(request, slug, pk):
             "app/group/partials/chat/main.html",
             {
                 "membership_level": get_membership_level(request.user, group),
-                "chat_messages": Message.objects.filter(group=group),
+                **get_message_page(group),
                 "group": group,
                 "chat_form": GroupMessageForm(initial={"group": group}),
             },
@@ -93,7 +163,7 @@ def group_message_update_view(request, slug, pk):
         {
             "membership_level": get_membership_level(request.user, group),
             "message": message,
-            "chat_messages": Message.objects.filter(group=group),
+            **get_message_page(group),
             "message_update_modal": True,
             "group": group,
             "form": form,
@@ -122,13 +192,13 @@ def group_message_delete_view(request, slug, pk):
 
     # If POST, delete the message
     if request.method == "POST":
-        message.delete()
+        message.remove()
         return render(
             request,
             "app/group/partials/chat/main.html",
             {
                 "membership_level": get_membership_level(request.user, group),
-                "chat_messages": Message.objects.filter(group=group),
+                **get_message_page(group),
                 "group": group,
                 "chat_form": GroupMessageForm(initial={"group": group}),
             },
@@ -141,7 +211,7 @@ def group_message_delete_view(request, slug, pk):
         {
             "membership_level": get_membership_level(request.user, group),
             "message": message,
-            "chat_messages": Message.objects.filter(group=group),
+            **get_message_page(group),
             "message_delete_modal": True,
             "group": group,
             "chat_form": GroupMessageForm(initial={"group": group}),
@@ -162,16 +232,17 @@ def collaboration_message_create_view(request, slug):
 
     # Get Data
     message = str(request.POST["message"])
-    collaboration = Collaboration.objects.get(slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
 
     # Check Permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
         return HttpResponseForbidden()
 
-    # Create Message
+    # Create Message (the user has now read the chat)
     Message.objects.create(
         collaboration=collaboration, user=request.user, message=message
     )
+    mark_chat_read(request.user, collaboration)
 
     # Return Response
     return render(
@@ -181,7 +252,7 @@ def collaboration_message_create_view(request, slug):
             "membership_level": get_membership_level(
                 request.user, collaboration.related_group
             ),
-            "chat_messages": Message.objects.filter(collaboration=collaboration),
+            **get_message_page(collaboration),
             "collaboration": collaboration,
             "chat_form": CollaborationMessageForm(
                 initial={"collaboration": collaboration}
@@ -190,6 +261,69 @@ def collaboration_message_create_view(request, slug):
     )
 
 
+@login_required()
+@require_http_methods(["GET"])
+def collaboration_message_page_view(request, slug):
+    """
+    HTMX VIEW - Sends back the next page of older chat messages (app/collaborations/partials/chat/messages.html), to
+    replace the 'load older' trigger at the end of the previous page
+    """
+
+    # Get Data (as on the collaboration page, any logged in user can read the chat)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+
+    try:
+        page = get_message_page(
+            collaboration,
+            before=request.GET.get("before"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    # Return Response
+    return render(
+        request,
+        "app/collaborations/partials/chat/messages.html",
+        {**page, "collaboration": collaboration},
+    )
+
+
+@login_required()
+@require_http_methods(["GET"])
+def collaboration_message_changes_view(request, slug):
+    """
+    HTMX VIEW - Polled by the collaboration chat, with the chat version and newest message it has (since & after).
+    Sends back any new messages (app/collaborations/partials/chat/changes.html), to go above the ones already shown,
+    with any edited or deleted messages swapped in out of band - or 304 Not Modified, if nothing has changed.
+    """
+
+    # Get Data (as on the collaboration page, any logged in user can read the chat)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+
+    try:
+        changes = get_message_changes(
+            collaboration,
+            since=int(request.GET.get("since", 0)),
+            after=request.GET.get("after"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    if changes is None:
+        return HttpResponseNotModified()
+
+    # The changes are about to be shown, so the user (if a member) has read the chat
+    if user_has_active_membership(request.user, collaboration.related_group):
+        mark_chat_read(request.user, collaboration)
+
+    # Return Response
+    return render(
+        request,
+        "app/collaborations/partials/chat/changes.html",
+        {**changes, "collaboration": collaboration},
+    )
+
+
 @login_required()
 @require_http_methods(["GET", "POST"])
 def collaboration_message_delete_view(request, slug, pk):
@@ -211,7 +345,7 @@ def collaboration_message_delete_view(request, slug, pk):
 
     # If POST, delete the message
     if request.method == "POST":
-        message.delete()
+        message.remove()
         return render(
             request,
             "app/collaborations/partials/chat/main.html",
@@ -219,7 +353,7 @@ def collaboration_message_delete_view(request, slug, pk):
                 "membership_level": get_membership_level(
                     request.user, collaboration.related_group
                 ),
-                "chat_messages": Message.objects.filter(collaboration=collaboration),
+                **get_message_page(collaboration),
                 "collaboration": collaboration,
                 "chat_form": CollaborationMessageForm(
                     initial={"collaboration": collaboration}
@@ -236,7 +370,7 @@ def collaboration_message_delete_view(request, slug, pk):
                 request.user, collaboration.related_group
             ),
             "message": message,
-            "chat_messages": Message.objects.filter(collaboration=collaboration),
+            **get_message_page(collaboration),
             "message_delete_modal": True,
             "collaboration": collaboration,
             "chat_form": CollaborationMessageForm(
@@ -276,7 +410,7 @@ def collaboration_message_update_view(request, slug, pk):
                 "membership_level": get_membership_level(
                     request.user, collaboration.related_group
                 ),
-                "chat_messages": Message.objects.filter(collaboration=collaboration),
+                **get_message_page(collaboration),
                 "collaboration": collaboration,
                 "chat_form": CollaborationMessageForm(
                     initial={"collaboration": collaboration}
@@ -293,7 +427,7 @@ def collaboration_message_update_view(request, slug, pk):
                 request.user, collaboration.related_group
             ),
             "message": message,
-            "chat_messages": Message.objects.filter(collaboration=collaboration),
+            **get_message_page(collaboration),
             "message_update_modal": True,
             "collaboration": collaboration,
             "form": form,
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "collabl.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# ADDED: Imported after the apps are loaded
+from collabl.events import EVENTS_PATH_PREFIX, event_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Live update streams are served directly (see collabl.events) - everything else goes to Django"""
+    if scope["type"] == "http" and scope["path"].startswith(EVENTS_PATH_PREFIX):
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,188 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import Message, MessageArchive, ReadCursor
+from collabl.events import collaboration_channel, group_channel
+from collaborations.models import (
+    Collaboration,
+    CollaborationMilestone,
+    CollaborationTask,
+)
+from groups.models import Group, GroupAnnouncement, GroupStats, Membership
+
+"""
+Deleting groups and collaborations in the background.
+
+A large group cascades through thousands of memberships, messages, tasks and files, which is too much to delete within
+a request (or a single transaction). So deletion is done in two steps:
+1) tombstone_group / tombstone_collaboration soft delete it (setting deleted_at) in the request - the views only load
+   alive groups & collaborations, so it is gone from then on.
+2) A Celery job (collabl.tasks.purge_group / purge_collaboration) deletes its rows, DELETION_BATCH_SIZE at a time -
+   each batch a short transaction of its own - along with the files they reference, then finally the row itself.
+   Its progress is kept in the "counters" cache (see get_deletion_progress).
+
+Running a job again (e.g. after a worker is lost) carries on from wherever the last one got to.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def get_progress_key(instance) -> str:
+    return f"deletion:{instance._meta.model_name}:{instance.pk}"
+
+
+def get_deletion_progress(instance):
+    """Gets how many rows of a group or collaboration's deletion have been deleted so far (or None if not started)"""
+    return caches["counters"].get(get_progress_key(instance))
+
+
+def tombstone_group(group) -> None:
+    """Soft deletes a group, and its collaborations, ready to be deleted for good (see delete_group)"""
+    now = timezone.now()
+    with transaction.atomic():
+        Group.objects.filter(pk=group.pk).update(deleted_at=now)
+        Collaboration.objects.filter(related_group=group, deleted_at=None).update(
+            deleted_at=now
+        )
+    group.deleted_at = now
+
+
+def tombstone_collaboration(collaboration) -> None:
+    """Soft deletes a collaboration, ready to be deleted for good (see delete_collaboration)"""
+    collaboration.deleted_at = timezone.now()
+    Collaboration.objects.filter(pk=collaboration.pk).update(
+        deleted_at=collaboration.deleted_at
+    )
+
+
+def delete_files(names) -> None:
+    """Deletes files from storage - failing to delete one is logged, rather than stopping the rest"""
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.exception(f"Couldn't delete {name} from storage")
+
+
+def delete_in_batches(
+    queryset, progress_key=None, file_fields=(), by_pk=False, pause=0
+) -> int:
+    """
+    Deletes the rows of a queryset DELETION_BATCH_SIZE at a time, along with the files (in the given file fields)
+    that they reference, returning the number deleted. The files are only deleted once the batch is committed.
+
+    Batches are taken in whatever order the database finds quickest (so the queryset should filter on an index), or
+    if by_pk, by walking the primary key - a single pass of the table, however few of its rows match. A pause sleeps
+    for that many seconds between batches, to leave the database room for everything else.
+    """
+    deleted, last_pk = 0, None
+    while True:
+        # 1: Find the next batch
+        batch = queryset.order_by("pk") if by_pk else queryset.order_by()
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        if not (
+            batch_ids := list(
+                batch.values_list("pk", flat=True)[: settings.DELETION_BATCH_SIZE]
+            )
+        ):
+            return deleted
+
+        # 2: Delete it (and then its files)
+        with transaction.atomic():
+            batch = queryset.filter(pk__in=batch_ids)
+            names = [
+                name
+                for field in file_fields
+                for name in batch.values_list(field, flat=True)
+                if name
+            ]
+            batch.delete()
+            transaction.on_commit(lambda names=names: delete_files(names))
+
+        # 3: Record progress
+        deleted += len(batch_ids)
+        last_pk = batch_ids[-1] if by_pk else None
+        if progress_key:
+            caches["counters"].add(progress_key, 0, settings.DELETION_PROGRESS_SECONDS)
+            caches["counters"].incr(progress_key, len(batch_ids))
+        if pause:
+            time.sleep(pause)
+
+
+def delete_chat(channel, progress_key, **chat) -> int:
+    """Deletes a group or collaboration chat - its messages, archive segments and read cursors"""
+    return (
+        delete_in_batches(Message.objects.filter(**chat), progress_key)
+        + delete_in_batches(
+            MessageArchive.objects.filter(**chat), progress_key, file_fields=["file"]
+        )
+        + delete_in_batches(ReadCursor.objects.filter(channel=channel), progress_key)
+    )
+
+
+def delete_collaboration(collaboration, progress_key=None) -> int:
+    """
+    Deletes a (tombstoned) collaboration for good - its chat, tasks (and their files) and milestones, in batches, then
+    its image and the collaboration itself. Returns the number of rows deleted.
+    """
+    progress_key = progress_key or get_progress_key(collaboration)
+    deleted = (
+        delete_chat(
+            collaboration_channel(collaboration.pk),
+            progress_key,
+            collaboration_id=collaboration.pk,
+        )
+        + delete_in_batches(
+            CollaborationTask.objects.filter(collaboration=collaboration),
+            progress_key,
+            file_fields=["file"],
+        )
+        + delete_in_batches(
+            CollaborationMilestone.objects.filter(collaboration=collaboration),
+            progress_key,
+        )
+    )
+
+    pk, image = collaboration.pk, collaboration.image.name
+    collaboration.delete()
+    if image:
+        delete_files([image])
+
+    logger.info(f"Deleted collaboration {pk} ({deleted + 1} rows)")
+    return deleted + 1
+
+
+def delete_group(group) -> int:
+    """
+    Deletes a (tombstoned) group for good - its collaborations, chat, announcements and memberships, in batches,
+    then its profile image and the group itself. Returns the number of rows deleted.
+    """
+    progress_key = get_progress_key(group)
+
+    # 1: Drop the group's stats first, so deleting its memberships doesn't recount them batch after batch
+    GroupStats.objects.filter(group=group).delete()
+
+    # 2: Delete the group's contents
+    deleted = sum(
+        delete_collaboration(collaboration, progress_key)
+        for collaboration in Collaboration.objects.filter(related_group=group)
+    )
+    deleted += (
+        delete_chat(group_channel(group.pk), progress_key, group_id=group.pk)
+        + delete_in_batches(GroupAnnouncement.objects.filter(group=group), progress_key)
+        + delete_in_batches(Membership.objects.filter(group=group), progress_key)
+    )
+
+    # 3: Delete the group itself (which deletes its profile image)
+    pk = group.pk
+    group.delete()
+
+    logger.info(f"Deleted group {pk} ({deleted + 1} rows)")
+    return deleted + 1
@@ -0,0 +1,289 @@
+"""
+Live updates, pushed to the browser over Server-Sent Events.
+
+Whenever a group or collaboration's chat or element list changes, an event is published on its channel, e.g.
+    publish(collaboration_channel(collaboration.pk), EVENT_ELEMENTS)
+Events are published to Redis, and every events node keeps a single subscription, which it fans out to the browsers
+it is streaming to - so N viewers of a collaboration cost one Redis message per node, rather than N database polls.
+The events only tell the page *what* has changed. It then fetches the change through the usual htmx views.
+
+The stream itself is a plain ASGI app (see collabl.asgi), served at
+    /events/groups/<slug>/ and /events/collaborations/<slug>/
+and is connected to with htmx's hx-sse attribute. Only these paths are sent to the ASGI "events" service (see
+config/gunicorn/events.py) - the rest of the site is served by the sync WSGI workers.
+
+Set EVENTS_BACKEND = "memory" to use an in-process stand-in for Redis (for development & tests on a single node).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Channels are prefixed in Redis, so they can be subscribed to with one pattern
+REDIS_CHANNEL_PREFIX = "collabl:events:"
+
+# Events
+EVENT_CHAT = "chat"
+EVENT_ELEMENTS = "elements"
+
+# URL prefix of the event streams
+EVENTS_PATH_PREFIX = "/events/"
+
+
+def group_channel(group_id) -> str:
+    return f"group:{group_id}"
+
+
+def collaboration_channel(collaboration_id) -> str:
+    return f"collaboration:{collaboration_id}"
+
+
+class Hub:
+    """
+    Keeps track of the streams open on this node, by channel, and hands each event published on a channel to all of
+    them. Events can be dispatched from any thread (e.g. the Redis subscriber) - they are passed to each stream's
+    event loop safely.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def subscribe(self, channel) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        with self.lock:
+            self.streams.setdefault(channel, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, channel, queue) -> None:
+        with self.lock:
+            streams = self.streams.get(channel, {})
+            streams.pop(queue, None)
+            if not streams:
+                self.streams.pop(channel, None)
+
+    def dispatch(self, channel, event) -> None:
+        with self.lock:
+            streams = list(self.streams.get(channel, {}).items())
+        for queue, loop in streams:
+            loop.call_soon_threadsafe(self.put, queue, event)
+
+    @staticmethod
+    def put(queue, event) -> None:
+        # A stream that has fallen this far behind will refetch everything on its next event anyway
+        if not queue.full():
+            queue.put_nowait(event)
+
+
+class MemoryBackend:
+    """An in-process stand-in for Redis - events are only seen by streams on the same node"""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, event) -> None:
+        self.hub.dispatch(channel, event)
+
+    def start(self) -> None:
+        return
+
+
+class RedisBackend:
+    """
+    Publishes events to Redis, and (once started) listens for events published by any node, on a background thread,
+    passing them to this node's hub.
+    Publishing is done in requests, so gives up after EVENTS_REDIS_TIMEOUT_SECONDS rather than hanging on a slow
+    Redis. The subscription waits indefinitely between events, so is made on its own connection, without that timeout.
+    """
+
+    def __init__(self, hub, url):
+        self.hub = hub
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=settings.EVENTS_REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.EVENTS_REDIS_TIMEOUT_SECONDS,
+        )
+        self.subscriber = redis.Redis.from_url(
+            url, socket_connect_timeout=settings.EVENTS_REDIS_TIMEOUT_SECONDS
+        )
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def publish(self, channel, event) -> None:
+        self.client.publish(f"{REDIS_CHANNEL_PREFIX}{channel}", event)
+
+    def start(self) -> None:
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, daemon=True)
+                self.listener.start()
+
+    def listen(self) -> None:
+        """
+        Listens for events for as long as the process runs - if the connection to Redis is lost, it is logged, and
+        the subscription is made again (backing off up to EVENTS_RECONNECT_MAX_SECONDS between attempts)
+        """
+        delay = 1
+        while True:
+            try:
+                pubsub = self.subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+                delay = 1
+                for message in pubsub.listen():
+                    channel = (
+                        message["channel"].decode().removeprefix(REDIS_CHANNEL_PREFIX)
+                    )
+                    self.hub.dispatch(channel, message["data"].decode())
+            except redis.RedisError:
+                logger.exception(
+                    f"Lost the Redis event subscription - reconnecting in {delay}s"
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, settings.EVENTS_RECONNECT_MAX_SECONDS)
+
+
+hub = Hub()
+backend = (
+    MemoryBackend(hub)
+    if settings.EVENTS_BACKEND == "memory"
+    else RedisBackend(hub, settings.EVENTS_REDIS_URL)
+)
+
+
+def publish(channel, event) -> None:
+    """
+    Publishes an event on a channel, once the current transaction (if any) has been committed - so the page never
+    fetches a change before it can see it. Failing to publish never breaks the change itself.
+    """
+
+    def send():
+        try:
+            backend.publish(channel, event)
+        except redis.RedisError:
+            pass
+
+    transaction.on_commit(send)
+
+
+"""EVENT STREAM"""
+
+
+def get_stream_channel(path, session_key) -> str | None:
+    """
+    Works out the channel for an event stream's path, if the user (found from their session) is logged in, and the
+    group/collaboration exists - otherwise None. As on the group and collaboration pages, any logged in user can follow
+    them.
+    """
+    # Imported here, as this module is loaded by collabl.asgi, alongside the apps
+    from collaborations.models import Collaboration
+    from groups.models import Group
+
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    if not get_user(SimpleNamespace(session=session)).is_authenticated:
+        return None
+
+    match path.removeprefix(EVENTS_PATH_PREFIX).strip("/").split("/"):
+        case ["groups", slug]:
+            pk = (
+                Group.alive_objects.filter(slug=slug)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            return group_channel(pk) if pk else None
+        case ["collaborations", slug]:
+            pk = (
+                Collaboration.alive_objects.filter(slug=slug)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            return collaboration_channel(pk) if pk else None
+        case _:
+            return None
+
+
+async def event_stream(scope, receive, send) -> None:
+    """
+    ASGI app serving an event stream (see collabl.asgi) - each event published on the channel is sent as an SSE event
+    of the same name, with a comment sent every EVENTS_KEEPALIVE_SECONDS to keep the connection open through proxies.
+    """
+    cookies = SimpleCookie()
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    session = cookies.get(settings.SESSION_COOKIE_NAME)
+
+    channel = await sync_to_async(get_stream_channel)(
+        scope["path"], session.value if session else None
+    )
+    if channel is None:
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    backend.start()
+    queue = hub.subscribe(channel)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # Stop nginx buffering the stream
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send_events(queue, disconnected, send)
+    finally:
+        hub.unsubscribe(channel, queue)
+        disconnected.cancel()
+
+
+async def send_events(queue, disconnected, send) -> None:
+    """
+    Sends each event put on the queue down the stream (and a keepalive comment whenever it has been idle for
+    EVENTS_KEEPALIVE_SECONDS), until the client disconnects. A single get is kept waiting on the queue, and only
+    replaced once it has an event - so timing out for a keepalive never leaves a get behind to swallow a later event.
+    """
+    get = asyncio.ensure_future(queue.get())
+    try:
+        while not disconnected.done():
+            done, _ = await asyncio.wait(
+                {get, disconnected},
+                timeout=settings.EVENTS_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if get in done:
+                event = get.result()
+                get = asyncio.ensure_future(queue.get())
+                body = f"event: {event}\ndata: {json.dumps(event)}\n\n"
+            elif disconnected in done:
+                return
+            else:
+                body = ": keepalive\n\n"
+            await send(
+                {"type": "http.response.body", "body": body.encode(), "more_body": True}
+            )
+    finally:
+        get.cancel()
+
+
+async def wait_for_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from axes.models import AccessLog
+from django.apps import apps
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import models
+
+from collabl.base.models import TimeStampedSoftDeleteBase
+from collabl.deletion import delete_collaboration, delete_group, delete_in_batches
+from collaborations.models import Collaboration
+from groups.models import Group
+
+"""
+The nightly purge of dead rows (run by the purge_dead_rows Celery task - see CELERY_BEAT_SCHEDULE).
+
+Soft deleted rows (see TimeStampedSoftDeleteBase) are kept for PURGE_AFTER_DAYS, then deleted for good, along with the
+files they reference. Each table is walked in primary key order, a batch at a time (see
+collabl.deletion.delete_in_batches), sleeping PURGE_BATCH_PAUSE_SECONDS between batches so the purge never hogs the
+database. Tombstoned groups & collaborations (whose deletion never finished) are deleted through collabl.deletion, so
+they don't cascade in one go.
+
+Expired sessions, and axes access logs older than PURGE_ACCESS_LOGS_AFTER_DAYS, are pruned the same way.
+"""
+
+
+def get_soft_delete_models() -> list:
+    """Gets the models with soft deleted rows to purge (groups & collaborations are deleted through collabl.deletion)"""
+    return [
+        model
+        for model in apps.get_models()
+        if issubclass(model, TimeStampedSoftDeleteBase)
+        and model not in (Group, Collaboration)
+    ]
+
+
+def get_file_fields(model) -> list:
+    """Gets the names of a model's file fields, whose files are deleted along with its rows"""
+    return [
+        field.name
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def purge_dead_rows(now) -> dict:
+    """Purges dead rows (as of now), returning the number purged of each model, by label"""
+    cutoff = now - timedelta(days=settings.PURGE_AFTER_DAYS)
+    purged = {}
+
+    # 1: Tombstoned groups, then collaborations (groups take their collaborations with them)
+    purged[Group._meta.label] = sum(
+        delete_group(group) for group in Group.objects.filter(deleted_at__lt=cutoff)
+    )
+    purged[Collaboration._meta.label] = sum(
+        delete_collaboration(collaboration)
+        for collaboration in Collaboration.objects.filter(deleted_at__lt=cutoff)
+    )
+
+    # 2: Every other soft deleted row
+    for model in get_soft_delete_models():
+        purged[model._meta.label] = delete_in_batches(
+            model.objects.filter(deleted_at__lt=cutoff),
+            file_fields=get_file_fields(model),
+            by_pk=True,
+            pause=settings.PURGE_BATCH_PAUSE_SECONDS,
+        )
+
+    # 3: Expired sessions (expire_date is indexed, so needn't be walked) & old access logs
+    purged[Session._meta.label] = delete_in_batches(
+        Session.objects.filter(expire_date__lt=now),
+        pause=settings.PURGE_BATCH_PAUSE_SECONDS,
+    )
+    purged[AccessLog._meta.label] = delete_in_batches(
+        AccessLog.objects.filter(
+            attempt_time__lt=now - timedelta(days=settings.PURGE_ACCESS_LOGS_AFTER_DAYS)
+        ),
+        by_pk=True,
+        pause=settings.PURGE_BATCH_PAUSE_SECONDS,
+    )
+
+    return purged
@@ -17,6 +17,7 @@ from pathlib import Path
 
 import sentry_sdk
 import storages.backends.s3boto3
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 from sentry_sdk.integrations.django import DjangoIntegration
@@ -53,11 +54,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "collaborations",
     "groups",
     "support",
     "chat",
+    "search",
     "storages",
     "django_htmx",
     "axes",
@@ -72,6 +75,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
+    "users.permissions.MembershipLevelMiddleware",
     # AxesMiddleware should be the last middleware in the MIDDLEWARE list.
     # It only formats user lockout messages and renders Axes lockout responses
     # on failed user authentication attempts from login views.
@@ -140,6 +144,83 @@ CELERY_RESULT_SERIALIZER = os.environ.get("CELERY_RESULT_SERIALIZER")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
 CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_IMPORTS = ("collabl.tasks",)
+CELERY_BEAT_SCHEDULE = {
+    "archive-old-messages": {
+        "task": "collabl.tasks.archive_old_messages",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "purge-dead-rows": {
+        "task": "collabl.tasks.purge_dead_rows",
+        "schedule": crontab(hour=4, minute=0),
+    },
+}
+
+# ADDED: Chat archival (see chat/archive.py)
+# Months of chat older than this are moved out of the database, into compressed archive segments in file storage
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get("CHAT_ARCHIVE_AFTER_DAYS", 730))
+
+# ADDED: Group & collaboration deletion (see collabl/deletion.py)
+# Deleted groups and collaborations are hidden at once, then deleted in the background, this many rows at a time
+DELETION_BATCH_SIZE = int(os.environ.get("DELETION_BATCH_SIZE", 1000))
+# How long a deletion's progress is kept, for checking on
+DELETION_PROGRESS_SECONDS = 24 * 60 * 60
+
+# ADDED: Nightly purge (see collabl/purge.py)
+# Soft deleted rows are kept for this long before they are deleted for good, as are axes' access logs
+PURGE_AFTER_DAYS = int(os.environ.get("PURGE_AFTER_DAYS", 30))
+PURGE_ACCESS_LOGS_AFTER_DAYS = int(os.environ.get("PURGE_ACCESS_LOGS_AFTER_DAYS", 90))
+# Slept between batches, so the purge never hogs the database
+PURGE_BATCH_PAUSE_SECONDS = 0.1
+
+# ADDED: Cache configuration
+# The "fragments" cache holds rendered template fragments (e.g. collaboration element lists), which are keyed on a
+# version stamp - old versions simply fall out of the cache, least recently used first. Each fragment sets its own
+# timeout, for anything it shows which doesn't bump its version stamp.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 1000)),
+            "CULL_FREQUENCY": 10,
+        },
+    },
+    # The "counters" cache holds running counts shared by every web node (e.g. chat unread counts - see chat/unread.py)
+    "counters": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("COUNTERS_REDIS_URL", CELERY_BROKER_URL),
+        "TIMEOUT": None,
+    },
+    # The "permissions" cache holds users' membership levels, shared by every web node (see users/permissions.py)
+    "permissions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("PERMISSIONS_REDIS_URL", CELERY_BROKER_URL),
+    },
+}
+
+# ADDED: Live updates (see collabl/events.py)
+# Chat and element list changes are published to Redis, and each events node fans them out to the pages it is
+# streaming to. EVENTS_BACKEND = "memory" keeps events in-process instead (fine for a single node, e.g. development).
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "redis")
+EVENTS_REDIS_URL = os.environ.get("EVENTS_REDIS_URL", CELERY_BROKER_URL)
+# Comment sent on idle streams, so proxies don't close them
+EVENTS_KEEPALIVE_SECONDS = 15
+# Events held for a slow stream, before further events are dropped
+EVENTS_QUEUE_SIZE = 100
+# Longest wait between attempts to resubscribe, after losing Redis
+EVENTS_RECONNECT_MAX_SECONDS = 30
+# Longest wait to connect to Redis, or to publish an event, before giving up on it
+EVENTS_REDIS_TIMEOUT_SECONDS = 1
+
+# ADDED: Bulk membership processing (see groups/selection.py)
+# Admins' selections of memberships, and the progress of the jobs processing them, are kept in Redis
+MEMBERSHIP_SELECTION_REDIS_URL = os.environ.get(
+    "MEMBERSHIP_SELECTION_REDIS_URL", CELERY_BROKER_URL
+)
 
 # ADDED: Storage Config
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
@@ -1,3 +1,5 @@
+from django.core.cache import cache
+
 """
 Helpers for dealing with file uploads
 """
@@ -19,3 +21,23 @@ def collaboration_file_upload_to(instance, filename):
 
 def user_image_upload_to(instance, filename):
     return "user/{}/images/{}".format(instance.pk, filename)
+
+
+def chat_archive_upload_to(instance, filename):
+    if instance.group_id:
+        return "groups/{}/chat/archive/{}".format(instance.group_id, filename)
+    return "collaboration/{}/chat/archive/{}".format(
+        instance.collaboration_id, filename
+    )
+
+
+def get_cached_file_url(file, timeout):
+    """
+    Gets the URL of a stored file, caching it for the given number of seconds - the default storage signs its URLs,
+    so the timeout should be well under their expiry
+    """
+    key = "file-url:{}".format(file.name)
+    if (url := cache.get(key)) is None:
+        url = file.url
+        cache.set(key, url, timeout)
+    return url
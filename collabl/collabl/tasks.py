@@ -1,8 +1,16 @@
+from datetime import timedelta
+
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.utils import timezone
 from templated_email import send_templated_mail
 
-from collabl import settings
+from chat.archive import archive_messages_before
+from collaborations.models import Collaboration
+from collabl import purge, settings
+from collabl.deletion import delete_collaboration, delete_group
+from groups.models import Group
+from groups.selection import process_selection
 
 logger = get_task_logger(__name__)
 
@@ -59,3 +67,91 @@ def send_email(mail_props) -> bool:
     )
 
     return True
+
+
+@shared_task()
+def archive_old_messages() -> int:
+    """
+    Moves months of chat older than CHAT_ARCHIVE_AFTER_DAYS out of the database, into archive segments (see
+    chat/archive.py). Run nightly, by Celery beat.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.CHAT_ARCHIVE_AFTER_DAYS)
+    logger.info(f"Archiving chat messages from before {cutoff:%Y-%m}...")
+
+    archived = archive_messages_before(cutoff)
+
+    logger.info(f"Archived {archived} chat messages")
+    return archived
+
+
+@shared_task()
+def purge_dead_rows() -> int:
+    """
+    Deletes soft deleted rows older than PURGE_AFTER_DAYS (and the files they reference), expired sessions and old
+    access logs, in throttled batches (see collabl/purge.py). Run nightly, by Celery beat.
+    """
+    logger.info("Purging dead rows...")
+
+    purged = purge.purge_dead_rows(timezone.now())
+
+    for label, count in purged.items():
+        logger.info(f"Purged {count} {label} rows")
+    return sum(purged.values())
+
+
+@shared_task()
+def process_membership_selection(
+    job_id, group_id, user_id, action, membership_filter, all_selected, membership_ids
+) -> int:
+    """
+    Runs an admin's bulk action on their selection of a group's memberships, in chunks (see groups/selection.py),
+    recording its progress under the job id
+    """
+    logger.info(f"Processing membership selection ({action}) for group {group_id}...")
+
+    processed = process_selection(
+        job_id,
+        group_id,
+        user_id,
+        action,
+        membership_filter,
+        all_selected,
+        membership_ids,
+    )
+
+    logger.info(f"Processed {processed} memberships ({action}) for group {group_id}")
+    return processed
+
+
+@shared_task()
+def purge_group(group_id) -> int:
+    """
+    Deletes a tombstoned group for good, in batches (see collabl/deletion.py) - groups which haven't been tombstoned
+    are left alone
+    """
+    if not (
+        group := Group.objects.filter(pk=group_id).exclude(deleted_at=None).first()
+    ):
+        logger.info(f"Group {group_id} isn't waiting to be deleted")
+        return 0
+
+    logger.info(f"Deleting group {group_id}...")
+    return delete_group(group)
+
+
+@shared_task()
+def purge_collaboration(collaboration_id) -> int:
+    """
+    Deletes a tombstoned collaboration for good, in batches (see collabl/deletion.py) - collaborations which haven't
+    been tombstoned are left alone
+    """
+    if not (
+        collaboration := Collaboration.objects.filter(pk=collaboration_id)
+        .exclude(deleted_at=None)
+        .first()
+    ):
+        logger.info(f"Collaboration {collaboration_id} isn't waiting to be deleted")
+        return 0
+
+    logger.info(f"Deleting collaboration {collaboration_id}...")
+    return delete_collaboration(collaboration)
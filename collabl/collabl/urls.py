@@ -43,6 +43,8 @@ urlpatterns = [
     path("groups/", include("groups.urls")),
     # Collaborations
     path("", include("collaborations.urls")),
+    # Search
+    path("search/", include("search.urls")),
     # Generics
     path("clear", empty_string, name="empty-string"),
     # Sentry Debug
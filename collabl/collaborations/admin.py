@@ -1,10 +1,47 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseRedirect
 
 from .models import (
     Collaboration,
     CollaborationMilestone,
     CollaborationTask,
+    lock_elements,
 )
+from .utils import TaskGraph
+
+"""
+Forms
+"""
+
+
+class CollaborationTaskAdminForm(forms.ModelForm):
+    """
+    Checks the prerequisites chosen for a task belong to the same collaboration, as add_prerequisites does. Cycles
+    are checked for once the prerequisites are saved, with the collaboration's elements locked
+    (see CollaborationTaskAdmin.save_related).
+    """
+
+    class Meta:
+        model = CollaborationTask
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        collaboration = cleaned_data.get("collaboration")
+        prerequisites = cleaned_data.get("prerequisites")
+        if collaboration is None or not prerequisites:
+            return cleaned_data
+
+        for task in prerequisites:
+            if task.collaboration_id != collaboration.pk:
+                self.add_error(
+                    "prerequisites",
+                    f"'{task.name}' belongs to another collaboration, so can't be a prerequisite",
+                )
+        return cleaned_data
+
 
 """
 Inlines
@@ -27,6 +64,14 @@ class CollaborationTaskInline(admin.TabularInline):
 class CollaborationMilestoneInline(admin.TabularInline):
     model = CollaborationMilestone
     extra = 0
+    # A milestone's prerequisites are the tasks before it, so follow its position (see claim_prerequisites)
+    fields = (
+        "reference",
+        "name",
+        "position",
+        "target_date",
+    )
+    readonly_fields = ("reference",)
 
 
 """
@@ -79,6 +124,7 @@ class CollaborationAdmin(admin.ModelAdmin):
 
 @admin.register(CollaborationTask)
 class CollaborationTaskAdmin(admin.ModelAdmin):
+    form = CollaborationTaskAdminForm
     search_fields = ("reference", "name", "collaboration")
     ordering = ("collaboration", "position")
 
@@ -134,9 +180,38 @@ class CollaborationTaskAdmin(admin.ModelAdmin):
         "updated_at",
         "deleted_at",
         "reference",
-        "prerequisites",
     )
 
+    raw_id_fields = ("prerequisites",)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        """
+        If saving the task's prerequisites would create a cycle, the whole change is rolled back (see save_related),
+        and the form is shown again with the error
+        """
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except ValidationError as error:
+            for message in error.messages:
+                self.message_user(request, message, messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_related(self, request, form, formsets, change):
+        """
+        The prerequisites are saved with the collaboration's elements locked (as add_prerequisites does), then checked
+        for cycles against the stored dependencies under the same lock, so two edits can't each complete a cycle.
+        The elements version is bumped afterwards, so the cached task graph & element list aren't served stale
+        """
+        task = form.instance
+        lock_elements(task.collaboration_id)
+        super().save_related(request, form, formsets, change)
+
+        if TaskGraph.load(task.collaboration_id).has_cycle:
+            raise ValidationError(
+                f"These prerequisites would make '{task.name}' depend on itself"
+            )
+        task.collaboration.record_element_change()
+
 
 @admin.register(CollaborationMilestone)
 class CollaborationMilestoneAdmin(admin.ModelAdmin):
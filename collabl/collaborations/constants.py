@@ -45,3 +45,34 @@ MILESTONE_STATUS_REACHED: str = "Reached"
 
 COMPLETE_TASK: str = "Complete Task"
 UNDO_COMPLETE_TASK: str = "Undo Complete Task"
+
+"""ELEMENT BATCH OPERATIONS"""
+
+# Along with COMPLETE_TASK & UNDO_COMPLETE_TASK, these can be applied to many elements at once
+# (see Collaboration.apply_element_operations)
+MOVE_ELEMENTS: str = "Move"
+ASSIGN_TASKS: str = "Assign"
+DELETE_ELEMENTS: str = "Delete"
+
+ELEMENT_BATCH_OPERATION_CHOICES: tuple = (
+    (MOVE_ELEMENTS, "Move"),
+    (COMPLETE_TASK, "Complete"),
+    (UNDO_COMPLETE_TASK, "Undo Complete"),
+    (ASSIGN_TASKS, "Assign"),
+    (DELETE_ELEMENTS, "Delete"),
+)
+
+"""ELEMENT ORDERING"""
+
+# Element positions are sparse sort keys, spaced this far apart, so that an element can be placed between two others
+# without rewriting the positions of everything after it
+ELEMENT_POSITION_GAP: int = 1024
+
+# When a new position lands closer than this to one of its neighbours, the collaboration is queued for renormalisation
+ELEMENT_POSITION_RENORMALISE_THRESHOLD: int = 16
+
+"""PROGRESS COUNTERS"""
+
+# The number of collaborations whose progress counters are recounted (and locked) at a time, by
+# reconcile_progress_counters
+RECONCILE_BATCH_SIZE: int = 500
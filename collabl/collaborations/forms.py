@@ -1,10 +1,23 @@
-from django.forms import ModelForm, DateInput, ModelChoiceField, Textarea, FileInput
+from django.forms import (
+    ChoiceField,
+    DateInput,
+    FileInput,
+    Form,
+    IntegerField,
+    ModelChoiceField,
+    ModelForm,
+    MultipleChoiceField,
+    Textarea,
+    ValidationError,
+)
 from django.forms.widgets import Select
 
+import collaborations.constants as c
 from collaborations.models import (
     CollaborationMilestone,
     CollaborationTask,
     Collaboration,
+    get_ordered_elements,
 )
 from groups.constants import MEMBERSHIP_STATUS_ADMIN
 from groups.models import Group
@@ -140,6 +153,72 @@ class MilestoneForm(ModelForm):
             field.widget.attrs["class"] = "form-control"
 
 
+class ElementBatchForm(Form):
+    """
+    Used to apply one operation to many (selected) elements at once - see Collaboration.apply_element_operations
+    Moved elements are placed together (in their current order), starting at the given (zero-indexed) position.
+    """
+
+    elements = MultipleChoiceField()
+    operation = ChoiceField(choices=c.ELEMENT_BATCH_OPERATION_CHOICES)
+    position = IntegerField(min_value=0, required=False)
+    assigned_to = ModelChoiceField(queryset=None, required=False)
+
+    def __init__(self, *args, collaboration, **kwargs):
+        """
+        We grab the collaboration, and use it to populate the elements that can be selected, and the group members
+        that tasks can be assigned to
+        """
+        super(ElementBatchForm, self).__init__(*args, **kwargs)
+        self.fields["elements"].choices = [
+            (pk, pk) for pk, _, _ in get_ordered_elements(collaboration.pk)
+        ]
+        self.fields["assigned_to"].queryset = collaboration.related_group.members.all()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("operation") == c.MOVE_ELEMENTS:
+            position = cleaned_data.get("position")
+            if position is None or position >= len(self.fields["elements"].choices):
+                raise ValidationError(
+                    "Please give a valid position to move the elements to"
+                )
+        return cleaned_data
+
+    def get_operations(self) -> list:
+        """Turns the cleaned form into the (operation, pk, argument) tuples for apply_element_operations"""
+        operation = self.cleaned_data["operation"]
+        # Keep the selected elements in their current order
+        selected = [
+            pk
+            for pk, _ in self.fields["elements"].choices
+            if pk in self.cleaned_data["elements"]
+        ]
+
+        match operation:
+            case c.MOVE_ELEMENTS:
+                # Work out the final order (the selected elements placed together at the given position), and the
+                # moves needed to get there - moves are applied one after another, as they are here
+                order = [pk for pk, _ in self.fields["elements"].choices]
+                others = [pk for pk in order if pk not in selected]
+                position = min(self.cleaned_data["position"], len(others))
+                operations = []
+                for index, pk in enumerate(
+                    others[:position] + selected + others[position:]
+                ):
+                    if order[index] != pk:
+                        order.remove(pk)
+                        order.insert(index, pk)
+                        operations.append((operation, pk, index))
+                return operations
+            case c.ASSIGN_TASKS:
+                return [
+                    (operation, pk, self.cleaned_data["assigned_to"]) for pk in selected
+                ]
+            case _:
+                return [(operation, pk, None) for pk in selected]
+
+
 class CollaborationForm(ModelForm):
     """
     form used for adding/updating collaborations
@@ -0,0 +1,122 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+import collaborations.constants as c
+from collaborations.models import (
+    Collaboration,
+    CollaborationMilestone,
+    CollaborationTask,
+    get_ordered_elements,
+    lock_elements,
+    rebuild_prerequisites,
+)
+
+
+class Command(BaseCommand):
+    """
+    Measures the throughput of concurrent reordering - N movers (each with their own database connection) repeatedly
+    drag random elements of one collaboration to random positions, as the move views do. Afterwards, the positions
+    are checked for duplicates, and the collaboration's original order is restored.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collaboration",
+            required=True,
+            help="Slug of the collaboration to reorder (its order is restored afterwards)",
+        )
+        parser.add_argument(
+            "--movers", type=int, default=8, help="Number of concurrent movers"
+        )
+        parser.add_argument(
+            "--moves", type=int, default=50, help="Number of moves made by each mover"
+        )
+
+    def success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def error(self, text):
+        self.stdout.write(self.style.ERROR(text))
+
+    def handle(self, *args, **options):
+
+        collaboration = Collaboration.objects.filter(
+            slug=options["collaboration"]
+        ).first()
+        if collaboration is None:
+            self.error(f"No collaboration found with slug '{options['collaboration']}'")
+            return
+
+        elements = get_ordered_elements(collaboration.pk)
+        if len(elements) < 2:
+            self.error("The collaboration needs at least two elements to reorder")
+            return
+
+        timings, failures = [], []
+
+        def mover():
+            try:
+                for _ in range(options["moves"]):
+                    pk, element_type, _ = random.choice(elements)
+                    model = (
+                        CollaborationTask
+                        if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK
+                        else CollaborationMilestone
+                    )
+                    started = time.perf_counter()
+                    model.objects.get(pk=pk).reposition(random.randrange(len(elements)))
+                    timings.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connection.close()
+
+        # 1: Run the movers
+        threads = [threading.Thread(target=mover) for _ in range(options["movers"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # 2: Check the order is intact - every element still there, and no two sharing a position
+        positions = [
+            position for _, _, position in get_ordered_elements(collaboration.pk)
+        ]
+        intact = len(positions) == len(elements) and len(set(positions)) == len(
+            positions
+        )
+
+        # 3: Put the original order back
+        with transaction.atomic():
+            lock_elements(collaboration.pk)
+            original = {pk: position for pk, _, position in elements}
+            for model in (CollaborationTask, CollaborationMilestone):
+                instances = list(model.objects.filter(collaboration=collaboration))
+                for instance in instances:
+                    instance.position = original[str(instance.pk)]
+                model.objects.bulk_update(instances, ["position"])
+            rebuild_prerequisites(collaboration.pk)
+            collaboration.record_element_change()
+
+        # 4: Report
+        for failure in failures:
+            self.error(f"Mover failed: {failure!r}")
+        if timings:
+            timings.sort()
+            self.success(
+                f"{len(timings)} moves by {options['movers']} movers in {elapsed:.2f}s "
+                f"({len(timings) / elapsed:.1f} moves/s) - "
+                f"mean {statistics.mean(timings) * 1000:.1f}ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.1f}ms"
+            )
+        if intact:
+            self.success("Positions intact - no duplicates or missing elements")
+        else:
+            self.error("Positions corrupted - duplicate or missing elements found")
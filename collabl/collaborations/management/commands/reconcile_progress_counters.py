@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from collaborations.models import Collaboration
+from collaborations.utils import reconcile_progress_counters
+
+
+class Command(BaseCommand):
+    """
+    Repairs any drift in the collaborations' denormalised progress counters (task/completed task/milestone counts)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collaboration",
+            help="Slug of a single collaboration to reconcile (defaults to all collaborations)",
+        )
+
+    def success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def error(self, text):
+        self.stdout.write(self.style.ERROR(text))
+
+    def handle(self, *args, **options):
+
+        collaborations = Collaboration.objects.all()
+        if options["collaboration"]:
+            collaborations = collaborations.filter(slug=options["collaboration"])
+            if not collaborations.exists():
+                self.error(
+                    f"No collaboration found with slug '{options['collaboration']}'"
+                )
+                return
+
+        with transaction.atomic():
+            repaired = reconcile_progress_counters(collaborations)
+
+        self.success(f"Success - repaired the counters of {repaired} collaboration(s)")
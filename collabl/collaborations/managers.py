@@ -0,0 +1,117 @@
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Greatest
+
+import collaborations.constants as c
+from collabl.base.managers import (
+    TimeStampedSoftDeleteManager,
+    TimeStampedSoftDeleteQueryset,
+)
+
+"""
+A custom model manager for Collaborations, with methods to annotate progress and filter by status.
+Progress is worked out from the denormalised counters on the collaboration row, so a list of collaborations
+(with progress) can be rendered in a fixed number of queries:
+
+collaborations = Collaboration.objects.filter(related_group=group).with_progress().by_status(status)
+"""
+
+
+class CollaborationQuerySet(TimeStampedSoftDeleteQueryset):
+    def with_progress(self):
+        """
+        Annotates each collaboration with:
+            progress_percent - percentage of tasks completed (as Collaboration.percent_completed)
+            progress_status - Planning/Ongoing/Complete (as Collaboration.status)
+            element_count - number of tasks and milestones
+            last_activity_at - when the collaboration, or any of its elements, was last updated
+        """
+        # Imported here, as the models module imports from this one
+        from collaborations.models import CollaborationMilestone, CollaborationTask
+
+        return self.annotate(
+            progress_percent=Case(
+                When(task_count=0, then=Value(0)),
+                default=F("completed_task_count") * 100 / F("task_count"),
+                output_field=IntegerField(),
+            ),
+            progress_status=Case(
+                When(
+                    completed_task_count=0, then=Value(c.COLLABORATION_STATUS_PLANNING)
+                ),
+                When(
+                    completed_task_count=F("task_count"),
+                    then=Value(c.COLLABORATION_STATUS_COMPLETED),
+                ),
+                default=Value(c.COLLABORATION_STATUS_ONGOING),
+            ),
+            element_count=F("task_count") + F("milestone_count"),
+            # Greatest() ignores NULLs on Postgres, so collaborations without tasks/milestones are fine
+            last_activity_at=Greatest(
+                "updated_at",
+                Subquery(
+                    CollaborationTask.objects.filter(collaboration=OuterRef("pk"))
+                    .order_by("-updated_at")
+                    .values("updated_at")[:1]
+                ),
+                Subquery(
+                    CollaborationMilestone.objects.filter(collaboration=OuterRef("pk"))
+                    .order_by("-updated_at")
+                    .values("updated_at")[:1]
+                ),
+            ),
+        )
+
+    def planning(self):
+        return self.filter(completed_task_count=0)
+
+    def ongoing(self):
+        return self.filter(completed_task_count__gt=0).exclude(
+            completed_task_count=F("task_count")
+        )
+
+    def completed(self):
+        return self.filter(task_count__gt=0, completed_task_count=F("task_count"))
+
+    def by_status(self, status):
+        """Filters by one of the COLLABORATION_STATUS constants (including 'All') - anything else returns nothing"""
+        match status:
+            case c.COLLABORATION_STATUS_ALL:
+                return self
+            case c.COLLABORATION_STATUS_PLANNING:
+                return self.planning()
+            case c.COLLABORATION_STATUS_ONGOING:
+                return self.ongoing()
+            case c.COLLABORATION_STATUS_COMPLETED:
+                return self.completed()
+            case _:
+                return self.none()
+
+
+class CollaborationManager(TimeStampedSoftDeleteManager):
+    """
+    CollaborationManager extends the soft delete manager, so that the CollaborationQuerySet methods can be called
+    from the manager, or chained onto any queryset of collaborations:
+
+    collaborations = Collaboration.objects.with_progress().ongoing()
+    """
+
+    def get_queryset(self):
+        queryset = CollaborationQuerySet(self.model, using=self._db)
+        if self.alive_only:
+            return queryset.alive()
+        return queryset
+
+    def with_progress(self):
+        return self.get_queryset().with_progress()
+
+    def planning(self):
+        return self.get_queryset().planning()
+
+    def ongoing(self):
+        return self.get_queryset().ongoing()
+
+    def completed(self):
+        return self.get_queryset().completed()
+
+    def by_status(self, status):
+        return self.get_queryset().by_status(status)
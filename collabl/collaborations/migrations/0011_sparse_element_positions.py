@@ -0,0 +1,63 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:01
+
+from itertools import chain
+
+from django.db import migrations, models
+
+# Spacing used when the migration was written - see collaborations.constants.ELEMENT_POSITION_GAP
+POSITION_GAP = 1024
+
+
+def respace_positions(apps, gap, offset):
+    """Respaces every collaboration's elements, keeping their current order"""
+    Collaboration = apps.get_model("collaborations", "Collaboration")
+    CollaborationTask = apps.get_model("collaborations", "CollaborationTask")
+    CollaborationMilestone = apps.get_model("collaborations", "CollaborationMilestone")
+
+    for collaboration_id in Collaboration.objects.values_list("id", flat=True):
+        tasks = list(
+            CollaborationTask.objects.filter(collaboration_id=collaboration_id)
+        )
+        milestones = list(
+            CollaborationMilestone.objects.filter(collaboration_id=collaboration_id)
+        )
+        elements = sorted(chain(tasks, milestones), key=lambda e: e.position)
+        for index, element in enumerate(elements):
+            element.position = (index + offset) * gap
+        CollaborationTask.objects.bulk_update(tasks, ["position"])
+        CollaborationMilestone.objects.bulk_update(milestones, ["position"])
+
+
+def make_positions_sparse(apps, schema_editor):
+    respace_positions(apps, gap=POSITION_GAP, offset=1)
+
+
+def make_positions_dense(apps, schema_editor):
+    respace_positions(apps, gap=1, offset=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0010_auto_20220204_2134"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="collaborationmilestone",
+            name="position",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Sparse sort key for the element - lower positions come first",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="collaborationtask",
+            name="position",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Sparse sort key for the element - lower positions come first",
+            ),
+        ),
+        migrations.RunPython(make_positions_sparse, make_positions_dense),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(collaboration=OuterRef("pk"))
+            .order_by()
+            .values("collaboration")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def populate_progress_counters(apps, schema_editor):
+    """Counts the existing tasks & milestones of every collaboration"""
+    Collaboration = apps.get_model("collaborations", "Collaboration")
+    CollaborationTask = apps.get_model("collaborations", "CollaborationTask")
+    CollaborationMilestone = apps.get_model("collaborations", "CollaborationMilestone")
+
+    Collaboration.objects.update(
+        task_count=count_subquery(CollaborationTask.objects.all()),
+        completed_task_count=count_subquery(
+            CollaborationTask.objects.filter(completed_at__isnull=False)
+        ),
+        milestone_count=count_subquery(CollaborationMilestone.objects.all()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0011_sparse_element_positions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaboration",
+            name="completed_task_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="The number of completed tasks in the collaboration",
+            ),
+        ),
+        migrations.AddField(
+            model_name="collaboration",
+            name="milestone_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="The number of milestones in the collaboration",
+            ),
+        ),
+        migrations.AddField(
+            model_name="collaboration",
+            name="task_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="The number of tasks in the collaboration",
+            ),
+        ),
+        migrations.RunPython(populate_progress_counters, migrations.RunPython.noop),
+    ]
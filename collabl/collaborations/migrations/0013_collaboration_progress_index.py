@@ -0,0 +1,20 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0012_collaboration_progress_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="collaboration",
+            index=models.Index(
+                fields=["related_group", "completed_task_count"],
+                name="collaborati_related_454b95_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0013_collaboration_progress_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaboration",
+            name="elements_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bumped whenever the collaboration's elements change - the rendered element list is cached against it",
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:17
+
+from itertools import chain
+
+from django.db import migrations
+from django.db.models import Count, Exists, OuterRef
+
+# Spacing used when the migration was written - see collaborations.constants.ELEMENT_POSITION_GAP
+POSITION_GAP = 1024
+
+
+def repair_positions(apps, schema_editor):
+    """
+    Respaces the elements of any collaboration where two elements share a position (left behind by concurrent
+    reorders), so that the unique (collaboration, position) constraints can be added. Ties keep creation order.
+    """
+    CollaborationTask = apps.get_model("collaborations", "CollaborationTask")
+    CollaborationMilestone = apps.get_model("collaborations", "CollaborationMilestone")
+
+    collaboration_ids = set()
+    for model in (CollaborationTask, CollaborationMilestone):
+        collaboration_ids.update(
+            model.objects.order_by()
+            .values("collaboration_id", "position")
+            .annotate(count=Count("id"))
+            .filter(count__gt=1)
+            .values_list("collaboration_id", flat=True)
+        )
+    # Tasks and milestones share one ordering, so a task can clash with a milestone too
+    collaboration_ids.update(
+        CollaborationTask.objects.filter(
+            Exists(
+                CollaborationMilestone.objects.filter(
+                    collaboration_id=OuterRef("collaboration_id"),
+                    position=OuterRef("position"),
+                )
+            )
+        ).values_list("collaboration_id", flat=True)
+    )
+
+    for collaboration_id in collaboration_ids:
+        tasks = list(
+            CollaborationTask.objects.filter(collaboration_id=collaboration_id)
+        )
+        milestones = list(
+            CollaborationMilestone.objects.filter(collaboration_id=collaboration_id)
+        )
+        elements = sorted(
+            chain(tasks, milestones), key=lambda e: (e.position, e.created_at)
+        )
+        for index, element in enumerate(elements, start=1):
+            element.position = index * POSITION_GAP
+        CollaborationTask.objects.bulk_update(tasks, ["position"])
+        CollaborationMilestone.objects.bulk_update(milestones, ["position"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0014_collaboration_elements_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:17
+
+from django.db import migrations, models
+import django.db.models.constraints
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0015_repair_element_positions"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="collaborationmilestone",
+            constraint=models.UniqueConstraint(
+                deferrable=django.db.models.constraints.Deferrable["DEFERRED"],
+                fields=("collaboration", "position"),
+                name="unique_milestone_position",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="collaborationtask",
+            constraint=models.UniqueConstraint(
+                deferrable=django.db.models.constraints.Deferrable["DEFERRED"],
+                fields=("collaboration", "position"),
+                name="unique_task_position",
+            ),
+        ),
+    ]
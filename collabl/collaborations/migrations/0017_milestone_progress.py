@@ -0,0 +1,92 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:18
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def prerequisite_subquery(through, aggregate, **filters):
+    return Subquery(
+        through.objects.filter(collaborationmilestone_id=OuterRef("pk"), **filters)
+        .order_by()
+        .values("collaborationmilestone_id")
+        .annotate(result=aggregate)
+        .values("result")
+    )
+
+
+def populate_milestone_progress(apps, schema_editor):
+    """
+    Counts the existing prerequisites of every milestone. Milestones which have already been reached are stamped
+    with the time their last prerequisite was completed (or when they were created, if they have none).
+    """
+    CollaborationMilestone = apps.get_model("collaborations", "CollaborationMilestone")
+    through = CollaborationMilestone.prerequisites.through
+
+    CollaborationMilestone.objects.update(
+        total_count=Coalesce(prerequisite_subquery(through, Count("pk")), 0),
+        completed_count=Coalesce(
+            prerequisite_subquery(
+                through,
+                Count("pk"),
+                collaborationtask__completed_at__isnull=False,
+            ),
+            0,
+        ),
+    )
+    CollaborationMilestone.objects.filter(completed_count=F("total_count")).update(
+        reached_at=Coalesce(
+            prerequisite_subquery(through, Max("collaborationtask__completed_at")),
+            F("created_at"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0016_element_position_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaborationmilestone",
+            name="completed_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of prerequisite tasks completed",
+            ),
+        ),
+        migrations.AddField(
+            model_name="collaborationmilestone",
+            name="reached_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When all of the prerequisite tasks were completed (if they are)",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="collaborationmilestone",
+            name="total_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Number of prerequisite tasks"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collaborationmilestone",
+            index=models.Index(
+                fields=["collaboration", "reached_at"],
+                name="collaborati_collabo_352d93_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collaborationmilestone",
+            index=models.Index(
+                fields=["reached_at"], name="collaborati_reached_d2dc1f_idx"
+            ),
+        ),
+        migrations.RunPython(populate_milestone_progress, migrations.RunPython.noop),
+    ]
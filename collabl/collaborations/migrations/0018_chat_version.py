@@ -0,0 +1,22 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0017_milestone_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaboration",
+            name="chat_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bumped whenever a message in the collaboration chat is added, edited or deleted (see chat.models.Message)",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from search.operations import SearchVectorTrigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collaborations", "0018_chat_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaboration",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="The searchable text of the collaboration (kept up to date by a database trigger - see search.operations)",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="collaborationtask",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="The searchable text of the task (kept up to date by a database trigger - see search.operations)",
+                null=True,
+            ),
+        ),
+        # Fill in the vectors before building the indexes, so each index is built in one go
+        SearchVectorTrigger(
+            "collaborations_collaboration", {"name": "A", "description": "B"}
+        ),
+        SearchVectorTrigger(
+            "collaborations_collaborationtask", {"name": "A", "description": "B"}
+        ),
+        migrations.AddIndex(
+            model_name="collaboration",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="collaborati_search__a4c973_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collaborationtask",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="collaborati_search__8dd74c_gin"
+            ),
+        ),
+    ]
@@ -1,15 +1,33 @@
 import random
 import string
 import time
+from collections import defaultdict
+from itertools import chain
 
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import F
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    F,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
 from django.template.defaultfilters import slugify
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 from collaborations import constants as c
+from collaborations.managers import CollaborationManager
 from collabl.base.models import TimeStampedSoftDeleteBase
+from collabl.events import EVENT_ELEMENTS, collaboration_channel, publish
 from collabl.storages import collaboration_based_upload_to, collaboration_file_upload_to
 
 
@@ -21,12 +39,307 @@ def get_sentinel_user():
     return get_user_model().objects.get_or_create(email="deleted@deleted.com")[0]
 
 
+def lock_elements(collaboration_id) -> None:
+    """
+    Locks a collaboration's elements, until the end of the current transaction, by taking a row lock on the
+    collaboration. Anything which changes the positions, prerequisites or counters of a collaboration's elements
+    takes this lock first, so concurrent editors of the same collaboration queue up (rather than reading the same
+    neighbours and writing clashing positions), and locks are always taken in the same order (collaboration, then
+    elements). Collaborations are locked independently of each other.
+    Must be called inside a transaction.
+    """
+    list(
+        Collaboration.objects.select_for_update()
+        .filter(pk=collaboration_id)
+        .values_list("pk", flat=True)
+    )
+    return
+
+
+def get_element_positions(collaboration, exclude=None):
+    """
+    Returns the positions of all of a collaboration's elements (Tasks & Milestones), in order, as a single
+    UNION ALL query. An element can be excluded (e.g. the one being moved).
+    """
+    tasks = CollaborationTask.objects.filter(collaboration=collaboration).order_by()
+    milestones = CollaborationMilestone.objects.filter(
+        collaboration=collaboration
+    ).order_by()
+
+    if exclude is not None:
+        tasks = tasks.exclude(pk=exclude.pk)
+        milestones = milestones.exclude(pk=exclude.pk)
+
+    return (
+        tasks.values_list("position", flat=True)
+        .union(milestones.values_list("position", flat=True), all=True)
+        .order_by("position")
+    )
+
+
+def get_position_between(previous, following) -> int | None:
+    """
+    Returns a position that sits between two neighbouring positions (either of which can be None, at the start or
+    end of the list), or None if there is no gap left between them.
+    """
+    lower = previous if previous is not None else 0
+    if following is None:
+        return lower + c.ELEMENT_POSITION_GAP
+    if following - lower < 2:
+        return None
+    return (lower + following) // 2
+
+
+def get_position_for_index(collaboration, index=None, exclude=None) -> int:
+    """
+    Returns a position which places an element at the given (zero-indexed) index amongst the other elements in the
+    collaboration, or at the end if no index is given.
+
+    Positions are sparse, so we can almost always find one between the two neighbours without touching any other
+    rows. If the gap has run out, we renormalise the collaboration there and then. If it is merely getting tight,
+    we queue a renormalisation to run in the background.
+    """
+    positions = get_element_positions(collaboration, exclude)
+
+    if index is None:
+        previous, following = positions.reverse().first(), None
+    elif index <= 0:
+        previous, following = None, positions.first()
+    else:
+        neighbours = list(positions[index - 1 : index + 1])
+        if not neighbours:
+            previous, following = positions.reverse().first(), None
+        else:
+            previous = neighbours[0]
+            following = neighbours[1] if len(neighbours) > 1 else None
+
+    position = get_position_between(previous, following)
+
+    # No gap left - respace everything, and try again
+    if position is None:
+        renormalise_positions(collaboration.pk)
+        return get_position_for_index(collaboration, index, exclude)
+
+    # Running low on space - respace everything once this transaction has been committed
+    if (
+        position - (previous or 0) < c.ELEMENT_POSITION_RENORMALISE_THRESHOLD
+        or following is not None
+        and following - position < c.ELEMENT_POSITION_RENORMALISE_THRESHOLD
+    ):
+        # Imported here, as the tasks module imports from this one
+        from collaborations.tasks import renormalise_element_positions
+
+        transaction.on_commit(
+            lambda: renormalise_element_positions.delay(str(collaboration.pk))
+        )
+
+    return position
+
+
+def renormalise_positions(collaboration_id) -> int:
+    """
+    Spaces the positions of all of a collaboration's elements evenly (ELEMENT_POSITION_GAP apart), keeping their
+    order. Only the rows whose position actually changes are written. Returns the number of rows updated.
+    """
+    with transaction.atomic():
+        lock_elements(collaboration_id)
+
+        tasks = CollaborationTask.objects.filter(
+            collaboration_id=collaboration_id
+        ).only("id", "position")
+        milestones = CollaborationMilestone.objects.filter(
+            collaboration_id=collaboration_id
+        ).only("id", "position")
+
+        changed_tasks, changed_milestones = [], []
+        elements = sorted(
+            chain(tasks, milestones), key=lambda element: element.position
+        )
+        for index, element in enumerate(elements, start=1):
+            if element.position != index * c.ELEMENT_POSITION_GAP:
+                element.position = index * c.ELEMENT_POSITION_GAP
+                if isinstance(element, CollaborationTask):
+                    changed_tasks.append(element)
+                else:
+                    changed_milestones.append(element)
+
+        CollaborationTask.objects.bulk_update(changed_tasks, ["position"])
+        CollaborationMilestone.objects.bulk_update(changed_milestones, ["position"])
+
+    return len(changed_tasks) + len(changed_milestones)
+
+
+def get_segment_boundaries(collaboration, *positions, exclude=None) -> list:
+    """
+    Milestones split a collaboration's elements into segments - a milestone's prerequisites are the tasks between it
+    and the milestone before it.
+
+    For each position given, this returns the boundaries of the segment it falls in, as a tuple of
+    (position of the milestone before it, pk of the milestone after it), either of which may be None.
+    All of the positions are resolved in a single query. A milestone can be excluded (e.g. the one being moved).
+    """
+    milestones = CollaborationMilestone.objects.filter(
+        collaboration=collaboration
+    ).order_by()
+    if exclude is not None:
+        milestones = milestones.exclude(pk=exclude.pk)
+
+    boundaries = {}
+    for index, position in enumerate(positions):
+        boundaries[f"previous_{index}"] = Subquery(
+            milestones.filter(position__lt=position)
+            .order_by("-position")
+            .values("position")[:1]
+        )
+        boundaries[f"following_{index}"] = Subquery(
+            milestones.filter(position__gt=position)
+            .order_by("position")
+            .values("pk")[:1]
+        )
+
+    row = Collaboration.objects.filter(pk=collaboration.pk).values(**boundaries).get()
+
+    return [
+        (row[f"previous_{index}"], row[f"following_{index}"])
+        for index in range(len(positions))
+    ]
+
+
+def get_ordered_elements(collaboration_id) -> list:
+    """
+    Returns (pk, type, position) tuples for all of a collaboration's elements (Tasks & Milestones), in order,
+    as a single UNION ALL query. The pks are returned as strings.
+    """
+    tasks = (
+        CollaborationTask.objects.filter(collaboration_id=collaboration_id)
+        .order_by()
+        .annotate(
+            element_type=Value(
+                c.COLLABORATION_ELEMENT_TYPE_TASK, output_field=CharField()
+            )
+        )
+    )
+    milestones = (
+        CollaborationMilestone.objects.filter(collaboration_id=collaboration_id)
+        .order_by()
+        .annotate(
+            element_type=Value(
+                c.COLLABORATION_ELEMENT_TYPE_MILESTONE, output_field=CharField()
+            )
+        )
+    )
+
+    return [
+        (str(pk), element_type, position)
+        for pk, element_type, position in tasks.values_list(
+            "pk", "element_type", "position"
+        )
+        .union(
+            milestones.values_list("pk", "element_type", "position"),
+            all=True,
+        )
+        .order_by("position")
+    ]
+
+
+def rebuild_prerequisites(collaboration_id) -> None:
+    """
+    Rebuilds the prerequisites of all of a collaboration's milestones in one pass over its elements - each milestone's
+    prerequisites are the tasks between it and the milestone before it. Used after changes to many elements at once,
+    rather than maintaining the prerequisites element by element. The milestones' progress is recounted too.
+    """
+    prerequisites = CollaborationMilestone.prerequisites.through
+
+    rows, segment = [], []
+    for pk, element_type, _ in get_ordered_elements(collaboration_id):
+        if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK:
+            segment.append(pk)
+        else:
+            rows.extend(
+                prerequisites(
+                    collaborationmilestone_id=pk, collaborationtask_id=task_pk
+                )
+                for task_pk in segment
+            )
+            segment = []
+
+    prerequisites.objects.filter(
+        collaborationmilestone__collaboration_id=collaboration_id
+    ).delete()
+    prerequisites.objects.bulk_create(rows)
+
+    update_milestone_progress(
+        CollaborationMilestone.objects.filter(collaboration_id=collaboration_id)
+    )
+
+    return
+
+
+def prerequisite_count_subquery(**filters):
+    """Returns a subquery counting each milestone's prerequisite tasks (optionally filtered)"""
+    return Coalesce(
+        Subquery(
+            CollaborationMilestone.prerequisites.through.objects.filter(
+                collaborationmilestone_id=OuterRef("pk"), **filters
+            )
+            .order_by()
+            .values("collaborationmilestone_id")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def update_milestone_progress(milestones) -> None:
+    """
+    Recounts the prerequisites of the given milestones (a queryset), and stamps reached_at on those which have just
+    been reached (or clears it on those which no longer are). Called whenever prerequisites are completed, undone,
+    added or removed, so that a milestone's status can be read straight off the row.
+    This is two set-based updates, however many milestones are given.
+    """
+    milestones.update(
+        total_count=prerequisite_count_subquery(),
+        completed_count=prerequisite_count_subquery(
+            collaborationtask__completed_at__isnull=False
+        ),
+    )
+    milestones.update(
+        reached_at=Case(
+            When(
+                completed_count=F("total_count"),
+                then=Coalesce(F("reached_at"), Value(timezone.now())),
+            ),
+            default=None,
+        )
+    )
+    return
+
+
+def count_subquery(queryset):
+    """Returns a subquery counting the given queryset's rows for each collaboration (zero if there are none)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(collaboration=OuterRef("pk"))
+            .order_by()
+            .values("collaboration")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
 class Collaboration(TimeStampedSoftDeleteBase):
     """
     Collaborations are the projects which belong to a group
     e.g. ‘Turning the Old Schoolyard into a Safe Space for Teenagers’
     """
 
+    # Soft delete managers, with helpers for annotating progress and filtering by status
+    objects = CollaborationManager(alive_only=False)
+    alive_objects = CollaborationManager(alive_only=True)
+
     name = models.CharField(
         help_text="Give the Collaboration a name e.g. 'Charity Bake Sale'",
         max_length=100,
@@ -45,6 +358,12 @@ class Collaboration(TimeStampedSoftDeleteBase):
         null=True,
     )
 
+    search_vector = SearchVectorField(
+        editable=False,
+        help_text="The searchable text of the collaboration (kept up to date by a database trigger - see search.operations)",
+        null=True,
+    )
+
     created_by = models.ForeignKey(
         "users.User",
         help_text="User who created the collaboration",
@@ -66,12 +385,44 @@ class Collaboration(TimeStampedSoftDeleteBase):
         blank=True,
     )
 
+    # Denormalised progress counters - kept up to date by the elements (see record_element_change), so that
+    # reading a collaboration's progress doesn't need to COUNT its tasks & milestones
+    task_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of tasks in the collaboration",
+    )
+
+    completed_task_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of completed tasks in the collaboration",
+    )
+
+    milestone_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of milestones in the collaboration",
+    )
+
+    elements_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped whenever the collaboration's elements change - the rendered element list is cached against it",
+    )
+
+    chat_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped whenever a message in the collaboration chat is added, edited or deleted (see chat.models.Message)",
+    )
+
     @property
     def status(self) -> str | None:
-        """Determines a collaborations status"""
-        if self.percent_completed == 0:
+        """Determines a collaborations status (see also CollaborationQuerySet.with_progress)"""
+        if self.completed_task_count == 0:
             return c.COLLABORATION_STATUS_PLANNING
-        elif self.percent_completed == 100:
+        elif self.completed_task_count == self.task_count:
             return c.COLLABORATION_STATUS_COMPLETED
         else:
             return c.COLLABORATION_STATUS_ONGOING
@@ -81,31 +432,29 @@ class Collaboration(TimeStampedSoftDeleteBase):
         """
         Gets the total number of tasks
         """
-        return CollaborationTask.objects.filter(collaboration=self).count()
+        return self.task_count
 
     @property
     def number_of_tasks_completed(self) -> int:
         """
         Gets the total number of tasks completed
         """
-        return CollaborationTask.objects.filter(
-            collaboration=self, completed_at__isnull=False
-        ).count()
+        return self.completed_task_count
 
     @property
     def number_of_milestones(self) -> int:
         """
         Gets the total number of milestones
         """
-        return CollaborationMilestone.objects.filter(collaboration=self).count()
+        return self.milestone_count
 
     @property
     def number_of_elements(self) -> int:
         """
         Gets the total number of tasks and milestones
-        IMPORTANT: Used for ordering
+        IMPORTANT: Used to validate the index an element is moved to
         """
-        return self.number_of_tasks + self.number_of_milestones
+        return self.task_count + self.milestone_count
 
     @property
     def percent_completed(self) -> int:
@@ -113,11 +462,189 @@ class Collaboration(TimeStampedSoftDeleteBase):
         Returns the completion percentage, according to how many tasks have been completed,
         and how many remain
         """
-        tasks = CollaborationTask.objects.filter(collaboration=self)
-        if not tasks:
+        if not self.task_count:
             return 0
-        completed_tasks = tasks.filter(completed_at__isnull=False)
-        return int(completed_tasks.count() / tasks.count() * 100)
+        return int(self.completed_task_count / self.task_count * 100)
+
+    @cached_property
+    def task_graph(self):
+        """
+        The dependencies between the collaboration's tasks (see collaborations.utils.TaskGraph), for views and
+        templates e.g. {% if task.pk in collaboration.task_graph.blocked %}
+        """
+        # Imported here, as the utils module imports from this one
+        from collaborations.utils import get_task_graph
+
+        return get_task_graph(self)
+
+    def record_element_change(self, **counter_changes) -> None:
+        """
+        Records a change to the collaboration's elements. This bumps the elements_version (which the rendered element
+        list is cached against) and adjusts any of the denormalised progress counters by the amounts given
+        e.g. record_element_change(task_count=1).
+        The update is done with F expressions, so concurrent changes to the same collaboration don't overwrite each
+        other, and should be called in the same transaction as the change to the elements themselves.
+        The version and counters on this instance are then refreshed, so it can be rendered straight after, and pages
+        following the collaboration are told to fetch the new element list (see collabl.events).
+        """
+        Collaboration.objects.filter(pk=self.pk).update(
+            elements_version=F("elements_version") + 1,
+            **{field: F(field) + change for field, change in counter_changes.items()},
+        )
+        self.refresh_element_state()
+        publish(collaboration_channel(self.pk), EVENT_ELEMENTS)
+        return
+
+    def refresh_element_state(self) -> None:
+        """
+        Refreshes the elements version and progress counters of this instance (and drops its cached task graph).
+        Views which change an element through another instance of the collaboration call this before rendering,
+        so the element list isn't served from the fragment cached against the old version.
+        """
+        self.refresh_from_db(
+            fields=[
+                "elements_version",
+                "task_count",
+                "completed_task_count",
+                "milestone_count",
+            ]
+        )
+        # The task graph is cached against the old version
+        self.__dict__.pop("task_graph", None)
+        return
+
+    def apply_element_operations(self, operations, user=None) -> None:
+        """
+        Applies a batch of operations to the collaboration's elements, in one transaction. Operations are
+        (operation, element pk, argument) tuples, applied in order, e.g.
+            (c.MOVE_ELEMENTS, pk, index) - move the element to the given (zero-indexed) index
+            (c.COMPLETE_TASK, pk, None) / (c.UNDO_COMPLETE_TASK, pk, None) - (un)complete the task, as the given user
+            (c.ASSIGN_TASKS, pk, assignee) - assign the task to the given user (or None to unassign)
+            (c.DELETE_ELEMENTS, pk, None) - delete the element
+        Elements which don't belong to the collaboration are ignored.
+
+        Rather than saving each element (and updating positions, milestone prerequisites and counters as we go), the
+        changes are made with a handful of set-based updates, and positions, prerequisites and counters are
+        recomputed once at the end.
+        """
+        with transaction.atomic():
+            lock_elements(self.pk)
+
+            # 1: Work out the outcome of the operations
+            elements = get_ordered_elements(self.pk)
+            order = [pk for pk, _, _ in elements]
+            positions = {pk: position for pk, _, position in elements}
+            tasks = {
+                pk
+                for pk, element_type, _ in elements
+                if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK
+            }
+            completions, assignments, deletions, moved = {}, {}, set(), False
+
+            for operation, pk, argument in operations:
+                pk = str(pk)
+                if pk not in positions:
+                    continue
+                match operation:
+                    case c.MOVE_ELEMENTS:
+                        order.remove(pk)
+                        order.insert(argument, pk)
+                        moved = True
+                    case c.COMPLETE_TASK | c.UNDO_COMPLETE_TASK if pk in tasks:
+                        completions[pk] = operation == c.COMPLETE_TASK
+                    case c.ASSIGN_TASKS if pk in tasks:
+                        assignments[pk] = argument
+                    case c.DELETE_ELEMENTS:
+                        deletions.add(pk)
+
+            now = timezone.now()
+            task_objects = CollaborationTask.objects.filter(collaboration=self)
+
+            # 2: (Un)complete tasks - as the toggle view does, undoing also clears the completion details
+            task_objects.filter(
+                pk__in=[pk for pk, complete in completions.items() if complete],
+                completed_at__isnull=True,
+            ).update(completed_at=now, completed_by=user, updated_at=now)
+            task_objects.filter(
+                pk__in=[pk for pk, complete in completions.items() if not complete],
+                completed_at__isnull=False,
+            ).update(
+                completed_at=None,
+                completed_by=None,
+                file=None,
+                completion_notes=None,
+                updated_at=now,
+            )
+
+            # 3: Assign tasks (one update per assignee)
+            assignees = defaultdict(list)
+            for pk, assignee in assignments.items():
+                assignees[assignee].append(pk)
+            for assignee, pks in assignees.items():
+                task_objects.filter(pk__in=pks).update(
+                    assigned_to=assignee, updated_at=now
+                )
+
+            # 4: Delete elements
+            if deletions:
+                task_objects.filter(pk__in=deletions).delete()
+                CollaborationMilestone.objects.filter(
+                    collaboration=self, pk__in=deletions
+                ).delete()
+
+            # 5: Respace the positions (if anything moved) and rebuild the milestone prerequisites (if anything
+            # moved or was deleted) - once, for the whole batch
+            if moved:
+                changed_tasks, changed_milestones = [], []
+                for index, pk in enumerate(
+                    [pk for pk in order if pk not in deletions], start=1
+                ):
+                    if positions[pk] == index * c.ELEMENT_POSITION_GAP:
+                        continue
+                    if pk in tasks:
+                        changed_tasks.append(
+                            CollaborationTask(
+                                pk=pk, position=index * c.ELEMENT_POSITION_GAP
+                            )
+                        )
+                    else:
+                        changed_milestones.append(
+                            CollaborationMilestone(
+                                pk=pk, position=index * c.ELEMENT_POSITION_GAP
+                            )
+                        )
+                CollaborationTask.objects.bulk_update(changed_tasks, ["position"])
+                CollaborationMilestone.objects.bulk_update(
+                    changed_milestones, ["position"]
+                )
+
+            if moved or deletions:
+                rebuild_prerequisites(self.pk)
+            elif completions:
+                update_milestone_progress(
+                    CollaborationMilestone.objects.filter(collaboration=self)
+                )
+
+            # 6: Recount the progress counters, and bump the elements version
+            Collaboration.objects.filter(pk=self.pk).update(
+                task_count=count_subquery(CollaborationTask.objects.all()),
+                completed_task_count=count_subquery(
+                    CollaborationTask.objects.filter(completed_at__isnull=False)
+                ),
+                milestone_count=count_subquery(CollaborationMilestone.objects.all()),
+                elements_version=F("elements_version") + 1,
+            )
+            self.refresh_from_db(
+                fields=[
+                    "elements_version",
+                    "task_count",
+                    "completed_task_count",
+                    "milestone_count",
+                ]
+            )
+            publish(collaboration_channel(self.pk), EVENT_ELEMENTS)
+
+        return
 
     @property
     def short_description(self):
@@ -153,6 +680,8 @@ class Collaboration(TimeStampedSoftDeleteBase):
             models.Index(fields=["created_at"]),
             models.Index(fields=["name"]),
             models.Index(fields=["slug"]),
+            models.Index(fields=["related_group", "completed_task_count"]),
+            GinIndex(fields=["search_vector"]),
         ]
         ordering = ["-created_at"]
 
@@ -170,12 +699,19 @@ class CollaborationTask(TimeStampedSoftDeleteBase):
         """
         super().__init__(*args, **kwargs)
         self.__original_position = self.position
+        # We do the same for completion, so the collaboration's counters can be kept up to date
+        # (unless completed_at has been deferred, in which case we leave the counters alone)
+        self.__original_completed = (
+            self.completed_at is not None if "completed_at" in self.__dict__ else None
+        )
 
-    position = models.PositiveSmallIntegerField(
-        help_text="The position of the element (1 = 1st)", blank=True
+    position = models.PositiveIntegerField(
+        help_text="Sparse sort key for the element - lower positions come first",
+        blank=True,
     )
 
     __original_position = None
+    __original_completed = None
 
     reference = models.CharField(
         default="REF",
@@ -203,6 +739,12 @@ class CollaborationTask(TimeStampedSoftDeleteBase):
         max_length=500,
     )
 
+    search_vector = SearchVectorField(
+        editable=False,
+        help_text="The searchable text of the task (kept up to date by a database trigger - see search.operations)",
+        null=True,
+    )
+
     assigned_to = models.ForeignKey(
         "users.User",
         help_text="User who should complete the task",
@@ -275,75 +817,98 @@ class CollaborationTask(TimeStampedSoftDeleteBase):
 
     def insert(self):
         """
-        If the task has been added in between other elements, then we will need to reorder everything
-        afterwards, by adding 1 to their position. We use an F expression, rather than looping,
-        as this results in a single db query.
+        Gives a new task its position. If a position was given, it is treated as the (zero-indexed) index the task
+        should be inserted at, otherwise the task is added at the end.
+        As positions are sparse, we simply pick a position between the new neighbours - no other rows are updated.
         """
-        CollaborationTask.objects.filter(
-            collaboration=self.collaboration, position__gte=self.position
-        ).update(position=F("position") + 1)
-        CollaborationMilestone.objects.filter(
-            collaboration=self.collaboration, position__gte=self.position
-        ).update(position=F("position") + 1)
+        self.position = get_position_for_index(self.collaboration, self.position)
         return
 
-    def reposition(self):
+    def reposition(self, index):
         """
-        If moving to a higher position, we target all elements with a position greater than the
-        '__original_position' of this task, but less than or equal to the new position of this task. from this
-        queryset, we subtract '1' from the position column, making room for our task, and keeping the rest in order.
-        We use an F expression, rather than looping, as this results in a single db query.
+        Moves the task to the given (zero-indexed) index. We pick a position between the task's new neighbours and
+        save, so only this row is updated, rather than every element between the old and new positions.
+        The collaboration's elements are locked while we do so - see lock_elements.
         """
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
 
-        if self.position > self.__original_position:
-            CollaborationTask.objects.filter(
-                collaboration=self.collaboration,
-                position__gt=self.__original_position,
-                position__lte=self.position,
-            ).update(position=F("position") - 1)
-            CollaborationMilestone.objects.filter(
-                collaboration=self.collaboration,
-                position__gt=self.__original_position,
-                position__lte=self.position,
-            ).update(position=F("position") - 1)
+            # Another member may have moved the task since it was loaded
+            self.refresh_from_db(fields=["position"])
+            self.__original_position = self.position
+
+            self.position = get_position_for_index(
+                self.collaboration, index, exclude=self
+            )
+            self.save()
+        return
 
+    def update_milestone(self, previous_position=None):
         """
-        If moving to a lower position, we target all elements with a position lower than the
-        '__original_position' of this task, but greater than or equal to the new position of this task. from
-        this queryset, we add '1' to the position column, making room for our task, and keeping the rest in
-        order. We use an F expression, rather than looping, as this results in a single db query.
+        Keeps the milestone prerequisites in step with the task's position. We work out which milestone segment the
+        task has left and joined (in a single query), and only touch this task's row in the through table - rather
+        than rebuilding the prerequisites of every milestone in the collaboration.
+        If no previous_position is given, the task is treated as new.
         """
+        prerequisites = CollaborationMilestone.prerequisites.through.objects
+
+        if previous_position is None:
+            old_milestone = None
+            ((_, new_milestone),) = get_segment_boundaries(
+                self.collaboration, self.position
+            )
+        else:
+            ((_, old_milestone), (_, new_milestone)) = get_segment_boundaries(
+                self.collaboration, previous_position, self.position
+            )
+
+        if old_milestone == new_milestone:
+            return
+
+        if old_milestone:
+            prerequisites.filter(
+                collaborationmilestone_id=old_milestone, collaborationtask_id=self.pk
+            ).delete()
 
-        if self.position < self.__original_position:
-            CollaborationTask.objects.filter(
-                collaboration=self.collaboration,
-                position__lt=self.__original_position,
-                position__gte=self.position,
-            ).update(position=F("position") + 1)
+        if new_milestone:
+            prerequisites.create(
+                collaborationmilestone_id=new_milestone, collaborationtask_id=self.pk
+            )
+
+        update_milestone_progress(
             CollaborationMilestone.objects.filter(
-                collaboration=self.collaboration,
-                position__lt=self.__original_position,
-                position__gte=self.position,
-            ).update(position=F("position") + 1)
+                pk__in=[pk for pk in (old_milestone, new_milestone) if pk]
+            )
+        )
 
         return
 
     def remove(self):
         """
-        When removing an element from a collaboration, we must also update the position of the other elements to
-        reflect the change
+        Removes the task from the collaboration. Positions are sparse, so the other elements keep theirs, and remain
+        in order.
         """
 
-        CollaborationTask.objects.filter(
-            collaboration=self.collaboration,
-            position__gt=self.position,
-        ).update(position=F("position") - 1)
-        CollaborationMilestone.objects.filter(
-            collaboration=self.collaboration,
-            position__gt=self.position,
-        ).update(position=F("position") - 1)
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
 
-        self.delete()
+            # Check the task's current state - if another member got there first, there is nothing left to count
+            current = (
+                CollaborationTask.objects.filter(pk=self.pk)
+                .values("completed_at")
+                .first()
+            )
+            if current is None:
+                return
+
+            milestones = list(self.milestone.values_list("pk", flat=True))
+            self.delete()
+            update_milestone_progress(
+                CollaborationMilestone.objects.filter(pk__in=milestones)
+            )
+            self.collaboration.record_element_change(
+                task_count=-1, completed_task_count=-1 if current["completed_at"] else 0
+            )
 
         return
 
@@ -351,49 +916,120 @@ class CollaborationTask(TimeStampedSoftDeleteBase):
 
         """
         On save, we need to call some extra functions to ensure the adding/re-ordering of tasks also updates the
-        positions of those around them, and on the milestones which log them.
+        milestones which log them.
         """
 
         # FOR CREATION
         if self._state.adding:
 
-            # 1: Generate Reference & position (if not given)
-            self.reference = self.generate_ref(5)
-            if not self.position:
-                self.position = self.collaboration.number_of_elements
-
-            # 2: If there is a milestone ahead, add this task to the prerequisites
-            if next_milestone := self.next_milestone:
-                next_milestone.set_prerequisites()
+            with transaction.atomic():
 
-            # 3: If the task has been added in between other elements, then we will need to reorder everything
-            # NOTE: This section only gets called if the new task is not placed at the end
-            if self.position < self.collaboration.number_of_elements:
+                # 1: Generate Reference & position (with the collaboration's elements locked - see lock_elements)
+                lock_elements(self.collaboration_id)
+                self.reference = self.generate_ref(5)
                 self.insert()
 
-            return super(CollaborationTask, self).save(*args, **kwargs)
+                # 2: Save item
+                response = super(CollaborationTask, self).save(*args, **kwargs)
+
+                # 3: If there is a milestone ahead, add this task to its prerequisites
+                self.update_milestone()
+
+                # 4: Count the task towards the collaboration's progress
+                self.collaboration.record_element_change(
+                    task_count=1, completed_task_count=1 if self.completed_at else 0
+                )
+                self.__original_completed = self.completed_at is not None
+
+            return response
 
         # FOR EDITING
         else:
 
-            # IF REPOSITIONING
-            if self.position != self.__original_position:
+            with transaction.atomic():
+                lock_elements(self.collaboration_id)
 
-                # Move the other elements
-                self.reposition()
+                # Another member may have moved or (un)completed the task since this instance was loaded, so we
+                # compare against the stored task - and keep its stored position, unless this edit moves it
+                repositioned = self.position != self.__original_position
+                stored = (
+                    CollaborationTask.objects.filter(pk=self.pk)
+                    .values("position", "completed_at")
+                    .first()
+                )
+                if stored is not None:
+                    if not repositioned:
+                        self.position = stored["position"]
+                    self.__original_position = stored["position"]
+                    if self.__original_completed is not None:
+                        self.__original_completed = stored["completed_at"] is not None
+
+                completion_changed = (
+                    self.__original_completed is not None
+                    and (self.completed_at is not None) != self.__original_completed
+                )
 
                 # Update the instance
                 response = super(CollaborationTask, self).save(*args, **kwargs)
 
-                # Update the prerequisites on the milestones
-                for milestone in self.collaboration.milestones.all():
-                    milestone.set_prerequisites()
+                # IF REPOSITIONING - move the task between milestones, if it has crossed one
+                if repositioned:
+                    self.update_milestone(previous_position=self.__original_position)
+                    self.__original_position = self.position
+
+                # IF (UN)COMPLETING - keep the collaboration's progress up to date
+                counter_changes = {}
+                if completion_changed:
+                    counter_changes["completed_task_count"] = (
+                        1 if self.completed_at else -1
+                    )
+                    self.__original_completed = self.completed_at is not None
+                    update_milestone_progress(self.milestone.all())
 
-                # Return response
-                return response
+                # Any edit changes the rendered element list
+                self.collaboration.record_element_change(**counter_changes)
 
-            # For simple edits (no reordering), we just return super().save
-            return super(CollaborationTask, self).save(*args, **kwargs)
+            # Return response
+            return response
+
+    def add_prerequisites(self, *tasks) -> None:
+        """
+        Makes the given tasks prerequisites of this one. They must belong to the same collaboration, and mustn't
+        (directly or indirectly) depend on this task already, as that would create a cycle - a ValidationError is
+        raised if so, and nothing is added.
+        """
+        # Imported here, as the utils module imports from this one
+        from collaborations.utils import TaskGraph
+
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
+
+            # Check against the stored dependencies, rather than a cached graph
+            graph = TaskGraph.load(self.collaboration_id)
+            for task in tasks:
+                if task.collaboration_id != self.collaboration_id:
+                    raise ValidationError(
+                        f"'{task.name}' belongs to another collaboration, so can't be a prerequisite of '{self.name}'"
+                    )
+                if graph.would_create_cycle(self.pk, task.pk):
+                    raise ValidationError(
+                        f"'{task.name}' depends on '{self.name}', so can't also be one of its prerequisites"
+                    )
+                graph.add_edge(self.pk, task.pk)
+
+            self.prerequisites.add(*tasks)
+            self.collaboration.record_element_change()
+
+        return
+
+    def remove_prerequisites(self, *tasks) -> None:
+        """Stops the given tasks being prerequisites of this one"""
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
+            self.prerequisites.remove(*tasks)
+            self.collaboration.record_element_change()
+
+        return
 
     def is_complete(self, *args, **kwargs) -> bool:
         """
@@ -433,8 +1069,17 @@ class CollaborationTask(TimeStampedSoftDeleteBase):
             models.Index(fields=["collaboration"]),
             models.Index(fields=["position"]),
             models.Index(fields=["-position"]),
+            GinIndex(fields=["search_vector"]),
         ]
         ordering = ["collaboration", "position"]
+        # Checked at commit, so renormalising can shuffle positions within a transaction
+        constraints = [
+            models.UniqueConstraint(
+                fields=["collaboration", "position"],
+                name="unique_task_position",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
 
 
 class CollaborationMilestone(TimeStampedSoftDeleteBase):
@@ -456,8 +1101,9 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
         super().__init__(*args, **kwargs)
         self.__original_position = self.position
 
-    position = models.PositiveSmallIntegerField(
-        help_text="The position of the element (1 = 1st)", blank=True
+    position = models.PositiveIntegerField(
+        help_text="Sparse sort key for the element - lower positions come first",
+        blank=True,
     )
 
     __original_position = None
@@ -494,6 +1140,20 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
         blank=True,
     )
 
+    # Progress towards the milestone, kept up to date as its prerequisites change (see update_milestone_progress)
+    completed_count = models.PositiveIntegerField(
+        help_text="Number of prerequisite tasks completed", default=0, editable=False
+    )
+    total_count = models.PositiveIntegerField(
+        help_text="Number of prerequisite tasks", default=0, editable=False
+    )
+    reached_at = models.DateTimeField(
+        help_text="When all of the prerequisite tasks were completed (if they are)",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
     @staticmethod
     def generate_ref(length) -> str:
         """Unique reference auto-generation function"""
@@ -505,7 +1165,7 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
     @property
     def status(self) -> str | None:
         """Determines a milestones status"""
-        if all(task.completed_at for task in self.prerequisites.all()):
+        if self.reached_at:
             return c.MILESTONE_STATUS_REACHED
         elif self.target_date and self.target_date < timezone.now():
             return c.MILESTONE_STATUS_BEHIND_TARGET
@@ -524,48 +1184,19 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
         else:
             return None
 
-    def set_prerequisites(self, *args, **kwargs) -> None:
-        """
-        Logic to set all of the prerequisites required to meet a milestone,
-        and mark the milestone as reached (completed), if they are all complete.
-        """
-        # Check if there are another other milestones before this one
-        if CollaborationMilestone.objects.filter(
-            collaboration=self.collaboration, position__lt=self.position
-        ).exists():
-            previous_milestone_position = (
-                CollaborationMilestone.objects.filter(
-                    collaboration=self.collaboration, position__lt=self.position
-                )
-                .order_by("-position")[0]
-                .position
-            )
-        else:
-            previous_milestone_position = 0
-
-        tasks = CollaborationTask.objects.filter(
-            collaboration=self.collaboration,
-            position__lt=self.position,
-            position__gte=previous_milestone_position,
-        ).order_by("position")
-
-        self.prerequisites.set(tasks)
-
-        return
-
     def tasks_outstanding(self, *args, **kwargs) -> None:
         """
         Logic to count the number of tasks remaining
         """
 
-        return self.prerequisites.filter(completed_at__isnull=True).count()
+        return self.total_count - self.completed_count
 
     def tasks_completed(self, *args, **kwargs) -> None:
         """
         Logic to count the number of tasks completed
         """
 
-        return self.prerequisites.filter(completed_at__isnull=False).count()
+        return self.completed_count
 
     def is_complete(self, *args, **kwargs) -> bool:
         """
@@ -573,144 +1204,186 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
         """
         return self.status == c.MILESTONE_STATUS_REACHED
 
-    def update_next_milestone(self):
+    def claim_prerequisites(self):
         """
-        If there is another milestone after this one, then it will now have some duplicate prerequisite tasks,
-        We need to reset these
+        Takes the tasks between the previous milestone and this one as prerequisites. They currently belong to the
+        milestone after this one (if there is one), so we re-point their through-table rows in a single update, rather
+        than rebuilding the prerequisites of every milestone.
         """
-        if next_milestone := self.next_milestone:
-            next_milestone.set_prerequisites()
+        prerequisites = CollaborationMilestone.prerequisites.through.objects
+        ((previous_position, following_milestone),) = get_segment_boundaries(
+            self.collaboration, self.position, exclude=self
+        )
+
+        if following_milestone:
+            prerequisites.filter(
+                collaborationmilestone_id=following_milestone,
+                collaborationtask__position__lt=self.position,
+            ).update(collaborationmilestone_id=self.pk)
+            update_milestone_progress(
+                CollaborationMilestone.objects.filter(pk=following_milestone)
+            )
+        else:
+            tasks = CollaborationTask.objects.filter(
+                collaboration=self.collaboration, position__lt=self.position
+            )
+            if previous_position is not None:
+                tasks = tasks.filter(position__gt=previous_position)
+            prerequisites.bulk_create(
+                [
+                    prerequisites.model(
+                        collaborationmilestone_id=self.pk, collaborationtask_id=task_id
+                    )
+                    for task_id in tasks.values_list("pk", flat=True)
+                ]
+            )
+
+        update_milestone_progress(CollaborationMilestone.objects.filter(pk=self.pk))
+
         return
 
-    def insert(self):
+    def release_prerequisites(self):
         """
-        If a milestone has been added in between other elements, then we will need to reorder everything
-        afterwards, by adding 1 to their position. We use an F expression, rather than looping,
-        as this results in a single db query.
-        NOTE: This section only gets called if the new milestone is not placed at the end
-        """
-        if (
-            self.position < self.collaboration.number_of_elements - 1
-        ):  # minus this milestone
-            CollaborationTask.objects.filter(
-                collaboration=self.collaboration, position__gte=self.position
-            ).update(position=F("position") + 1)
-            CollaborationMilestone.objects.filter(
-                collaboration=self.collaboration, position__gte=self.position
-            ).update(position=F("position") + 1)
+        Hands this milestone's prerequisites over to the milestone after it (if there is one), as happens when the
+        milestone is moved or removed. This is a single update (or delete) on the through table.
+        """
+        prerequisites = CollaborationMilestone.prerequisites.through.objects.filter(
+            collaborationmilestone_id=self.pk
+        )
+        ((_, following_milestone),) = get_segment_boundaries(
+            self.collaboration, self.__original_position, exclude=self
+        )
+
+        if following_milestone:
+            prerequisites.update(collaborationmilestone_id=following_milestone)
+            update_milestone_progress(
+                CollaborationMilestone.objects.filter(pk=following_milestone)
+            )
+        else:
+            prerequisites.delete()
+
         return
 
-    def reposition(self):
+    def insert(self):
         """
-        If moving to a higher position, we target all elements with a position greater than the
-        '__original_position' of this milestone, but less than or equal to the new position of this milestone.
-        from this queryset, we subtract '1' from the position column, making room for this milestone, and
-        keeping the rest in order. We use an F expression, rather than looping,
-        as this results in a single db query.
+        Gives a new milestone its position. If a position was given, it is treated as the (zero-indexed) index the
+        milestone should be inserted at, otherwise the milestone is added at the end.
+        As positions are sparse, we simply pick a position between the new neighbours - no other rows are updated.
         """
-        if self.position > self.__original_position:
-            CollaborationTask.objects.filter(
-                collaboration=self.collaboration,
-                position__gt=self.__original_position,
-                position__lte=self.position,
-            ).update(position=F("position") - 1)
-            CollaborationMilestone.objects.filter(
-                collaboration=self.collaboration,
-                position__gt=self.__original_position,
-                position__lte=self.position,
-            ).update(position=F("position") - 1)
+        self.position = get_position_for_index(self.collaboration, self.position)
+        return
 
+    def reposition(self, index):
         """
-        If moving to a lower position, we target all elements with a position lower than the
-        '__original_position' of this milestone, but greater than or equal to the new position of this
-        milestone. from this queryset, we add '1' to the position column, making room for our milestone,
-        and keeping the rest in order. We use an F expression, rather than looping,
-        as this results in a single db query.
+        Moves the milestone to the given (zero-indexed) index. We pick a position between the milestone's new
+        neighbours and save, so only this row is updated, rather than every element between the old and new positions.
+        The collaboration's elements are locked while we do so - see lock_elements.
         """
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
 
-        if self.position < self.__original_position:
-            CollaborationTask.objects.filter(
-                collaboration=self.collaboration,
-                position__lt=self.__original_position,
-                position__gte=self.position,
-            ).update(position=F("position") + 1)
-            CollaborationMilestone.objects.filter(
-                collaboration=self.collaboration,
-                position__lt=self.__original_position,
-                position__gte=self.position,
-            ).update(position=F("position") + 1)
+            # Another member may have moved the milestone since it was loaded
+            self.refresh_from_db(fields=["position"])
+            self.__original_position = self.position
 
+            self.position = get_position_for_index(
+                self.collaboration, index, exclude=self
+            )
+            self.save()
         return
 
     def remove(self):
         """
-        When removing an element from a collaboration, we must also update the position of the other elements to
-        reflect the change
+        Removes the milestone from the collaboration, handing its prerequisites on to the next milestone.
+        Positions are sparse, so the other elements keep theirs, and remain in order.
         """
 
-        CollaborationTask.objects.filter(
-            collaboration=self.collaboration,
-            position__gt=self.position,
-        ).update(position=F("position") - 1)
-        CollaborationMilestone.objects.filter(
-            collaboration=self.collaboration,
-            position__gt=self.position,
-        ).update(position=F("position") - 1)
+        with transaction.atomic():
+            lock_elements(self.collaboration_id)
 
-        self.delete()
+            # If another member got there first, there is nothing left to count. Otherwise, the milestone may have
+            # been moved (or the collaboration respaced) since this instance was loaded, so its prerequisites are
+            # handed on from its stored position
+            stored_position = (
+                CollaborationMilestone.objects.filter(pk=self.pk)
+                .values_list("position", flat=True)
+                .first()
+            )
+            if stored_position is None:
+                return
+            self.__original_position = stored_position
+
+            self.release_prerequisites()
+            self.delete()
+            self.collaboration.record_element_change(milestone_count=-1)
 
         return
 
     def save(self, *args, **kwargs) -> None:
         """
         On save, we need to add a reference, attach the prerequisite tasks by many-to-many and call some extra functions
-        to ensure the adding/re-ordering of tasks also updates the positions of those around them,
-        and on the milestones which log them.
+        to ensure the adding/re-ordering of milestones also updates the milestones around them.
         """
 
         # FOR CREATION
         if self._state.adding:
 
-            # 1: Generate Reference & position (if not given)
-            self.reference = self.generate_ref(5)
-            if not self.position:
-                self.position = self.collaboration.number_of_elements
+            with transaction.atomic():
 
-            # 2: Save item
-            response = super(CollaborationMilestone, self).save(*args, **kwargs)
+                # 1: Generate Reference & position (with the collaboration's elements locked - see lock_elements)
+                lock_elements(self.collaboration_id)
+                self.reference = self.generate_ref(5)
+                self.insert()
 
-            # 3: Set the prerequisite tasks for completion of this milestone
-            self.set_prerequisites()
+                # 2: Save item
+                response = super(CollaborationMilestone, self).save(*args, **kwargs)
 
-            # 4: Move the other elements (if required)
-            self.insert()
+                # 3: Take the prerequisite tasks for this milestone (from the next milestone, if there is one)
+                self.claim_prerequisites()
 
-            # 5: Update the prerequisite tasks for the next milestone (if required)
-            self.update_next_milestone()
+                # 4: Count the milestone on the collaboration
+                self.collaboration.record_element_change(milestone_count=1)
 
             return response
 
         # FOR EDITING
         else:
 
-            # IF REPOSITIONING
-            if self.position != self.__original_position:
+            with transaction.atomic():
+                lock_elements(self.collaboration_id)
+
+                # Another member may have moved the milestone since this instance was loaded (or the collaboration
+                # may have been respaced, even while this edit worked out its new position - see
+                # get_position_for_index), so we hand over the prerequisites from the stored position - and keep it,
+                # unless this edit moves the milestone
+                repositioned = self.position != self.__original_position
+                stored_position = (
+                    CollaborationMilestone.objects.filter(pk=self.pk)
+                    .values_list("position", flat=True)
+                    .first()
+                )
+                if stored_position is not None:
+                    if not repositioned:
+                        self.position = stored_position
+                    self.__original_position = stored_position
 
-                # Move the other elements (if required)
-                self.reposition()
+                # IF REPOSITIONING - hand the current prerequisites to the next milestone, before leaving
+                if repositioned:
+                    self.release_prerequisites()
 
                 # Update the instance
                 response = super(CollaborationMilestone, self).save(*args, **kwargs)
 
-                # Update the prerequisites on the milestones
-                for milestone in self.collaboration.milestones.all():
-                    milestone.set_prerequisites()
+                # Take the prerequisites at the new position
+                if repositioned:
+                    self.__original_position = self.position
+                    self.claim_prerequisites()
 
-                # Return response
-                return response
+                # Any edit changes the rendered element list
+                self.collaboration.record_element_change()
 
-            # For simple edits (no reordering), we just return super().save
-            return super(CollaborationMilestone, self).save(*args, **kwargs)
+            # Return response
+            return response
 
     def __str__(self):
         """
@@ -718,13 +1391,7 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
         That said, we may be able to find more efficient ways of doing this in terms of database queries
         """
 
-        prerequisite_tasks = self.prerequisites.all()
-
-        completed_prerequisite_tasks = prerequisite_tasks.filter(
-            completed_at__isnull=False
-        )
-
-        return f"Milestone - {self.name} ({completed_prerequisite_tasks.count()} of {prerequisite_tasks.count()} complete)"
+        return f"Milestone - {self.name} ({self.completed_count} of {self.total_count} complete)"
 
     class Meta:
         verbose_name_plural = "Milestones"
@@ -734,5 +1401,15 @@ class CollaborationMilestone(TimeStampedSoftDeleteBase):
             models.Index(fields=["collaboration"]),
             models.Index(fields=["position"]),
             models.Index(fields=["-position"]),
+            models.Index(fields=["collaboration", "reached_at"]),
+            models.Index(fields=["reached_at"]),
         ]
         ordering = ["collaboration", "position"]
+        # Checked at commit, so renormalising can shuffle positions within a transaction
+        constraints = [
+            models.UniqueConstraint(
+                fields=["collaboration", "position"],
+                name="unique_milestone_position",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
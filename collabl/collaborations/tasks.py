@@ -0,0 +1,25 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+from collaborations.models import renormalise_positions
+
+logger = get_task_logger(__name__)
+
+
+@shared_task()
+def renormalise_element_positions(collaboration_id) -> int:
+    """
+    Respaces the positions of a collaboration's elements, once the gaps between them start to run out.
+    Queued (using .delay()) by collaborations.models.get_position_for_index
+    """
+    logger.info(
+        f"Renormalising element positions for collaboration {collaboration_id}..."
+    )
+
+    updated = renormalise_positions(collaboration_id)
+
+    logger.info(
+        f"Renormalised {updated} element positions for collaboration {collaboration_id}"
+    )
+
+    return updated
@@ -19,6 +19,8 @@ from django.urls import path
 from chat.views_htmx import (
     collaboration_message_create_view,
     collaboration_message_delete_view,
+    collaboration_message_page_view,
+    collaboration_message_changes_view,
     collaboration_message_update_view,
 )
 from collaborations.views import CollaborationDetailView
@@ -32,6 +34,8 @@ from .views_htmx import (
     collaboration_milestone_delete_view,
     collaboration_task_move_view,
     collaboration_milestone_move_view,
+    collaboration_element_batch_view,
+    collaboration_element_list_view,
     collaboration_task_notes_view,
     collaboration_update_view,
     collaboration_image_view,
@@ -110,11 +114,31 @@ urlpatterns = [
         collaboration_milestone_move_view,
         name="collaboration-milestone-move",
     ),
+    path(
+        "collaborations/<slug>/elements/batch",
+        collaboration_element_batch_view,
+        name="collaboration-element-batch",
+    ),
+    path(
+        "collaborations/<slug>/elements",
+        collaboration_element_list_view,
+        name="collaboration-element-list",
+    ),
     path(
         "collaborations/<slug>/messages",
         collaboration_message_create_view,
         name="collaboration-message-create",
     ),
+    path(
+        "collaborations/<slug>/messages/changes",
+        collaboration_message_changes_view,
+        name="collaboration-message-changes",
+    ),
+    path(
+        "collaborations/<slug>/messages/older",
+        collaboration_message_page_view,
+        name="collaboration-message-page",
+    ),
     path(
         "collaborations/<slug>/messages/<pk>",
         collaboration_message_update_view,
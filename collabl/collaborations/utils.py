@@ -1,32 +1,511 @@
-from collaborations.models import CollaborationTask, CollaborationMilestone
-from itertools import chain
+import heapq
+from collections import defaultdict
 
-from django.db.models import F
-from django.db.models import Value, CharField
+from collaborations import constants as c
+from collaborations.models import (
+    Collaboration,
+    CollaborationTask,
+    CollaborationMilestone,
+    count_subquery,
+    get_segment_boundaries,
+    update_milestone_progress,
+)
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models import Value, CharField, DateTimeField, IntegerField, UUIDField
 from django.db.models.expressions import Window
-from django.db.models.functions import Rank
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce, Rank
+from django.utils.functional import SimpleLazyObject, cached_property
+
+
+class TaskElement:
+    """
+    A lightweight, read-only task row, as rendered in the collaboration's element list
+    (see get_all_elements). It has the attributes the element templates need, and nothing else.
+    """
+
+    __slots__ = (
+        "pk",
+        "position",
+        "number",
+        "name",
+        "description",
+        "completion_notes",
+        "completed_at",
+        "completed_by_id",
+        "completed_by_name",
+        "assigned_to_id",
+        "assigned_to_name",
+        "file_name",
+    )
+
+    type = c.COLLABORATION_ELEMENT_TYPE_TASK
+
+    def __init__(
+        self,
+        pk,
+        position,
+        number,
+        name,
+        description,
+        completion_notes,
+        completed_at,
+        completed_by_id,
+        completed_by_name,
+        assigned_to_id,
+        assigned_to_name,
+        file_name,
+    ):
+        self.pk = pk
+        self.position = position
+        self.number = number
+        self.name = name
+        self.description = description
+        self.completion_notes = completion_notes
+        self.completed_at = completed_at
+        self.completed_by_id = completed_by_id
+        self.completed_by_name = completed_by_name
+        self.assigned_to_id = assigned_to_id
+        self.assigned_to_name = assigned_to_name
+        self.file_name = file_name
+
+    @property
+    def id(self):
+        return self.pk
+
+    @property
+    def file(self) -> FieldFile | None:
+        """The task's file (if it has one), so that templates can use file.url as they would on the model"""
+        if not self.file_name:
+            return None
+        return FieldFile(
+            None, CollaborationTask._meta.get_field("file"), self.file_name
+        )
 
+    def is_complete(self) -> bool:
+        return self.completed_at is not None
 
-def get_all_elements(collaboration):
+
+class MilestoneElement:
     """
-    This function works in three steps to produce a combined, ordered list of Tasks & Milestones
+    A lightweight, read-only milestone row, as rendered in the collaboration's element list
+    (see get_all_elements). The prerequisite counts are those stored on the milestone.
     """
 
-    # 1. Get all Tasks, and annotate them with the type ('Task'), and their task number - which is determined by their
-    # position in relation to the other tasks, rather than by their 'position' field, which orders them according to
-    # position with milestones also (and is zero indexed.)
-    tasks = CollaborationTask.objects.filter(collaboration=collaboration).annotate(
-        type=Value("Task", output_field=CharField()),
-        number=Window(expression=Rank(), order_by=F("position").asc()),
+    __slots__ = (
+        "pk",
+        "position",
+        "name",
+        "target_date",
+        "tasks_completed",
+        "tasks_total",
+    )
+
+    type = c.COLLABORATION_ELEMENT_TYPE_MILESTONE
+
+    def __init__(self, pk, position, name, target_date, tasks_completed, tasks_total):
+        self.pk = pk
+        self.position = position
+        self.name = name
+        self.target_date = target_date
+        self.tasks_completed = tasks_completed
+        self.tasks_total = tasks_total
+
+    @property
+    def id(self):
+        return self.pk
+
+    def is_complete(self) -> bool:
+        return self.tasks_completed == self.tasks_total
+
+
+def count_before(queryset, collaboration):
+    """Returns a subquery counting the collaboration's rows in the queryset which come before the current element"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(
+                collaboration=collaboration, position__lt=OuterRef("position")
+            )
+            .order_by()
+            .values("collaboration")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def get_element_querysets(collaboration, task_number):
+    """
+    Returns querysets of the collaboration's Tasks & Milestones, annotated with the same columns (in the same order),
+    with NULLs for the columns that don't apply to them, so that they can be combined with a UNION ALL.
+    The assignee names are joined in the database, and milestone progress is read off the milestone rows.
+    """
+
+    # 1. Tasks, with their task number - which is determined by their position in relation to the other tasks,
+    # rather than amongst the milestones too
+    tasks = (
+        CollaborationTask.objects.filter(collaboration=collaboration)
+        .order_by()
+        .annotate(
+            element_type=Value(
+                c.COLLABORATION_ELEMENT_TYPE_TASK, output_field=CharField()
+            ),
+            element_id=F("id"),
+            element_position=F("position"),
+            element_number=task_number,
+            element_name=F("name"),
+            element_description=F("description"),
+            element_completion_notes=F("completion_notes"),
+            element_completed_at=F("completed_at"),
+            element_completed_by_id=F("completed_by_id"),
+            element_completed_by_name=F("completed_by__first_name"),
+            element_assigned_to_id=F("assigned_to_id"),
+            element_assigned_to_name=F("assigned_to__first_name"),
+            element_file=F("file"),
+            element_target_date=Value(None, output_field=DateTimeField()),
+            element_tasks_completed=Value(None, output_field=IntegerField()),
+            element_tasks_total=Value(None, output_field=IntegerField()),
+        )
+    )
+
+    # 2. Milestones, with the number of prerequisite tasks (and how many of them are complete), as stored on them
+    milestones = (
+        CollaborationMilestone.objects.filter(collaboration=collaboration)
+        .order_by()
+        .annotate(
+            element_type=Value(
+                c.COLLABORATION_ELEMENT_TYPE_MILESTONE, output_field=CharField()
+            ),
+            element_id=F("id"),
+            element_position=F("position"),
+            element_number=Value(None, output_field=IntegerField()),
+            element_name=F("name"),
+            element_description=Value(None, output_field=CharField()),
+            element_completion_notes=Value(None, output_field=CharField()),
+            element_completed_at=Value(None, output_field=DateTimeField()),
+            element_completed_by_id=Value(None, output_field=UUIDField()),
+            element_completed_by_name=Value(None, output_field=CharField()),
+            element_assigned_to_id=Value(None, output_field=UUIDField()),
+            element_assigned_to_name=Value(None, output_field=CharField()),
+            element_file=Value(None, output_field=CharField()),
+            element_target_date=F("target_date"),
+            element_tasks_completed=F("completed_count"),
+            element_tasks_total=F("total_count"),
+        )
+    )
+
+    return tasks, milestones
+
+
+def build_element(row):
+    """Builds a TaskElement or MilestoneElement from a row selected by the get_element_querysets querysets"""
+    (
+        element_type,
+        pk,
+        position,
+        number,
+        name,
+        description,
+        completion_notes,
+        completed_at,
+        completed_by_id,
+        completed_by_name,
+        assigned_to_id,
+        assigned_to_name,
+        file_name,
+        target_date,
+        tasks_completed,
+        tasks_total,
+    ) = row
+
+    if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK:
+        return TaskElement(
+            pk,
+            position,
+            number,
+            name,
+            description,
+            completion_notes,
+            completed_at,
+            completed_by_id,
+            completed_by_name,
+            assigned_to_id,
+            assigned_to_name,
+            file_name,
+        )
+    return MilestoneElement(
+        pk, position, name, target_date, tasks_completed, tasks_total
+    )
+
+
+def get_all_elements(collaboration) -> list:
+    """
+    Produces a combined, ordered list of the collaboration's Tasks & Milestones, in a single UNION ALL query
+    (see get_element_querysets). Each row is returned as a TaskElement or MilestoneElement, rather than as a
+    model instance.
+    """
+    tasks, milestones = get_element_querysets(
+        collaboration,
+        task_number=Window(expression=Rank(), order_by=F("position").asc()),
+    )
+
+    # Union them, ordered by their position field, and build the rows
+    columns = list(tasks.query.annotations)
+    rows = (
+        tasks.values_list(*columns)
+        .union(milestones.values_list(*columns), all=True)
+        .order_by("element_position")
+    )
+
+    return [build_element(row) for row in rows]
+
+
+def get_elements(collaboration, *pks) -> list:
+    """
+    Gets just the given elements (Tasks and/or Milestones) of a collaboration, in a single UNION ALL query, for
+    re-rendering them on their own. As they are rendered outside of the full list, each is returned with its
+    counter (its 1-indexed place in the list), as a tuple of (element, counter).
+    """
+    tasks, milestones = get_element_querysets(
+        collaboration,
+        task_number=count_before(CollaborationTask.objects.all(), collaboration) + 1,
     )
 
-    # 2. Get all Milestones, and annotate them with the type ('Milestone')
-    milestones = CollaborationMilestone.objects.filter(
-        collaboration=collaboration
-    ).annotate(type=Value("Milestone", output_field=CharField()))
+    elements_before = count_before(
+        CollaborationTask.objects.all(), collaboration
+    ) + count_before(CollaborationMilestone.objects.all(), collaboration)
+    tasks = tasks.filter(pk__in=pks).annotate(element_index=elements_before)
+    milestones = milestones.filter(pk__in=pks).annotate(element_index=elements_before)
 
-    # 3. Chain the lists together, and sort them by their position field (in reverse)
-    element_list = sorted(
-        chain(tasks, milestones), key=lambda element: element.position
+    columns = list(tasks.query.annotations)
+    rows = (
+        tasks.values_list(*columns)
+        .union(milestones.values_list(*columns), all=True)
+        .order_by("element_position")
     )
-    return element_list
+
+    return [(build_element(row[:-1]), row[-1] + 1) for row in rows]
+
+
+def get_task_change_context(collaboration, task) -> dict:
+    """
+    Gets the context needed to re-render a task which has changed, rather than the whole element list
+    (see elements/list/changes.html). The task's milestone and any tasks which depend on it are re-rendered too,
+    along with the progress widgets, as they show the task's progress.
+    """
+    ((_, milestone_pk),) = get_segment_boundaries(collaboration, task.position)
+    # Tasks which depend on this one may have been blocked or unblocked by it
+    dependant_pks = collaboration.task_graph.dependants[task.pk]
+
+    elements = {
+        element.pk: (element, counter)
+        for element, counter in get_elements(
+            collaboration, *filter(None, [task.pk, milestone_pk, *dependant_pks])
+        )
+    }
+    task_element, task_counter = elements.pop(task.pk)
+    milestone_element, milestone_counter = elements.pop(milestone_pk, (None, None))
+
+    return {
+        "task_element": task_element,
+        "task_counter": task_counter,
+        "milestone_element": milestone_element,
+        "milestone_counter": milestone_counter,
+        "dependant_elements": list(elements.values()),
+        "element_count": collaboration.number_of_elements,
+    }
+
+
+def get_lazy_elements(collaboration):
+    """
+    Returns the collaboration's elements (see get_all_elements) lazily, so the query only runs if the element list
+    actually has to be rendered, rather than being served from the fragment cache.
+    """
+    return SimpleLazyObject(lambda: get_all_elements(collaboration))
+
+
+def reconcile_progress_counters(collaborations=None) -> int:
+    """
+    Recounts the tasks & milestones of the given collaborations (or all of them), and repairs any denormalised
+    progress counters which have drifted (e.g. after elements were deleted in bulk, or through the admin), along with
+    their milestones' progress.
+    Collaborations are reconciled RECONCILE_BATCH_SIZE at a time, each batch in its own transaction with the
+    collaborations locked (as every element change does - see lock_elements), so no element can be added, removed or
+    (un)completed between the counts and the writes. The counts are then made by the same set-based UPDATE which
+    writes them, and only the collaborations which have drifted are written.
+    Returns the number of collaborations repaired.
+    """
+    if collaborations is None:
+        collaborations = Collaboration.objects.all()
+
+    counts = {
+        "task_count": count_subquery(CollaborationTask.objects.all()),
+        "completed_task_count": count_subquery(
+            CollaborationTask.objects.filter(completed_at__isnull=False)
+        ),
+        "milestone_count": count_subquery(CollaborationMilestone.objects.all()),
+    }
+    drifted = Q()
+    for field, count in counts.items():
+        drifted |= ~Q(**{field: count})
+
+    pks = list(collaborations.order_by("pk").values_list("pk", flat=True))
+    repaired = 0
+    for start in range(0, len(pks), c.RECONCILE_BATCH_SIZE):
+        batch = pks[start : start + c.RECONCILE_BATCH_SIZE]
+        with transaction.atomic():
+            # Locked in pk order, so batches don't deadlock with each other
+            list(
+                Collaboration.objects.select_for_update()
+                .filter(pk__in=batch)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+
+            # The cached element lists of drifted collaborations can't be trusted either
+            repaired += (
+                Collaboration.objects.filter(pk__in=batch)
+                .filter(drifted)
+                .update(**counts, elements_version=F("elements_version") + 1)
+            )
+
+            # The milestones' progress is recounted too (those which are still reached keep their reached_at)
+            update_milestone_progress(
+                CollaborationMilestone.objects.filter(collaboration_id__in=batch)
+            )
+
+    return repaired
+
+
+class TaskGraph:
+    """
+    An in-memory index of the dependencies between a collaboration's tasks (CollaborationTask.prerequisites), which
+    answers "which tasks can start now?" and "how long is the critical path?" without a query per edge.
+    It is loaded with one query for the tasks, and one for the through-table (see TaskGraph.load), and is usually
+    fetched from the cache with get_task_graph.
+    """
+
+    def __init__(self, tasks, edges):
+        """
+        tasks - (pk, is complete) for each of the collaboration's tasks, in position order
+        edges - (task pk, prerequisite pk) for each of the dependencies between them
+        """
+        self.order = {pk: index for index, (pk, _) in enumerate(tasks)}
+        self.completed = {pk for pk, complete in tasks if complete}
+        self.prerequisites = defaultdict(set)
+        self.dependants = defaultdict(set)
+        for task, prerequisite in edges:
+            self.add_edge(task, prerequisite)
+
+    @classmethod
+    def load(cls, collaboration_id):
+        """Loads the graph of a collaboration's tasks, in two queries"""
+        tasks = (
+            CollaborationTask.objects.filter(collaboration_id=collaboration_id)
+            .order_by("position")
+            .values_list("pk", "completed_at")
+        )
+        edges = CollaborationTask.prerequisites.through.objects.filter(
+            from_collaborationtask__collaboration_id=collaboration_id
+        ).values_list("from_collaborationtask_id", "to_collaborationtask_id")
+
+        return cls(
+            [(pk, completed_at is not None) for pk, completed_at in tasks], edges
+        )
+
+    def add_edge(self, task, prerequisite) -> None:
+        self.prerequisites[task].add(prerequisite)
+        self.dependants[prerequisite].add(task)
+
+    def all_prerequisites(self, task) -> set:
+        """Every task that the given task depends on, directly or indirectly"""
+        found, stack = set(), [task]
+        while stack:
+            for prerequisite in self.prerequisites[stack.pop()]:
+                if prerequisite not in found:
+                    found.add(prerequisite)
+                    stack.append(prerequisite)
+        return found
+
+    def would_create_cycle(self, task, prerequisite) -> bool:
+        """Checks if making prerequisite a prerequisite of task would make a task (indirectly) depend on itself"""
+        return task == prerequisite or task in self.all_prerequisites(prerequisite)
+
+    @cached_property
+    def topological_order(self) -> list:
+        """
+        The tasks in an order where every task comes after its prerequisites - ties are broken by position, so this
+        stays as close to the collaboration's own order as possible. Any tasks caught in a cycle are left out
+        (see has_cycle).
+        """
+        waiting = {
+            task: len(self.prerequisites[task] & self.order.keys())
+            for task in self.order
+        }
+        available = [
+            (self.order[task], task) for task, count in waiting.items() if not count
+        ]
+        heapq.heapify(available)
+
+        ordered = []
+        while available:
+            _, task = heapq.heappop(available)
+            ordered.append(task)
+            for dependant in self.dependants[task]:
+                waiting[dependant] -= 1
+                if not waiting[dependant]:
+                    heapq.heappush(available, (self.order[dependant], dependant))
+
+        return ordered
+
+    @property
+    def has_cycle(self) -> bool:
+        return len(self.topological_order) < len(self.order)
+
+    @cached_property
+    def ready(self) -> frozenset:
+        """The incomplete tasks which can be started now, as all of their prerequisites are complete"""
+        return frozenset(
+            task
+            for task in self.order
+            if task not in self.completed and self.prerequisites[task] <= self.completed
+        )
+
+    @cached_property
+    def blocked(self) -> frozenset:
+        """The incomplete tasks which are waiting on at least one incomplete prerequisite"""
+        return frozenset(self.order.keys() - self.completed - self.ready)
+
+    @cached_property
+    def critical_path_length(self) -> int:
+        """The number of incomplete tasks in the longest chain of dependencies still to be worked through"""
+        lengths = {}
+        for task in self.topological_order:
+            if task in self.completed:
+                continue
+            lengths[task] = 1 + max(
+                (
+                    lengths.get(prerequisite, 0)
+                    for prerequisite in self.prerequisites[task]
+                ),
+                default=0,
+            )
+        return max(lengths.values(), default=0)
+
+
+def get_task_graph(collaboration) -> TaskGraph:
+    """
+    Returns the collaboration's TaskGraph from the cache, loading it if needed. It is cached against the
+    collaboration's elements_version, which is bumped by any change to its tasks (including completions) or to the
+    dependencies between them - so a stale graph is never served.
+    """
+    key = f"task_graph:{collaboration.pk}:{collaboration.elements_version}"
+    graph = cache.get(key)
+    if graph is None:
+        graph = TaskGraph.load(collaboration.pk)
+        cache.set(key, graph)
+    return graph
@@ -4,9 +4,10 @@ from django.views.generic import DetailView
 from django.views.generic.edit import FormMixin
 
 from chat.forms import CollaborationMessageForm
-from chat.models import Message
+from chat.utils import get_message_page, mark_chat_read
 from collaborations.models import Collaboration
-from collaborations.utils import get_all_elements
+from collaborations.utils import get_lazy_elements
+from groups.utils import user_has_active_membership
 from groups.views import get_membership_level
 
 
@@ -20,6 +21,7 @@ class CollaborationDetailView(FormMixin, DetailView):
 
     template_name = "app/collaborations/main.html"
     model = Collaboration
+    queryset = Collaboration.alive_objects.all()
     form_class = CollaborationMessageForm
     http_method_names = ["get", "post"]
 
@@ -36,17 +38,20 @@ class CollaborationDetailView(FormMixin, DetailView):
 
         if self.request.user.is_authenticated:
             membership_level = get_membership_level(self.request.user, group)
+            # Only members have unread counts to clear - a visitor reading the chat would just add a read cursor
+            if user_has_active_membership(self.request.user, group):
+                mark_chat_read(self.request.user, collaboration)
         else:
             membership_level = None
 
         context.update(
             {
                 "membership_level": membership_level,
-                "chat_messages": Message.objects.filter(collaboration=collaboration),
+                **get_message_page(collaboration),
                 "chat_form": CollaborationMessageForm(
                     initial={"collaboration": collaboration}
                 ),
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "collaboration": collaboration,
             },
         )
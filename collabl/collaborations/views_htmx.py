@@ -16,14 +16,17 @@ from collaborations.forms import (
     CollaborationForm,
     CollaborationImageForm,
     CollaborationCreateFormWithGroupSelection,
+    ElementBatchForm,
 )
 from collaborations.models import (
     Collaboration,
     CollaborationTask,
     CollaborationMilestone,
 )
-from collaborations.utils import get_all_elements
+from collaborations.utils import get_lazy_elements, get_task_change_context
+from collabl.deletion import tombstone_collaboration
 from collabl.settings import SITE_PROTOCOL, SITE_DOMAIN
+from collabl.tasks import purge_collaboration
 from groups.constants import MEMBERSHIP_STATUS_ADMIN
 from groups.models import Group
 from groups.utils import (
@@ -44,7 +47,7 @@ def group_collaboration_create_view(request, slug):
 
     # Get Data
     form = CollaborationForm(request.POST or None)
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
 
     # Check permissions
     if not user_is_admin(request.user, group):
@@ -118,7 +121,7 @@ def collaboration_delete_view(request, slug):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
 
     # Check permissions
     if not user_is_admin(request.user, collaboration.related_group):
@@ -126,7 +129,8 @@ def collaboration_delete_view(request, slug):
 
     # If POST, process the delete operation
     if request.method == "POST":
-        collaboration.delete()
+        tombstone_collaboration(collaboration)
+        purge_collaboration.delay(str(collaboration.pk))
         messages.success(request, "Collaboration Removed")
         return HttpResponseRedirect(
             reverse_lazy(
@@ -156,7 +160,7 @@ def collaboration_update_view(request, slug):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
     form = CollaborationForm(request.POST or None, instance=collaboration)
 
     # Check permissions
@@ -197,7 +201,7 @@ def collaboration_image_view(request, slug):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
     form = CollaborationImageForm(
         request.POST or None, request.FILES or None, instance=collaboration
     )
@@ -239,7 +243,7 @@ def collaboration_task_create_view(request, slug):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
     form = TaskForm(request.POST or None, initial={"collaboration": collaboration})
 
     # Check permissions
@@ -256,7 +260,7 @@ def collaboration_task_create_view(request, slug):
             request,
             "app/collaborations/partials/elements/list/main.html",
             {
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "collaboration": collaboration,
                 "membership_level": get_membership_level(request.user, collaboration.related_group),
             },
@@ -267,7 +271,7 @@ def collaboration_task_create_view(request, slug):
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "task_creation_modal": True,
             "form": form,
@@ -281,13 +285,15 @@ def collaboration_task_create_view(request, slug):
 def collaboration_task_update_view(request, slug, pk):
     """
     HTMX VIEW - Allows task updates with update and no reload
-    Sends back a list of elements, to replace the content in #element_list
+    On GET, sends back a list of elements, to replace the content in #element_list
+    On POST, sends back just the task, to replace its element, with its milestone and the progress widgets swapped in
+    out of band (see elements/list/changes.html)
     If "task_update_modal": True is in the context (and the form), a modal will be rendered (with error messages, if appropriate)
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    task = get_object_or_404(CollaborationTask, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    task = get_object_or_404(CollaborationTask, pk=pk, collaboration=collaboration)
     form = TaskUpdateForm(
         request.POST or None, initial={"collaboration": collaboration}, instance=task
     )
@@ -296,25 +302,31 @@ def collaboration_task_update_view(request, slug, pk):
     if not user_has_active_membership(request.user, collaboration.related_group):
         return HttpResponseForbidden()
 
-    # If POST, update the task and then the state of the collaboration
-    if request.method == "POST" and form.is_valid():
-        form.save()
+    # If POST, update the task, and send back the task, along with the milestone and progress which depend on it
+    if request.method == "POST":
+        context = {
+            "collaboration": collaboration,
+            "membership_level": get_membership_level(request.user, collaboration.related_group),
+        }
+
+        # If invalid data is posted, send the Update Modal back with the task, to show the errors
+        if form.is_valid():
+            form.save()
+            collaboration.refresh_element_state()
+        else:
+            context.update({"element_modal": "task_update", "task": task, "form": form})
+
+        context.update(get_task_change_context(collaboration, task))
         return render(
-            request,
-            "app/collaborations/partials/elements/list/main.html",
-            {
-                "elements": get_all_elements(collaboration),
-                "collaboration": collaboration,
-                "membership_level": get_membership_level(request.user, collaboration.related_group),
-            },
+            request, "app/collaborations/partials/elements/list/changes.html", context
         )
 
-    # If GET, (or invalid data is posted) send back the Update Modal
+    # If GET, send back the Update Modal
     return render(
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "task_update_modal": True,
             "task": task,
@@ -329,39 +341,49 @@ def collaboration_task_update_view(request, slug, pk):
 def collaboration_task_notes_view(request, slug, pk):
     """
     HTMX VIEW - Allows task notes to be given with update and no reload
-    Sends back a list of elements, to replace the content in #element_list
+    On GET, sends back a list of elements, to replace the content in #element_list
+    On POST, sends back just the task, to replace its element, with its milestone and the progress widgets swapped in
+    out of band (see elements/list/changes.html)
     If "task_completion_notes_modal": True is in the context (and the form), a modal will be
     rendered (with error messages, if appropriate)
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    task = get_object_or_404(CollaborationTask, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    task = get_object_or_404(CollaborationTask, pk=pk, collaboration=collaboration)
     form = TaskCompleteForm(request.POST, request.FILES, instance=task)
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
         return HttpResponseForbidden()
 
-    # If POST, update the task and then the state of the collaboration
-    if request.method == "POST" and form.is_valid():
-        form.save()
+    # If POST, update the task, and send back the task, along with the milestone and progress which depend on it
+    if request.method == "POST":
+        context = {
+            "collaboration": collaboration,
+            "membership_level": get_membership_level(request.user, collaboration.related_group),
+        }
+
+        # If invalid data is posted, send the Modal back with the task, to show the errors
+        if form.is_valid():
+            form.save()
+            collaboration.refresh_element_state()
+        else:
+            context.update(
+                {"element_modal": "task_completion", "task": task, "form": form}
+            )
+
+        context.update(get_task_change_context(collaboration, task))
         return render(
-            request,
-            "app/collaborations/partials/elements/list/main.html",
-            {
-                "elements": get_all_elements(collaboration),
-                "collaboration": collaboration,
-                "membership_level": get_membership_level(request.user, collaboration.related_group),
-            },
+            request, "app/collaborations/partials/elements/list/changes.html", context
         )
 
-    # If GET, (or invalid data is posted) send back the Modal
+    # If GET, send back the Modal
     return render(
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "task_completion_notes_modal": True,
             "task": task,
@@ -380,11 +402,13 @@ def collaboration_task_notes_view(request, slug, pk):
 def collaboration_task_toggle_view(request, slug, pk, status):
     """
     HTMX VIEW - Allows completion of tasks with one click and no reload
+    Sends back just the task, to replace its element, with its milestone and the progress widgets swapped in
+    out of band (see elements/list/changes.html)
     """
 
     # Get Data
-    task = get_object_or_404(CollaborationTask, pk=pk)
-    collaboration = task.collaboration
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    task = get_object_or_404(CollaborationTask, pk=pk, collaboration=collaboration)
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -405,20 +429,22 @@ def collaboration_task_toggle_view(request, slug, pk, status):
         case _:
             pass
 
-    # Update the state of the elements list on the collaboration page
-    return render(
-        request,
-        "app/collaborations/partials/elements/list/main.html",
+    # Send back the task, along with the milestone and progress which depend on it (swapped in out of band),
+    # rather than the whole elements list
+    context = get_task_change_context(collaboration, task)
+    context.update(
         {
-            "elements": get_all_elements(collaboration),
-            "task_completion_notes_modal": True
+            "element_modal": "task_completion"
             if task.completed_at and task.prompt_for_details_on_completion
-            else False,
+            else None,
             "form": TaskCompleteForm(instance=task),
             "task": task,
             "collaboration": collaboration,
             "membership_level": get_membership_level(request.user, collaboration.related_group),
-        },
+        }
+    )
+    return render(
+        request, "app/collaborations/partials/elements/list/changes.html", context
     )
 
 
@@ -432,8 +458,8 @@ def collaboration_task_delete_view(request, slug, pk):
     """
 
     # Get Data
-    task = get_object_or_404(CollaborationTask, pk=pk)
-    collaboration = task.collaboration
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    task = get_object_or_404(CollaborationTask, pk=pk, collaboration=collaboration)
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -446,7 +472,7 @@ def collaboration_task_delete_view(request, slug, pk):
             request,
             "app/collaborations/partials/elements/list/main.html",
             {
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "collaboration": collaboration,
                 "membership_level": get_membership_level(request.user, collaboration.related_group),
             },
@@ -457,7 +483,7 @@ def collaboration_task_delete_view(request, slug, pk):
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "membership_level": get_membership_level(request.user, collaboration.related_group),
             "task_delete_modal": True,
@@ -476,7 +502,7 @@ def collaboration_milestone_create_view(request, slug):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
     form = MilestoneForm(request.POST or None)
 
     # Check permissions
@@ -493,7 +519,7 @@ def collaboration_milestone_create_view(request, slug):
             request,
             "app/collaborations/partials/elements/list/main.html",
             {
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "collaboration": collaboration,
                 "membership_level": get_membership_level(request.user, collaboration.related_group),
             },
@@ -504,7 +530,7 @@ def collaboration_milestone_create_view(request, slug):
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "membership_level": get_membership_level(request.user, collaboration.related_group),
             "collaboration": collaboration,
             "milestone_creation_modal": True,
@@ -523,8 +549,10 @@ def collaboration_milestone_update_view(request, slug, pk):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    milestone = get_object_or_404(CollaborationMilestone, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    milestone = get_object_or_404(
+        CollaborationMilestone, pk=pk, collaboration=collaboration
+    )
     form = MilestoneForm(
         request.POST or None,
         initial={"collaboration": collaboration},
@@ -538,11 +566,12 @@ def collaboration_milestone_update_view(request, slug, pk):
     # If POST, update the milestone and then the state of the collaboration
     if request.method == "POST" and form.is_valid():
         form.save()
+        collaboration.refresh_element_state()
         return render(
             request,
             "app/collaborations/partials/elements/list/main.html",
             {
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "membership_level": get_membership_level(request.user, collaboration.related_group),
                 "collaboration": collaboration,
             },
@@ -553,7 +582,7 @@ def collaboration_milestone_update_view(request, slug, pk):
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "membership_level": get_membership_level(request.user, collaboration.related_group),
             "collaboration": collaboration,
             "milestone_update_modal": True,
@@ -573,8 +602,10 @@ def collaboration_milestone_delete_view(request, slug, pk):
     """
 
     # Get Data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    milestone = get_object_or_404(CollaborationMilestone, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    milestone = get_object_or_404(
+        CollaborationMilestone, pk=pk, collaboration=collaboration
+    )
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -583,11 +614,12 @@ def collaboration_milestone_delete_view(request, slug, pk):
     # If POST, delete the milestone and then update the state of the collaboration
     if request.method == "POST":
         milestone.remove()
+        collaboration.refresh_element_state()
         return render(
             request,
             "app/collaborations/partials/elements/list/main.html",
             {
-                "elements": get_all_elements(collaboration),
+                "elements": get_lazy_elements(collaboration),
                 "collaboration": collaboration,
                 "membership_level": get_membership_level(request.user, collaboration.related_group),
             },
@@ -598,7 +630,7 @@ def collaboration_milestone_delete_view(request, slug, pk):
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "milestone_delete_modal": True,
             "milestone": milestone,
@@ -620,7 +652,7 @@ def collaboration_milestone_delete_view(request, slug, pk):
 #     """
 #
 #     # Get data
-#     collaboration = get_object_or_404(Collaboration, slug=slug)
+#     collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
 #
 #     # Check permissions
 #     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -643,7 +675,7 @@ def collaboration_milestone_delete_view(request, slug, pk):
 #     #     request,
 #     #     "app/collaborations/partials/elements/list/main.html",
 #     #     {
-#     #         "elements": get_all_elements(collaboration),
+#     #         "elements": get_lazy_elements(collaboration),
 #     #         "membership_level": get_membership_level(request.user, collaboration.related_group),
 #     #         "collaboration": collaboration,
 #     #     },
@@ -662,8 +694,8 @@ def collaboration_task_move_view(request, slug, pk, position):
     """
 
     # Get data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    task = get_object_or_404(CollaborationTask, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    task = get_object_or_404(CollaborationTask, pk=pk, collaboration=collaboration)
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -671,15 +703,15 @@ def collaboration_task_move_view(request, slug, pk, position):
 
     # Get the object and process the request (much of the logic is stored in the model)
     if 0 <= int(position) < task.collaboration.number_of_elements:
-        task.position = int(position)
-        task.save()
+        task.reposition(int(position))
+        collaboration.refresh_element_state()
 
     # Make Response
     return render(
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "membership_level": get_membership_level(request.user, collaboration.related_group),
         },
@@ -698,8 +730,10 @@ def collaboration_milestone_move_view(request, slug, pk, position):
     """
 
     # Get data
-    collaboration = get_object_or_404(Collaboration, slug=slug)
-    milestone = get_object_or_404(CollaborationMilestone, pk=pk)
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    milestone = get_object_or_404(
+        CollaborationMilestone, pk=pk, collaboration=collaboration
+    )
 
     # Check permissions
     if not user_has_active_membership(request.user, collaboration.related_group):
@@ -707,15 +741,79 @@ def collaboration_milestone_move_view(request, slug, pk, position):
 
     # Get the object and process the request (much of the logic is stored in the model)
     if 0 <= int(position) < milestone.collaboration.number_of_elements:
-        milestone.position = int(position)
-        milestone.save()
+        milestone.reposition(int(position))
+        collaboration.refresh_element_state()
+
+    # Make Response
+    return render(
+        request,
+        "app/collaborations/partials/elements/list/main.html",
+        {
+            "elements": get_lazy_elements(collaboration),
+            "collaboration": collaboration,
+            "membership_level": get_membership_level(request.user, collaboration.related_group),
+        },
+    )
+
+
+@login_required()
+@require_http_methods(
+    [
+        "POST",
+    ]
+)
+def collaboration_element_batch_view(request, slug):
+    """
+    HTMX VIEW - Allows one operation (move/complete/undo complete/assign/delete) to be applied to many selected
+    elements at once
+    Sends back a list of elements, to replace the content in #element_list
+    """
+
+    # Get data
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
+    form = ElementBatchForm(request.POST, collaboration=collaboration)
+
+    # Check permissions
+    if not user_has_active_membership(request.user, collaboration.related_group):
+        return HttpResponseForbidden()
+
+    # Process the request (much of the logic is stored in the model)
+    if form.is_valid():
+        collaboration.apply_element_operations(form.get_operations(), user=request.user)
+
+    # Make Response
+    return render(
+        request,
+        "app/collaborations/partials/elements/list/main.html",
+        {
+            "elements": get_lazy_elements(collaboration),
+            "collaboration": collaboration,
+            "membership_level": get_membership_level(request.user, collaboration.related_group),
+        },
+    )
+
+
+@login_required()
+@require_http_methods(
+    [
+        "GET",
+    ]
+)
+def collaboration_element_list_view(request, slug):
+    """
+    HTMX VIEW - Sends back the current list of elements, to replace the content in #element_list.
+    Requested by the collaboration page whenever it is told the elements have changed (see collabl.events)
+    """
+
+    # Get data
+    collaboration = get_object_or_404(Collaboration.alive_objects, slug=slug)
 
     # Make Response
     return render(
         request,
         "app/collaborations/partials/elements/list/main.html",
         {
-            "elements": get_all_elements(collaboration),
+            "elements": get_lazy_elements(collaboration),
             "collaboration": collaboration,
             "membership_level": get_membership_level(request.user, collaboration.related_group),
         },
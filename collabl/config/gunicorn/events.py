@@ -0,0 +1,8 @@
+name = "collabl-events"
+loglevel = "info"
+errorlog = "-"
+accesslog = "-"
+# Only the live update streams are served here (see collabl/events.py), over ASGI - a single worker holds open every
+# stream on this node, while the rest of the site is served by the sync workers (see conf.py)
+workers = 1
+worker_class = "uvicorn.workers.UvicornWorker"
@@ -53,3 +53,50 @@ MEMBERSHIP_ACTION_IGNORE: str = "Ignore"
 MEMBERSHIP_ACTION_REMOVE: str = "Remove"
 MEMBERSHIP_ACTION_MAKE_ADMIN: str = "Make Admin"
 MEMBERSHIP_ACTION_CLEAR_SELECTION: str = "Clear Selection"
+MEMBERSHIP_ACTION_SELECT_ALL: str = "Select All"
+
+# The status each bulk action moves the selected memberships to (None removes them) - see groups/selection.py
+MEMBERSHIP_BULK_ACTIONS: dict = {
+    MEMBERSHIP_ACTION_APPROVE: MEMBERSHIP_STATUS_CURRENT,
+    MEMBERSHIP_ACTION_IGNORE: MEMBERSHIP_STATUS_IGNORED,
+    MEMBERSHIP_ACTION_MAKE_ADMIN: MEMBERSHIP_STATUS_ADMIN,
+    MEMBERSHIP_ACTION_REMOVE: None,
+}
+
+"""BULK MEMBERSHIPS"""
+
+# How long an admin's selection of memberships is kept for, after it was last changed
+MEMBERSHIP_SELECTION_SECONDS: int = 3600
+
+# Bulk actions are run by a Celery job, this many memberships at a time, and its progress is kept for the page to poll
+MEMBERSHIP_BULK_CHUNK_SIZE: int = 500
+MEMBERSHIP_JOB_SECONDS: int = 3600
+MEMBERSHIP_JOB_POLL_SECONDS: int = 1
+
+"""MEMBERSHIP LEVEL CACHE"""
+
+# How long a user's resolved membership level of a group is cached for (see users.permissions) - entries are left
+# behind as memberships change (under their group's old generation), so this bounds how long they take up space
+MEMBERSHIP_LEVEL_CACHE_SECONDS: int = 60 * 5
+
+"""GROUP SEARCH"""
+
+# Number of groups shown at a time on the find groups page - more are loaded as the end of the list is scrolled into view
+GROUP_SEARCH_PAGE_SIZE: int = 24
+
+# Separates the sort key and id of the last group on a page, in the cursor for the next page
+GROUP_SEARCH_CURSOR_SEPARATOR: str = "~"
+
+# Searches are matched by trigram similarity, so shorter searches list every group instead, and longer ones are cut
+GROUP_SEARCH_MIN_LENGTH: int = 3
+GROUP_SEARCH_MAX_LENGTH: int = 50
+
+# The best matches of a search are cached (for every user) for a short while, so type-ahead doesn't repeat the search
+GROUP_SEARCH_MAX_RESULTS: int = 240
+GROUP_SEARCH_CACHE_SECONDS: int = 30
+
+
+"""GROUP CARDS"""
+
+# Image URLs are signed (so take some work to make), and are cached for cards - for well under the signature's expiry
+GROUP_IMAGE_URL_CACHE_SECONDS: int = 1800
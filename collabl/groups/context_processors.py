@@ -1,3 +1,4 @@
+from chat.constants import CHAT_POLL_SECONDS
 from collaborations.constants import (
     COLLABORATION_STATUS_PLANNING,
     COLLABORATION_STATUS_ONGOING,
@@ -15,6 +16,8 @@ from groups.constants import (
     MEMBERSHIP_ACTION_REMOVE,
     MEMBERSHIP_ACTION_MAKE_ADMIN,
     MEMBERSHIP_ACTION_CLEAR_SELECTION,
+    MEMBERSHIP_ACTION_SELECT_ALL,
+    MEMBERSHIP_JOB_POLL_SECONDS,
     ANNOUNCEMENTS_FILTER_LATEST,
     ANNOUNCEMENTS_FILTER_ALL,
     MEMBERSHIP_STATUS_ADMIN,
@@ -36,6 +39,8 @@ def group_views_context(request):
         "MEMBERSHIP_ACTION_REMOVE": MEMBERSHIP_ACTION_REMOVE,
         "MEMBERSHIP_ACTION_MAKE_ADMIN": MEMBERSHIP_ACTION_MAKE_ADMIN,
         "MEMBERSHIP_ACTION_CLEAR_SELECTION": MEMBERSHIP_ACTION_CLEAR_SELECTION,
+        "MEMBERSHIP_ACTION_SELECT_ALL": MEMBERSHIP_ACTION_SELECT_ALL,
+        "MEMBERSHIP_JOB_POLL_SECONDS": MEMBERSHIP_JOB_POLL_SECONDS,
         "ANNOUNCEMENTS_FILTER_LATEST": ANNOUNCEMENTS_FILTER_LATEST,
         "ANNOUNCEMENTS_FILTER_ALL": ANNOUNCEMENTS_FILTER_ALL,
         "COLLABORATION_STATUS_ALL": COLLABORATION_STATUS_ALL,
@@ -44,4 +49,5 @@ def group_views_context(request):
         "COLLABORATION_STATUS_COMPLETED": COLLABORATION_STATUS_COMPLETED,
         "COMPLETE_TASK": COMPLETE_TASK,
         "UNDO_COMPLETE_TASK": UNDO_COMPLETE_TASK,
+        "CHAT_POLL_SECONDS": CHAT_POLL_SECONDS,
     }
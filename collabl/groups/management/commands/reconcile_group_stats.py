@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from groups.models import Group
+from groups.utils import reconcile_group_stats
+
+
+class Command(BaseCommand):
+    """
+    Repairs any drift in the groups' denormalised stats (membership, subscriber & chat message counts)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            help="Slug of a single group to reconcile (defaults to all groups)",
+        )
+
+    def success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def error(self, text):
+        self.stdout.write(self.style.ERROR(text))
+
+    def handle(self, *args, **options):
+
+        groups = Group.objects.all()
+        if options["group"]:
+            groups = groups.filter(slug=options["group"])
+            if not groups.exists():
+                self.error(f"No group found with slug '{options['group']}'")
+                return
+
+        with transaction.atomic():
+            repaired = reconcile_group_stats(groups)
+
+        self.success(f"Success - repaired the stats of {repaired} group(s)")
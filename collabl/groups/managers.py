@@ -1,6 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 import groups.constants as c
+from collabl.base.managers import (
+    TimeStampedSoftDeleteManager,
+    TimeStampedSoftDeleteQueryset,
+)
+from users.permissions import forget_membership_levels
 
 """
 A custom model manager that has a number of methods that can be called 
@@ -10,6 +17,77 @@ lower into the stack.
 """
 
 
+class GroupQuerySet(TimeStampedSoftDeleteQueryset):
+    def as_cards(self, user):
+        """
+        Loads just what a group card (see app/home/partials/group_list.html) shows, annotating each group with:
+            membership_level - the user's membership status in the group (or None)
+            announcement_count - number of announcements
+            collaboration_count - number of collaborations
+        Member counts come from the group's stats, so a whole list of cards is loaded in a single query.
+        """
+        # Imported here, as the models modules import from this one
+        from collaborations.models import Collaboration
+        from groups.models import GroupAnnouncement, Membership
+
+        def count_subquery(queryset, field):
+            return Coalesce(
+                Subquery(
+                    queryset.filter(**{field: OuterRef("pk")})
+                    .order_by()
+                    .values(field)
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            )
+
+        return (
+            self.select_related("stats")
+            .only(
+                "created_at",
+                "slug",
+                "name",
+                "description",
+                "profile_image",
+                "stats__group",
+                "stats__admin_count",
+                "stats__member_count",
+            )
+            .annotate(
+                membership_level=Subquery(
+                    Membership.objects.filter(group=OuterRef("pk"), user=user)
+                    .order_by()
+                    .values("status")[:1]
+                ),
+                announcement_count=count_subquery(
+                    GroupAnnouncement.objects.all(), "group"
+                ),
+                collaboration_count=count_subquery(
+                    Collaboration.objects.all(), "related_group"
+                ),
+            )
+        )
+
+
+class GroupManager(TimeStampedSoftDeleteManager):
+    """
+    GroupManager extends the soft delete manager, so that the GroupQuerySet methods can be called from the manager,
+    or chained onto any queryset of groups:
+
+    groups = Group.alive_objects.filter(pk__in=group_ids).as_cards(request.user)
+    """
+
+    def get_queryset(self):
+        queryset = GroupQuerySet(self.model, using=self._db)
+        if self.alive_only:
+            return queryset.alive()
+        return queryset
+
+    def as_cards(self, user):
+        return self.get_queryset().as_cards(user)
+
+
 class MembershipQuerySet(models.QuerySet):
     def pending(self):
         return self.filter(status=c.MEMBERSHIP_STATUS_PENDING)
@@ -26,6 +104,44 @@ class MembershipQuerySet(models.QuerySet):
     def subscribers(self):
         return self.filter(is_subscribed=True)
 
+    def update(self, **kwargs):
+        """
+        Override update to recount the stats of the groups whose memberships have their status or subscription
+        updated in bulk (see GroupStats.recount) - what they were updated from isn't known, so can't be adjusted for.
+        Changed statuses are dropped from the membership level cache (see users.permissions).
+        """
+        if not {"status", "is_subscribed"}.intersection(kwargs):
+            return super().update(**kwargs)
+
+        from groups.models import GroupStats
+
+        with transaction.atomic(using=self.db):
+            memberships = set(self.values_list("user", "group"))
+            rows = super().update(**kwargs)
+            GroupStats.recount({group_id for _, group_id in memberships})
+            if "status" in kwargs:
+                forget_membership_levels(memberships)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        """
+        Override delete to recount the stats of the groups whose memberships are deleted in bulk, and drop the
+        memberships from the membership level cache (see users.permissions)
+        """
+        from groups.models import GroupStats
+
+        with transaction.atomic(using=self.db):
+            memberships = set(self.values_list("user", "group"))
+            deleted = super().delete()
+            GroupStats.recount({group_id for _, group_id in memberships})
+            forget_membership_levels(memberships)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class MembershipManager(models.Manager):
     """
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groups", "0010_auto_20220108_1524"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="group",
+            name="chat_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bumped whenever a message in the group chat is added, edited or deleted (see chat.models.Message)",
+            ),
+        ),
+    ]
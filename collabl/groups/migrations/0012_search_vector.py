@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from search.operations import SearchVectorTrigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groups", "0011_chat_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="groupannouncement",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="The searchable text of the announcement (kept up to date by a database trigger - see search.operations)",
+                null=True,
+            ),
+        ),
+        # Fill in the vectors before building the indexes, so each index is built in one go
+        SearchVectorTrigger("groups_groupannouncement", {"title": "A", "body": "B"}),
+        migrations.AddIndex(
+            model_name="groupannouncement",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="groups_grou_search__abb898_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+import uuid
+
+
+def count_subquery(queryset, aggregate=Count("pk")):
+    return Coalesce(
+        Subquery(
+            queryset.filter(group=OuterRef("group"))
+            .order_by()
+            .values("group")
+            .annotate(count=aggregate)
+            .values("count")
+        ),
+        0,
+    )
+
+
+def populate_group_stats(apps, schema_editor):
+    """Creates the stats of every existing group, counting its memberships & chat messages"""
+    Group = apps.get_model("groups", "Group")
+    GroupStats = apps.get_model("groups", "GroupStats")
+    Membership = apps.get_model("groups", "Membership")
+    Message = apps.get_model("chat", "Message")
+    MessageArchive = apps.get_model("chat", "MessageArchive")
+
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(group_id=group_id)
+            for group_id in Group.objects.values_list("pk", flat=True)
+        ),
+        batch_size=500,
+    )
+    GroupStats.objects.update(
+        admin_count=count_subquery(Membership.objects.filter(status="Admin")),
+        member_count=count_subquery(Membership.objects.filter(status="Current")),
+        pending_count=count_subquery(Membership.objects.filter(status="Pending")),
+        ignored_count=count_subquery(Membership.objects.filter(status="Ignored")),
+        subscriber_count=count_subquery(Membership.objects.filter(is_subscribed=True)),
+        message_count=count_subquery(Message.objects.filter(deleted_at__isnull=True))
+        + count_subquery(
+            MessageArchive.objects.all(),
+            Sum("message_count", output_field=models.IntegerField()),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groups", "0012_search_vector"),
+        ("chat", "0010_read_cursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GroupStats",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Timestamp of when this object was first created.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Timestamp of when this object was last updated.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "admin_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of admins in the group",
+                    ),
+                ),
+                (
+                    "member_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of (non-admin) current members of the group",
+                    ),
+                ),
+                (
+                    "pending_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of pending membership requests for the group",
+                    ),
+                ),
+                (
+                    "ignored_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of ignored membership requests for the group",
+                    ),
+                ),
+                (
+                    "subscriber_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of members subscribed to the group's email updates",
+                    ),
+                ),
+                (
+                    "message_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="The number of messages in the group chat (including archived messages - see chat.archive)",
+                    ),
+                ),
+                (
+                    "group",
+                    models.OneToOneField(
+                        help_text="The group the counts are for",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats",
+                        to="groups.group",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Group Stats",
+            },
+        ),
+        migrations.RunPython(populate_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.3 on 2026-10-17 07:57
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groups", "0013_group_stats"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="group",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="group_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="group",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["description"],
+                name="group_description_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -1,14 +1,20 @@
 import time
+from collections import Counter
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.template.defaultfilters import slugify
 
-from collabl.base.models import TimeStampedSoftDeleteBase
-from collabl.storages import group_based_upload_to
+from collabl.base.models import TimeStampedBase, TimeStampedSoftDeleteBase
+from collabl.storages import get_cached_file_url, group_based_upload_to
 from groups import constants as c
 from users.models import User
+from users.permissions import forget_membership_levels
 from users.utils import get_sentinel_user
-from .managers import MembershipManager
+from .managers import GroupManager, MembershipManager
 
 
 class Group(TimeStampedSoftDeleteBase):
@@ -16,6 +22,9 @@ class Group(TimeStampedSoftDeleteBase):
     Groups are environments where users with a common cause can chat, and create Collaborations.
     """
 
+    objects = GroupManager(alive_only=False)
+    alive_objects = GroupManager(alive_only=True)
+
     name = models.CharField(
         help_text="A name for the group e.g. 'Riverdale Parents Group'",
         max_length=100,
@@ -57,28 +66,35 @@ class Group(TimeStampedSoftDeleteBase):
         blank=True,
     )
 
+    chat_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped whenever a message in the group chat is added, edited or deleted (see chat.models.Message)",
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__saved_profile_image = self.profile_image
 
+    @property
+    def profile_image_url(self):
+        """Returns the (signed) URL of the group's profile image, cached for group cards"""
+        return get_cached_file_url(self.profile_image, c.GROUP_IMAGE_URL_CACHE_SECONDS)
+
     @property
     def active_member_count(self):
-        """Returns the number of active group members"""
-        return (
-            self.memberships.all()
-            .filter(status__in=[c.MEMBERSHIP_STATUS_CURRENT, c.MEMBERSHIP_STATUS_ADMIN])
-            .count()
-        )
+        """Returns the number of active group members (see GroupStats)"""
+        return self.stats.active_member_count
 
     @property
     def subscriber_count(self):
-        """Returns the number of group subscribers"""
-        return self.memberships.all().filter(is_subscribed=True).count()
+        """Returns the number of group subscribers (see GroupStats)"""
+        return self.stats.subscriber_count
 
     @property
     def admin_count(self):
-        """Returns the number of group admins"""
-        return self.memberships.all().filter(status=c.MEMBERSHIP_STATUS_ADMIN).count()
+        """Returns the number of group admins (see GroupStats)"""
+        return self.stats.admin_count
 
     @property
     def current_users(self):
@@ -128,15 +144,18 @@ class Group(TimeStampedSoftDeleteBase):
     def save(self, *args, **kwargs) -> None:
         """
         Override save to:
-        1) If adding, automate creation of slug
+        1) If adding, automate creation of slug (and of the group's stats)
         2) If changing profile image, delete the old one from storage
         """
 
         # Use _state.adding to detect if first save
-        if self._state.adding:
+        if adding := self._state.adding:
             self.slug = self.generate_slug(self)
 
-        super(Group, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(Group, self).save(*args, **kwargs)
+            if adding:
+                GroupStats.objects.create(group=self)
 
     def delete(self, using=None, keep_parents=False):
         """We delete the profile image from storage"""
@@ -152,6 +171,14 @@ class Group(TimeStampedSoftDeleteBase):
             models.Index(fields=["created_at"]),
             models.Index(fields=["name"]),
             models.Index(fields=["slug"]),
+            GinIndex(
+                name="group_name_trgm", fields=["name"], opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                name="group_description_trgm",
+                fields=["description"],
+                opclasses=["gin_trgm_ops"],
+            ),
         ]
         ordering = ("created_at",)
 
@@ -162,8 +189,8 @@ class Membership(TimeStampedSoftDeleteBase):
     They can be approved/denied by the administrators of the relevant group.
     """
 
-    # # Default manager, unedited.
-    objects = models.Manager()
+    # Default manager - its querysets keep the groups' stats (see GroupStats) up to date through bulk updates & deletes
+    objects = MembershipManager()
     custom_manager = (
         # Custom manager with helper methods for filtering by status
         MembershipManager()
@@ -203,6 +230,21 @@ class Membership(TimeStampedSoftDeleteBase):
         null=True,
     )
 
+    def __init__(self, *args, **kwargs):
+        """
+        We override the init method to store what the membership adds to its group's stats (see GroupStats) when it
+        is loaded, so that saves can adjust the stats by the difference (unless status or is_subscribed have been
+        deferred, in which case the group's stats are recounted instead)
+        """
+        super().__init__(*args, **kwargs)
+        self.__saved_stats = (
+            (self.group_id, self.get_stats())
+            if "status" in self.__dict__ and "is_subscribed" in self.__dict__
+            else None
+        )
+
+    __saved_stats = None
+
     class Meta:
         unique_together = ("user", "group")
         verbose_name_plural = "Memberships"
@@ -211,6 +253,196 @@ class Membership(TimeStampedSoftDeleteBase):
     def __str__(self):
         return f"[{self.status}] {self.user.first_name}"
 
+    def get_stats(self) -> Counter:
+        """Returns what the membership adds to its group's stats (see GroupStats)"""
+        stats = Counter(subscriber_count=int(self.is_subscribed))
+        if field := GroupStats.STATUS_FIELDS.get(self.status):
+            stats[field] += 1
+        return stats
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Override save to keep the group's stats (see GroupStats) up to date with the membership's status and
+        subscription, and drop its old level from the membership level cache (see users.permissions)
+        """
+        with transaction.atomic():
+            adding = self._state.adding
+            super(Membership, self).save(*args, **kwargs)
+            forget_membership_levels([(self.user_id, self.group_id)])
+
+            stats = self.get_stats()
+            if not adding:
+                if self.__saved_stats is None:
+                    GroupStats.recount([self.group_id])
+                    stats = Counter()
+                elif (saved_group_id := self.__saved_stats[0]) == self.group_id:
+                    stats.subtract(self.__saved_stats[1])
+                else:
+                    GroupStats.take(saved_group_id, self.__saved_stats[1])
+            GroupStats.add(self.group_id, **stats)
+
+            self.__saved_stats = (self.group_id, self.get_stats())
+
+    def delete(self, *args, **kwargs):
+        """
+        Override delete to take the membership off its group's stats (see GroupStats), and drop it from the membership
+        level cache (see users.permissions)
+        """
+        with transaction.atomic():
+            response = super(Membership, self).delete(*args, **kwargs)
+            forget_membership_levels([(self.user_id, self.group_id)])
+            GroupStats.take(*(self.__saved_stats or (self.group_id, self.get_stats())))
+        return response
+
+
+class GroupStats(TimeStampedBase):
+    """
+    Denormalised counts for a group - kept up to date as its memberships and chat messages are written (see
+    GroupStats.add), so that group headers and lists read this one row, rather than counting memberships & messages.
+    Memberships updated or deleted in bulk have their groups recounted (see GroupStats.recount), and any drift is
+    repaired by
+        python manage.py reconcile_group_stats
+    """
+
+    # The count kept for each membership status
+    STATUS_FIELDS = {
+        c.MEMBERSHIP_STATUS_ADMIN: "admin_count",
+        c.MEMBERSHIP_STATUS_CURRENT: "member_count",
+        c.MEMBERSHIP_STATUS_PENDING: "pending_count",
+        c.MEMBERSHIP_STATUS_IGNORED: "ignored_count",
+    }
+    MEMBERSHIP_FIELDS = (*STATUS_FIELDS.values(), "subscriber_count")
+
+    group = models.OneToOneField(
+        "Group",
+        help_text="The group the counts are for",
+        on_delete=models.CASCADE,
+        related_name="stats",
+    )
+
+    admin_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of admins in the group",
+    )
+
+    member_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of (non-admin) current members of the group",
+    )
+
+    pending_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of pending membership requests for the group",
+    )
+
+    ignored_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of ignored membership requests for the group",
+    )
+
+    subscriber_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of members subscribed to the group's email updates",
+    )
+
+    message_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of messages in the group chat (including archived messages - see chat.archive)",
+    )
+
+    @property
+    def active_member_count(self):
+        """Returns the number of active group members"""
+        return self.admin_count + self.member_count
+
+    @classmethod
+    def add(cls, group_id, **changes) -> None:
+        """
+        Adjusts a group's counts by the amounts given (e.g. GroupStats.add(group.pk, pending_count=1)). The changes
+        are made in the database, so concurrent writes add up, rather than overwriting each other.
+        """
+        if changes := {
+            field: F(field) + change for field, change in changes.items() if change
+        }:
+            cls.objects.filter(group_id=group_id).update(**changes)
+
+    @classmethod
+    def take(cls, group_id, stats) -> None:
+        """Takes what a membership added to a group's stats (see Membership.get_stats) back off them"""
+        cls.add(group_id, **{field: -count for field, count in stats.items()})
+
+    @classmethod
+    def count(cls, groups, messages=True):
+        """
+        Annotates the given groups queryset with their actual counts, as actual_<field> (leaving out the chat messages,
+        which are the costly count, unless messages is True). Each is a subquery, so the groups aren't multiplied up
+        by their memberships & messages.
+        """
+        from chat.models import Message, MessageArchive
+
+        def count_subquery(queryset, aggregate=Count("pk")):
+            return Coalesce(
+                Subquery(
+                    queryset.filter(group=OuterRef("pk"))
+                    .order_by()
+                    .values("group")
+                    .annotate(count=aggregate)
+                    .values("count")
+                ),
+                0,
+            )
+
+        counts = {
+            f"actual_{field}": count_subquery(Membership.objects.filter(status=status))
+            for status, field in cls.STATUS_FIELDS.items()
+        }
+        counts["actual_subscriber_count"] = count_subquery(
+            Membership.objects.filter(is_subscribed=True)
+        )
+        if messages:
+            counts["actual_message_count"] = count_subquery(
+                Message.alive_objects.all()
+            ) + count_subquery(
+                MessageArchive.objects.all(),
+                Sum("message_count", output_field=models.IntegerField()),
+            )
+
+        return groups.annotate(**counts)
+
+    @classmethod
+    def recount(cls, group_ids, messages=False) -> None:
+        """
+        Recounts the given groups' stats from scratch (e.g. after their memberships are changed in bulk) - leaving
+        out the chat messages, unless messages is True. The stats are locked before counting, so writes made
+        meanwhile are either counted, or added on afterwards, rather than lost.
+        """
+        fields = [*cls.MEMBERSHIP_FIELDS, *(["message_count"] if messages else [])]
+        with transaction.atomic():
+            stats = {
+                group_stats.group_id: group_stats
+                for group_stats in cls.objects.select_for_update()
+                .filter(group_id__in=group_ids)
+                .order_by("group_id")
+            }
+            for group in cls.count(
+                Group.objects.filter(pk__in=list(stats)), messages=messages
+            ):
+                for field in fields:
+                    setattr(stats[group.pk], field, getattr(group, f"actual_{field}"))
+            cls.objects.bulk_update(stats.values(), fields)
+
+    def __str__(self):
+        return f"{self.group}'s stats"
+
+    class Meta:
+        verbose_name_plural = "Group Stats"
+
 
 class GroupAnnouncement(TimeStampedSoftDeleteBase):
     """
@@ -237,6 +469,12 @@ class GroupAnnouncement(TimeStampedSoftDeleteBase):
 
     body = models.TextField(help_text="The announcement itself")
 
+    search_vector = SearchVectorField(
+        editable=False,
+        help_text="The searchable text of the announcement (kept up to date by a database trigger - see search.operations)",
+        null=True,
+    )
+
     def __str__(self):
         return f"{self.group}'s announcement: '{self.title}'"
 
@@ -247,4 +485,5 @@ class GroupAnnouncement(TimeStampedSoftDeleteBase):
         indexes = [
             models.Index(fields=["group"]),
             models.Index(fields=["created_at"]),
+            GinIndex(fields=["search_vector"]),
         ]
\ No newline at end of file
@@ -0,0 +1,140 @@
+import uuid
+
+import redis
+from django.conf import settings
+
+import groups.constants as c
+from groups.models import GroupStats, Membership
+
+"""
+Bulk processing of group memberships.
+
+Admins select memberships to approve, ignore, remove or make admin - one at a time, or every membership matching the
+list they are looking at (e.g. all pending requests). Their selection is kept in Redis (rather than the session), as
+    <selection key>:all - set if every membership matching the filter is selected
+    <selection key>:ids - a set of membership ids (16 bytes each) - those selected, or if all are, those deselected
+so selecting all of a viral group's pending requests costs a single key, however many there are.
+
+The action is then run by a Celery job (see collabl.tasks.process_membership_selection), MEMBERSHIP_BULK_CHUNK_SIZE
+memberships at a time, which records its progress in Redis for the page to poll (see get_job_progress).
+"""
+
+client = redis.Redis.from_url(settings.MEMBERSHIP_SELECTION_REDIS_URL)
+
+
+def get_selection_key(user_id, group_id) -> str:
+    return f"membership-selection:{user_id}:{group_id}"
+
+
+def get_job_key(job_id) -> str:
+    return f"membership-job:{job_id}"
+
+
+def toggle_membership(key, membership_id) -> None:
+    """
+    Selects a membership if it isn't selected, or deselects it if it is. Either way, that flips whether its id is in
+    the set - whether or not all are selected.
+    """
+    member = uuid.UUID(str(membership_id)).bytes
+    if not client.srem(f"{key}:ids", member):
+        client.sadd(f"{key}:ids", member)
+    client.expire(f"{key}:ids", c.MEMBERSHIP_SELECTION_SECONDS)
+    client.expire(f"{key}:all", c.MEMBERSHIP_SELECTION_SECONDS)
+
+
+def select_all_memberships(key) -> None:
+    """Selects every membership matching the filter"""
+    pipeline = client.pipeline()
+    pipeline.delete(f"{key}:ids")
+    pipeline.set(f"{key}:all", 1, ex=c.MEMBERSHIP_SELECTION_SECONDS)
+    pipeline.execute()
+
+
+def get_selection(key, pop=False) -> tuple:
+    """
+    Gets a selection as (all_selected, membership ids), removing it (atomically) if pop is True - so a selection is
+    only ever processed once
+    """
+    pipeline = client.pipeline()
+    pipeline.exists(f"{key}:all")
+    pipeline.smembers(f"{key}:ids")
+    if pop:
+        pipeline.delete(f"{key}:all", f"{key}:ids")
+    all_selected, members = pipeline.execute()[:2]
+    return bool(all_selected), {uuid.UUID(bytes=member) for member in members}
+
+
+def clear_selection(key) -> None:
+    client.delete(f"{key}:all", f"{key}:ids")
+
+
+def count_selected(selection, group, membership_filter) -> int:
+    """Counts the memberships in a selection (see get_selection), using the group's stats when all are selected"""
+    all_selected, membership_ids = selection
+    if all_selected:
+        matching = getattr(group.stats, GroupStats.STATUS_FIELDS[membership_filter])
+        return max(matching - len(membership_ids), 0)
+    return len(membership_ids)
+
+
+def start_job(total) -> str:
+    """Records a new bulk membership job (of the given number of memberships), returning its id"""
+    job_id = uuid.uuid4().hex
+    client.hset(get_job_key(job_id), mapping={"done": 0, "total": total})
+    client.expire(get_job_key(job_id), c.MEMBERSHIP_JOB_SECONDS)
+    return job_id
+
+
+def get_job_progress(job_id):
+    """Gets a bulk membership job's progress, as a dict of done/total/finished - or None if it isn't known"""
+    if not (progress := client.hgetall(get_job_key(job_id))):
+        return None
+    return {
+        "done": int(progress.get(b"done", 0)),
+        "total": int(progress.get(b"total", 0)),
+        "finished": b"finished" in progress,
+    }
+
+
+def process_selection(
+    job_id, group_id, user_id, action, membership_filter, all_selected, membership_ids
+) -> int:
+    """
+    Runs a bulk action on a selection of a group's memberships (see get_selection), returning the number processed.
+
+    Memberships are processed in chunks of MEMBERSHIP_BULK_CHUNK_SIZE (walking them by id, so each chunk is a short
+    transaction of its own), and only while they still match the filter - so running a job again is harmless.
+    """
+    status = c.MEMBERSHIP_BULK_ACTIONS[action]
+    matching = Membership.objects.filter(group_id=group_id, status=membership_filter)
+    if all_selected:
+        selected = matching.exclude(pk__in=membership_ids)
+    else:
+        selected = matching.filter(pk__in=membership_ids)
+
+    processed, last_id = 0, None
+    while True:
+        # 1: Find the next chunk
+        chunk = selected.order_by("pk")
+        if last_id:
+            chunk = chunk.filter(pk__gt=last_id)
+        chunk_ids = list(
+            chunk.values_list("pk", flat=True)[: c.MEMBERSHIP_BULK_CHUNK_SIZE]
+        )
+        if not chunk_ids:
+            break
+
+        # 2: Process it (the queryset keeps the group's stats & the membership level cache in step)
+        memberships = matching.filter(pk__in=chunk_ids)
+        if status is None:
+            memberships.delete()
+        else:
+            memberships.update(status=status, updated_by_id=user_id)
+
+        # 3: Report progress
+        processed += len(chunk_ids)
+        last_id = chunk_ids[-1]
+        client.hincrby(get_job_key(job_id), "done", len(chunk_ids))
+
+    client.hset(get_job_key(job_id), "finished", 1)
+    return processed
@@ -19,6 +19,8 @@ from django.urls import path
 from chat.views_htmx import (
     group_message_create_view,
     group_message_delete_view,
+    group_message_page_view,
+    group_message_changes_view,
     group_message_update_view,
 )
 from collaborations.views_htmx import group_collaboration_create_view
@@ -34,6 +36,8 @@ from .views_htmx import (
     group_membership_view,
     group_membership_selector_view,
     group_membership_handler_view,
+    group_membership_select_all_view,
+    group_membership_job_view,
     group_announcement_list,
     group_announcement_delete,
     group_announcement_create,
@@ -89,6 +93,16 @@ urlpatterns = [
         group_message_create_view,
         name="group-message-create",
     ),
+    path(
+        "<slug>/messages/changes",
+        group_message_changes_view,
+        name="group-message-changes",
+    ),
+    path(
+        "<slug>/messages/older",
+        group_message_page_view,
+        name="group-message-page",
+    ),
     path(
         "<slug>/messages/<pk>",
         group_message_update_view,
@@ -110,11 +124,21 @@ urlpatterns = [
         group_membership_selector_view,
         name="group-membership-selector",
     ),
+    path(
+        "<slug>/membership-select-all/<membership_filter>/",
+        group_membership_select_all_view,
+        name="group-membership-select-all",
+    ),
     path(
         "<slug>/membership-handler/<action>/<membership_filter>/",
         group_membership_handler_view,
         name="group-membership-handler",
     ),
+    path(
+        "<slug>/membership-job/<job_id>/<membership_filter>/",
+        group_membership_job_view,
+        name="group-membership-job",
+    ),
     # HTMX views for the announcement section of the group detail page.
     path(
         "<slug>/announcements",
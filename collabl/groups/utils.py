@@ -1,18 +1,27 @@
-from django.db.models import Count, Case, When, Q, IntegerField
+import re
+import uuid
+from datetime import datetime
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db.models import Exists, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast
 
 import groups.constants as c
 from collaborations.models import Collaboration
+from groups.models import Group, GroupStats, Membership
+from users.permissions import resolve_membership_level
 
 
 def get_membership_level(user, group):
     """
     Simple utility function that return that status of the membership, if one exists.
-    Used to render relevant sections on front end.
+    Used to render relevant sections on front end. Levels are memoised per request, and cached across requests
+    (see users.permissions).
     """
 
     if user.is_authenticated:
-        if membership := group.memberships.filter(user=user, group=group).first():
-            return membership.status
+        return resolve_membership_level(user, group)
     return None
 
 
@@ -36,64 +45,179 @@ def user_is_admin(user, group):
 
 def get_membership_count(group):
     """
-    Counts memberships by type in order to provide as context to front end
+    Gets the group's membership counts by type (from its GroupStats row) in order to provide as context to front end
     """
 
-    memberships = group.memberships.all()
-
-    admin_count = memberships.filter(status=c.MEMBERSHIP_STATUS_ADMIN).count()
-    member_count = memberships.filter(status=c.MEMBERSHIP_STATUS_CURRENT).count()
-    ignored_count = memberships.filter(status=c.MEMBERSHIP_STATUS_IGNORED).count()
-    pending_count = memberships.filter(status=c.MEMBERSHIP_STATUS_PENDING).count()
-    subscriber_count = memberships.filter(is_subscribed=True).count()
+    stats = GroupStats.objects.get(group=group)
 
     return {
-        "admin": admin_count,
-        "member": member_count,
-        "ignored": ignored_count,
-        "pending": pending_count,
-        "subscriber": subscriber_count,
+        "admin": stats.admin_count,
+        "member": stats.member_count,
+        "ignored": stats.ignored_count,
+        "pending": stats.pending_count,
+        "subscriber": stats.subscriber_count,
     }
 
 
-def get_filtered_collaborations(group, collaboration_list_filter):
-    # Annotate the group's collaborations with the number of complete/incomplete tasks,
-    group_collaborations = (
-        Collaboration.objects.filter(
-            related_group=group,
+def reconcile_group_stats(groups=None) -> int:
+    """
+    Recounts the memberships & chat messages of the given groups (or all of them), and repairs any stats which have
+    drifted (e.g. after memberships were changed through the admin), creating any which are missing.
+    The counts are done in the database, and only the groups which have drifted are written.
+    Returns the number of groups repaired.
+    """
+    if groups is None:
+        groups = Group.objects.all()
+
+    fields = [*GroupStats.MEMBERSHIP_FIELDS, "message_count"]
+    drifted = (
+        GroupStats.count(groups.select_related("stats"))
+        .exclude(
+            Q(stats__isnull=False)
+            & Q(*[Q(**{f"stats__{field}": F(f"actual_{field}")}) for field in fields])
         )
-        .annotate(
-            tasks_complete=Count(
-                Case(
-                    When(Q(tasks__completed_at__isnull=False), then=1),
-                    output_field=IntegerField(),
-                )
-            ),
-            tasks_incomplete=Count(
-                Case(
-                    When(Q(tasks__completed_at__isnull=True), then=1),
-                    output_field=IntegerField(),
+        .only("id", *[f"stats__{field}" for field in fields])
+    )
+
+    repaired, missing = [], []
+    for group in drifted.iterator():
+        stats = getattr(group, "stats", None) or GroupStats(group=group)
+        for field in fields:
+            setattr(stats, field, getattr(group, f"actual_{field}"))
+        (missing if stats._state.adding else repaired).append(stats)
+
+    GroupStats.objects.bulk_create(missing, batch_size=500)
+    GroupStats.objects.bulk_update(repaired, fields, batch_size=500)
+
+    return len(repaired) + len(missing)
+
+
+def get_filtered_collaborations(group, collaboration_list_filter):
+    """
+    Gets the group's collaborations, annotated with their progress and filtered by status
+    (see collaborations.managers.CollaborationQuerySet)
+    """
+    return (
+        Collaboration.alive_objects.filter(related_group=group)
+        .with_progress()
+        .by_status(collaboration_list_filter)
+        .select_related("created_by")
+        .order_by("-created_at")
+    )
+
+
+def normalise_group_query(query_string) -> str:
+    """Normalises a group search (case, spacing and length), so that searches which match alike are cached alike"""
+    return (
+        re.sub(r"\s+", " ", query_string)
+        .strip()
+        .casefold()[: c.GROUP_SEARCH_MAX_LENGTH]
+    )
+
+
+def get_group_cursor(sort_key, pk) -> str:
+    """Gets the (sort key, id) cursor of a group, as used by get_group_search_page"""
+    return f"{sort_key}{c.GROUP_SEARCH_CURSOR_SEPARATOR}{pk}"
+
+
+def parse_group_cursor(cursor, ranked) -> tuple:
+    """
+    Splits a cursor (see get_group_cursor) into its sort key (a rank if ranked, otherwise a created_at) and id,
+    raising ValueError if it isn't valid
+    """
+    sort_key, pk = cursor.rsplit(c.GROUP_SEARCH_CURSOR_SEPARATOR, 1)
+    return (float if ranked else datetime.fromisoformat)(sort_key), uuid.UUID(pk)
+
+
+def get_ranked_group_matches(query) -> list:
+    """
+    Gets the (rank, id) of the best matches for a (normalised) group search, best first. Groups are matched on their
+    name containing the search, or on the trigram word similarity of their name or description (all of which use
+    their trigram indexes), with names ranked above descriptions. The matches are the same for every user, so are
+    cached for GROUP_SEARCH_CACHE_SECONDS.
+    """
+    key = f"group-search:{query}"
+    if (matches := cache.get(key)) is None:
+        matches = list(
+            Group.alive_objects.filter(
+                Q(name__icontains=query)
+                | Q(name__trigram_word_similar=query)
+                | Q(description__trigram_word_similar=query)
+            )
+            .annotate(
+                rank=Cast(
+                    TrigramWordSimilarity(query, "name")
+                    + TrigramWordSimilarity(query, "description") / 2,
+                    output_field=FloatField(),
                 )
-            ),
+            )
+            .order_by("-rank", "id")
+            .values_list("rank", "id")[: c.GROUP_SEARCH_MAX_RESULTS]
         )
-        .order_by("-created_at")
+        cache.set(key, matches, timeout=c.GROUP_SEARCH_CACHE_SECONDS)
+    return matches
+
+
+def get_group_search_page(user, query_string, after=None) -> dict:
+    """
+    Gets a page of the groups a user could join (those they aren't a member of, or pending in), for the find groups
+    templates, as
+        groups - the groups on the page (loaded as cards, see GroupQuerySet.as_cards)
+        next_cursor - the cursor for the next page, or None if this is the last one
+
+    Searches (see get_ranked_group_matches) are ranked best first, and anything shorter than GROUP_SEARCH_MIN_LENGTH
+    lists every group, oldest first. Either way, pages are found by cursor rather than offset, and the user's own
+    groups are left out with an anti-join (NOT EXISTS), rather than a NOT IN list. Raises ValueError if the cursor
+    given as after isn't valid.
+    """
+    query = normalise_group_query(query_string or "")
+    ranked = len(query) >= c.GROUP_SEARCH_MIN_LENGTH
+    after = parse_group_cursor(after, ranked) if after else None
+    memberships = Membership.objects.filter(
+        user=user,
+        status__in=[
+            c.MEMBERSHIP_STATUS_CURRENT,
+            c.MEMBERSHIP_STATUS_ADMIN,
+            c.MEMBERSHIP_STATUS_PENDING,
+        ],
     )
 
-    # Filter the collaborations, depending on the filter parameter chosen
-    match collaboration_list_filter:
-        case c.COLLABORATION_STATUS_ALL:
-            collaborations = group_collaborations
-        case c.COLLABORATION_STATUS_PLANNING:
-            collaborations = group_collaborations.filter(tasks_complete=0)
-        case c.COLLABORATION_STATUS_ONGOING:
-            collaborations = group_collaborations.filter(
-                tasks_incomplete__gt=0
-            ).exclude(tasks_complete=0)
-        case c.COLLABORATION_STATUS_COMPLETED:
-            collaborations = group_collaborations.filter(tasks_incomplete=0).exclude(
-                tasks_complete=0
+    if ranked:
+        # 1: Take the next page of matches (skipping the user's own groups)
+        own_groups = set(memberships.values_list("group", flat=True))
+        page = [
+            (rank, pk)
+            for rank, pk in get_ranked_group_matches(query)
+            if pk not in own_groups
+            and (after is None or (-rank, pk) > (-after[0], after[1]))
+        ][: c.GROUP_SEARCH_PAGE_SIZE + 1]
+
+        # 2: Load them, in order
+        groups = Group.alive_objects.as_cards(user).in_bulk([pk for _, pk in page])
+        page = [(rank, groups[pk]) for rank, pk in page if pk in groups]
+    else:
+        groups = (
+            Group.alive_objects.filter(
+                ~Exists(memberships.filter(group=OuterRef("pk")))
             )
-        case _:
-            collaborations = Collaboration.objects.none()
+            .as_cards(user)
+            .order_by("created_at", "id")
+        )
+        if after:
+            created_at, pk = after
+            groups = groups.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+        page = [
+            (group.created_at.isoformat(), group)
+            for group in groups[: c.GROUP_SEARCH_PAGE_SIZE + 1]
+        ]
+
+    next_cursor = None
+    if len(page) > c.GROUP_SEARCH_PAGE_SIZE:
+        page = page[: c.GROUP_SEARCH_PAGE_SIZE]
+        next_cursor = get_group_cursor(
+            repr(page[-1][0]) if ranked else page[-1][0], page[-1][1].pk
+        )
 
-    return collaborations
+    return {"groups": [group for _, group in page], "next_cursor": next_cursor}
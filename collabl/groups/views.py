@@ -1,6 +1,6 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
@@ -13,52 +13,70 @@ from django.views.generic.edit import FormMixin
 
 import groups.constants as c
 from chat.forms import GroupMessageForm
-from chat.models import Message
-from collaborations.models import Collaboration
+from chat.utils import get_message_page, mark_chat_read
 from groups.models import Group, GroupAnnouncement, Membership
-from groups.utils import get_membership_level, get_membership_count
+from groups.selection import clear_selection, get_selection_key
+from groups.utils import (
+    get_filtered_collaborations,
+    get_group_search_page,
+    get_membership_count,
+    get_membership_level,
+    user_has_active_membership,
+)
 
 
 @method_decorator(login_required(login_url="login"), name="dispatch")
 class GroupSearchView(ListView):
     """
-    Shows all of the groups that a user is not part of. serving both standard and htmx requests
+    Shows all of the groups that a user is not part of (a page at a time, see get_group_search_page), serving both
+    standard and htmx requests
     """
 
     model = Group
     context_object_name = "groups"
     template_name = "app/home/find_groups.html"
     partial_template_name = "app/home/partials/group_list.html"
-    hx_target_id = "list_of_groups"
+    hx_target_ids = ("list_of_groups", "groups_more")
     http_method_names = [
         "get",
     ]
 
+    def get(self, request, *args, **kwargs):
+        """We override get to find the page first, so an invalid cursor is a bad request"""
+        try:
+            self.page = get_group_search_page(
+                request.user,
+                request.GET.get("group_query_string", None),
+                after=request.GET.get("after", None),
+            )
+        except ValueError:
+            return HttpResponseBadRequest()
+        return super(GroupSearchView, self).get(request, *args, **kwargs)
+
     def get_template_names(self):
         """
-        If this is an HTMX request targeting a specific section of the page,
-        we return a partial, rather than the entire page
+        If this is an HTMX request targeting a specific section of the page (the list, or the next page trigger at the
+        end of it), we return a partial, rather than the entire page
         """
-        if self.request.htmx.target == self.hx_target_id:
+        if self.request.htmx.target in self.hx_target_ids:
             return self.partial_template_name
         return self.template_name
 
     def get_queryset(self):
-        # Get queryset of all groups user is not in
-        membership_list = Membership.objects.filter(
-            user=self.request.user,
-            status__in=[
-                c.MEMBERSHIP_STATUS_CURRENT,
-                c.MEMBERSHIP_STATUS_ADMIN,
-                c.MEMBERSHIP_STATUS_PENDING,
-            ],
-        ).values_list("group", flat=True)
-        groups = Group.objects.exclude(pk__in=membership_list)
-
-        # Filter by the provided querystring
-        if query_string := self.request.GET.get("group_query_string", None):
-            return groups.filter(name__icontains=query_string)
-        return groups
+        return self.page["groups"]
+
+    def get_context_data(self, **kwargs):
+        """
+        We override get_context_data to add what the next page trigger needs
+        """
+        context = super(GroupSearchView, self).get_context_data(**kwargs)
+        context.update(
+            {
+                "next_cursor": self.page["next_cursor"],
+                "group_query_string": self.request.GET.get("group_query_string", ""),
+            }
+        )
+        return context
 
 
 @method_decorator(login_required(login_url="login"), name="dispatch")
@@ -74,6 +92,7 @@ class GroupDetailView(FormMixin, DetailView):
 
     template_name = "app/group/main.html"
     model = Group
+    queryset = Group.alive_objects.all()
     form_class = GroupMessageForm
     http_method_names = [
         "get",
@@ -90,6 +109,9 @@ class GroupDetailView(FormMixin, DetailView):
 
         if self.request.user.is_authenticated:
             membership_level = get_membership_level(self.request.user, group)
+            # Only members have unread counts to clear - a visitor reading the chat would just add a read cursor
+            if user_has_active_membership(self.request.user, group):
+                mark_chat_read(self.request.user, group)
         else:
             membership_level = None
 
@@ -98,9 +120,11 @@ class GroupDetailView(FormMixin, DetailView):
                 "membership_level": membership_level,
                 "membership_count": get_membership_count(group),
                 "chat_form": GroupMessageForm(initial={"group": group}),
-                "chat_messages": Message.objects.filter(group=group),
+                **get_message_page(group),
                 "collaboration_filter": c.COLLABORATION_STATUS_ALL,
-                "collaboration_list": Collaboration.objects.filter(related_group=group),
+                "collaboration_list": get_filtered_collaborations(
+                    group, c.COLLABORATION_STATUS_ALL
+                ),
                 "announcement_filter": c.ANNOUNCEMENTS_FILTER_LATEST,
                 "announcement_list": GroupAnnouncement.objects.filter(group=group)[:1],
                 "membership_filter": c.MEMBERSHIP_STATUS_PENDING,
@@ -110,9 +134,9 @@ class GroupDetailView(FormMixin, DetailView):
             },
         )
 
-        # Clear the session, if it is being used
-        if self.request.session.get("selected_memberships", None):
-            del self.request.session["selected_memberships"]
+        # Clear the admin's membership selection, if they have one
+        if membership_level == c.MEMBERSHIP_STATUS_ADMIN:
+            clear_selection(get_selection_key(self.request.user.pk, group.pk))
 
         return context
 
@@ -125,10 +149,10 @@ def group_join_view(request, slug):
     """
 
     # Get  variables
-    user, group = request.user, get_object_or_404(Group, slug=slug)
+    user, group = request.user, get_object_or_404(Group.alive_objects, slug=slug)
 
     # If the user is already a member, send an error
-    if Membership.objects.filter(user=user, group=group):
+    if get_membership_level(user, group) is not None:
         messages.error(request, "Membership to this group has already been requested")
         return HttpResponseRedirect(
             reverse_lazy(
@@ -164,10 +188,10 @@ def group_leave_view(request, slug):
     """
 
     # Get  variables
-    user, group = request.user, get_object_or_404(Group, slug=slug)
+    user, group = request.user, get_object_or_404(Group.alive_objects, slug=slug)
 
     # If the user is not in the group , send an error
-    if user not in group.members.all():
+    if get_membership_level(user, group) is None:
         messages.error(request, "You are not a member of this group")
         return HttpResponseRedirect(
             reverse_lazy(
@@ -1,13 +1,30 @@
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseRedirect,
+)
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.decorators.http import require_http_methods
 
 import groups.constants as c
 from collabl.settings import SITE_PROTOCOL, SITE_DOMAIN
+from collabl.deletion import tombstone_group
+from collabl.tasks import process_membership_selection, purge_group
 from groups.forms import GroupForm, GroupImageForm, GroupAnnouncementForm
 from groups.models import Group, Membership, GroupAnnouncement
+from groups.selection import (
+    clear_selection,
+    count_selected,
+    get_job_progress,
+    get_selection,
+    get_selection_key,
+    select_all_memberships,
+    start_job,
+    toggle_membership,
+)
 from groups.utils import (
     get_membership_level,
     get_filtered_collaborations,
@@ -27,7 +44,7 @@ def group_update_view(request, slug):
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     form = GroupForm(request.POST or None, instance=group)
 
     # Check permissions
@@ -65,19 +82,20 @@ def group_delete_view(request, slug):
     """
     HTMX VIEW - Allows group deletion
     On GET, sends back confirmation modal
-    ON POST, deletes the group, and redirects user to the group list page.
+    ON POST, deletes the group (see collabl/deletion.py), and redirects user to the group list page.
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
 
     # Check permissions
     if not user_is_admin(request.user, group):
         return HttpResponseForbidden()
 
-    # If POST, delete the group
+    # If POST, delete the group - it is hidden at once, and deleted for good in the background
     if request.method == "POST":
-        group.delete()
+        tombstone_group(group)
+        purge_group.delay(str(group.pk))
         return HttpResponseRedirect(reverse_lazy("user-group-list"))
 
     # If GET, (or invalid data is posted) send back the Modal
@@ -101,7 +119,7 @@ def group_image_view(request, slug):
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     form = GroupImageForm(request.POST or None, request.FILES or None, instance=group)
 
     # Check permissions
@@ -147,7 +165,7 @@ def group_membership_view(request, slug):
     """
 
     # Get Data & Validate
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     membership_filter = request.GET.get(
         "membership_filter", c.MEMBERSHIP_STATUS_PENDING
     )
@@ -161,9 +179,8 @@ def group_membership_view(request, slug):
     if not user_is_admin(request.user, group):
         return HttpResponseForbidden()
 
-    # Clear the session, if it is being used
-    if request.session.get("selected_memberships", None):
-        del request.session["selected_memberships"]
+    # Clear the selection, if there is one
+    clear_selection(get_selection_key(request.user.pk, group.pk))
 
     # filter the queryset and send back the rendered template
     return render(
@@ -191,51 +208,86 @@ def group_membership_selector_view(request, slug, pk, membership_filter):
     HTMX VIEW - Allows admins to select memberships in order to process in bulk
 
     The same view is used for adding/removing - there is no point where a user would want to add an select
-    twice so we can assume that if the request id received is stored in session, the user wants to remove it.
+    twice so we can assume that if the membership is already selected, the user wants to remove it.
+    The selection is kept in Redis, rather than the session (see groups/selection.py).
 
     The view responds with an HTML partial (either the action bar, or nothing in its place),
     which is appended to the bottom of the requests list.
     """
 
-    # Grab the current list, or create one - an empty list
-    selected_memberships = request.session.get("selected_memberships", [])
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
+
+    if membership_filter not in c.MEMBERSHIP_FILTERS:
+        return HttpResponseBadRequest()
 
     # Check permissions
     if not user_is_admin(request.user, group):
         return HttpResponseForbidden()
 
-    # CASE 1: Removing an agency - Update the shortlist (in session), render the response
-    if pk in selected_memberships:
-        selected_memberships.remove(pk)
-        if len(selected_memberships) == 0:
-            del request.session["selected_memberships"]
-            return HttpResponse()
-        else:
-            request.session["selected_memberships"] = selected_memberships
-            return render(
-                request,
-                "app/group/partials/memberships/action_bar.html",
-                {
-                    "selected_memberships": len(selected_memberships),
-                    "membership_filter": membership_filter,
-                    "group": group,
-                },
-            )
+    # Update the selection, render the response (nothing, if the selection is now empty)
+    key = get_selection_key(request.user.pk, group.pk)
+    try:
+        toggle_membership(key, pk)
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not (selected := count_selected(get_selection(key), group, membership_filter)):
+        clear_selection(key)
+        return HttpResponse()
 
-    # CASE 2: Adding an agency to the shortlist - Update the shortlist (in session), render the response
-    else:
-        selected_memberships.append(pk)
-        request.session["selected_memberships"] = selected_memberships
-        return render(
-            request,
-            "app/group/partials/memberships/action_bar.html",
-            {
-                "selected_memberships": len(selected_memberships),
-                "membership_filter": membership_filter,
-                "group": group,
-            },
-        )
+    return render(
+        request,
+        "app/group/partials/memberships/action_bar.html",
+        {
+            "selected_memberships": selected,
+            "membership_filter": membership_filter,
+            "group": group,
+        },
+    )
+
+
+@login_required()
+@require_http_methods(
+    [
+        "POST",
+    ]
+)
+def group_membership_select_all_view(request, slug, membership_filter):
+    """
+    HTMX VIEW - Allows admins to select every membership matching the filter (e.g. all pending requests) at once
+
+    Nothing is listed - the filter is evaluated when the selection is processed. The view responds with the action bar,
+    and javascript to tick the boxes on the front end.
+    """
+
+    group = get_object_or_404(Group.alive_objects, slug=slug)
+
+    # Admins can't be selected (so have no bulk actions)
+    if (
+        membership_filter not in c.MEMBERSHIP_FILTERS
+        or membership_filter == c.MEMBERSHIP_STATUS_ADMIN
+    ):
+        return HttpResponseBadRequest()
+
+    # Check permissions
+    if not user_is_admin(request.user, group):
+        return HttpResponseForbidden()
+
+    key = get_selection_key(request.user.pk, group.pk)
+    select_all_memberships(key)
+    if not (selected := count_selected(get_selection(key), group, membership_filter)):
+        clear_selection(key)
+        return HttpResponse()
+
+    return render(
+        request,
+        "app/group/partials/memberships/action_bar.html",
+        {
+            "selected_memberships": selected,
+            "all_selected": True,
+            "membership_filter": membership_filter,
+            "group": group,
+        },
+    )
 
 
 @login_required()
@@ -246,70 +298,119 @@ def group_membership_selector_view(request, slug, pk, membership_filter):
 )
 def group_membership_handler_view(request, slug, action, membership_filter):
     """
-    HTMX VIEW - Allows admins process memberships stored in session
+    HTMX VIEW - Allows admins process their selected memberships
 
     The same view is used for approving/ignoring/clearing/removing - the method is provided in the htmx attributes on
     the template
 
-    The view responds with a partial that contains javascript update state on the front end. (eg. update member
-    count or check/uncheck boxes)
+    Clearing responds with a partial that contains javascript to uncheck the boxes on the front end. Anything else
+    is handed to a Celery job (see groups/selection.py), as a selection can run to thousands of memberships - the
+    view responds with its progress, which is polled until it is done (see group_membership_job_view).
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
-
-    # Grab the current list, or return None is there isn't one
-    if not (selected_memberships := request.session.get("selected_memberships", None)):
-        return None
+    group = get_object_or_404(Group.alive_objects, slug=slug)
 
     # Check permissions
     if not user_is_admin(request.user, group):
         return HttpResponseForbidden()
 
+    if action != c.MEMBERSHIP_ACTION_CLEAR_SELECTION and (
+        action not in c.MEMBERSHIP_BULK_ACTIONS
+        or membership_filter not in c.MEMBERSHIP_FILTERS
+    ):
+        return HttpResponseBadRequest()
+
+    # Take the selection, so it can only be processed once
+    key = get_selection_key(request.user.pk, group.pk)
+    all_selected, membership_ids = get_selection(key, pop=True)
+
     # Process the request (depending on the action specified)
     if action == c.MEMBERSHIP_ACTION_CLEAR_SELECTION:
         # Get the ids (so that we can 'uncheck' the checkboxes on front end)
         check_box_ids = [
-            f"checkbox_for_{membership_id}"
-            for membership_id in request.session["selected_memberships"]
+            f"checkbox_for_{membership_id}" for membership_id in membership_ids
         ]
 
-        # Remove the list from session
-        del request.session["selected_memberships"]
-
         return render(
             request,
             "app/group/partials/memberships/template_js/uncheck_membership_tickboxes.html",
-            {"check_box_ids": check_box_ids},
+            {"check_box_ids": check_box_ids, "all_selected": all_selected},
         )
 
-    elif action == c.MEMBERSHIP_ACTION_APPROVE:
-        # Get the memberships and mark them as approved
-        Membership.objects.filter(id__in=selected_memberships).update(
-            status=c.MEMBERSHIP_STATUS_CURRENT,
-            updated_by=request.user,
+    # Start the job (if anything is selected)
+    if total := count_selected(
+        (all_selected, membership_ids), group, membership_filter
+    ):
+        job_id = start_job(total)
+        process_membership_selection.delay(
+            job_id,
+            str(group.pk),
+            str(request.user.pk),
+            action,
+            membership_filter,
+            all_selected,
+            [str(membership_id) for membership_id in membership_ids],
         )
-
-    elif action == c.MEMBERSHIP_ACTION_IGNORE:
-        # Get the memberships and mark them as ignored
-        Membership.objects.filter(id__in=selected_memberships).update(
-            status=c.MEMBERSHIP_STATUS_IGNORED,
-            updated_by=request.user,
+        return render(
+            request,
+            "app/group/partials/memberships/progress.html",
+            {
+                "group": group,
+                "job_id": job_id,
+                "progress": get_job_progress(job_id),
+                "action": action,
+                "membership_filter": membership_filter,
+            },
         )
 
-    elif action == c.MEMBERSHIP_ACTION_MAKE_ADMIN:
-        # Get the memberships and make admin
-        Membership.objects.filter(id__in=selected_memberships).update(
-            status=c.MEMBERSHIP_STATUS_ADMIN,
-            updated_by=request.user,
-        )
+    # Make Response (updating state of the memberships section)
+    return render(
+        request,
+        "app/group/partials/memberships/main.html",
+        {
+            "group": group,
+            "membership_list": Membership.objects.filter(
+                group=group, status=membership_filter
+            ),
+            "membership_filter": membership_filter,
+            "membership_count": get_membership_count(group),
+        },
+    )
+
+
+@login_required()
+@require_http_methods(
+    [
+        "GET",
+    ]
+)
+def group_membership_job_view(request, slug, job_id, membership_filter):
+    """
+    HTMX VIEW - Polled for the progress of a bulk membership job (see group_membership_handler_view)
+
+    Responds with the progress while the job is running, then with the (updated) memberships section once it is done
+    """
 
-    elif action == c.MEMBERSHIP_ACTION_REMOVE:
-        # Get the memberships and delete them
-        Membership.objects.filter(id__in=selected_memberships).delete()
+    # Get Data
+    group = get_object_or_404(Group.alive_objects, slug=slug)
+
+    # Check permissions
+    if not user_is_admin(request.user, group):
+        return HttpResponseForbidden()
 
-    # Remove the list from session
-    del request.session["selected_memberships"]
+    if (progress := get_job_progress(job_id)) and not progress["finished"]:
+        return render(
+            request,
+            "app/group/partials/memberships/progress.html",
+            {
+                "group": group,
+                "job_id": job_id,
+                "progress": progress,
+                "action": request.GET.get("action", None),
+                "membership_filter": membership_filter,
+            },
+        )
 
     if membership_filter in c.MEMBERSHIP_FILTERS:
         membership_list = Membership.objects.filter(
@@ -343,7 +444,7 @@ def group_collaboration_list(request, slug):
     """
 
     # Get group
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
 
     # Get filter parameter - if not set, send back a 'hidden' response (Empty HTML string)
     collaboration_list_filter = request.GET.get("collaboration_list_filter", "HIDE")
@@ -380,7 +481,7 @@ def group_announcement_list(request, slug):
         return HttpResponse("")
 
     # Filter the announcements
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     match announcement_list_filter:
         case c.ANNOUNCEMENTS_FILTER_LATEST:
             announcements = GroupAnnouncement.objects.filter(group=group)[:1]
@@ -412,7 +513,7 @@ def group_announcement_delete(request, slug, pk):
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     announcement = get_object_or_404(GroupAnnouncement, pk=pk)
 
     # Check permissions
@@ -456,7 +557,7 @@ def group_announcement_create(request, slug):
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     form = GroupAnnouncementForm(request.POST or None)
 
     # Check permissions
@@ -503,7 +604,7 @@ def group_announcement_update(request, slug, pk):
     """
 
     # Get Data
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.alive_objects, slug=slug)
     group_announcement = get_object_or_404(GroupAnnouncement, pk=pk)
     form = GroupAnnouncementForm(request.POST or None, instance=group_announcement)
 
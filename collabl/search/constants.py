@@ -0,0 +1,22 @@
+"""SEARCH"""
+
+# The Postgres text search configuration, used both to build the search vectors and to parse queries
+SEARCH_CONFIG: str = "english"
+
+# Number of results per page
+SEARCH_PAGE_SIZE: int = 20
+
+# Separates the rank, kind and id of the last result on a page, in the cursor for the next page
+SEARCH_CURSOR_SEPARATOR: str = "~"
+
+# The kinds of result (ties in rank are broken by kind, then id)
+SEARCH_RESULT_ANNOUNCEMENT: str = "announcement"
+SEARCH_RESULT_COLLABORATION: str = "collaboration"
+SEARCH_RESULT_MESSAGE: str = "message"
+SEARCH_RESULT_TASK: str = "task"
+SEARCH_RESULT_KINDS: tuple = (
+    SEARCH_RESULT_ANNOUNCEMENT,
+    SEARCH_RESULT_COLLABORATION,
+    SEARCH_RESULT_MESSAGE,
+    SEARCH_RESULT_TASK,
+)
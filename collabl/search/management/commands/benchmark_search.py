@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.postgres.search import SearchQuery
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+import search.constants as c
+from chat.models import Message
+from groups.constants import MEMBERSHIP_STATUS_ADMIN
+from groups.models import Group
+from search.utils import get_search_results
+
+# Words for the generated messages - picked with a long tail (as in real chat), so queries range from common to rare
+WORDS = (
+    "the and to we for it on meeting plan today can bake sale volunteers council town charity event next week "
+    "thanks please update budget leaflets posters venue tickets raffle prizes cake stall tables chairs banner "
+    "donations sponsor newsletter minutes agenda deadline cancelled postponed confirmed parking permit insurance"
+).split()
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+
+class Command(BaseCommand):
+    """
+    Measures search over a large chat - fills one group's chat with generated messages (1M by default), then times
+    the first and following pages of some searches, as a member of the group would see them. The generated messages
+    are deleted afterwards.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            required=True,
+            help="Slug of the group to fill with messages (it needs an admin to search as)",
+        )
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=1_000_000,
+            help="Number of messages to generate",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=5,
+            help="Number of pages to read of each search",
+        )
+        parser.add_argument(
+            "--queries",
+            nargs="+",
+            default=["meeting", "bake sale", '"town council"', "insurance -cancelled"],
+            help="Searches to time",
+        )
+
+    def success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def error(self, text):
+        self.stdout.write(self.style.ERROR(text))
+
+    def handle(self, *args, **options):
+
+        group = Group.objects.filter(slug=options["group"]).first()
+        if group is None:
+            self.error(f"No group found with slug '{options['group']}'")
+            return
+
+        membership = group.memberships.filter(status=MEMBERSHIP_STATUS_ADMIN).first()
+        if membership is None:
+            self.error("The group needs an admin to search as")
+            return
+
+        # Every generated message starts with this tag, so they can be found (via the index) and deleted afterwards
+        tag = f"benchmark{uuid.uuid4().hex[:8]}"
+
+        # 1: Generate the messages
+        started = time.perf_counter()
+        for batch_start in range(0, options["messages"], 10_000):
+            Message.objects.bulk_create(
+                Message(
+                    group=group,
+                    user=membership.user,
+                    message=" ".join(
+                        [tag, *random.choices(WORDS, WEIGHTS, k=random.randint(3, 30))]
+                    ),
+                )
+                for _ in range(min(10_000, options["messages"] - batch_start))
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Message._meta.db_table}")
+        self.success(
+            f"Generated {options['messages']} messages in {time.perf_counter() - started:.1f}s"
+        )
+
+        # 2: Time each search, page by page
+        try:
+            for query_string in options["queries"]:
+                timings, after, found = [], None, 0
+                for _ in range(options["pages"]):
+                    started = time.perf_counter()
+                    page = get_search_results(
+                        membership.user, query_string, after=after
+                    )
+                    timings.append(time.perf_counter() - started)
+                    found += len(page["results"])
+                    after = page["next_cursor"]
+                    if after is None:
+                        break
+
+                self.success(
+                    f"'{query_string}' - {found} results over {len(timings)} page(s) of {c.SEARCH_PAGE_SIZE}: "
+                    f"first page {timings[0] * 1000:.1f}ms, "
+                    f"mean {statistics.mean(timings) * 1000:.1f}ms, "
+                    f"slowest {max(timings) * 1000:.1f}ms"
+                )
+
+        # 3: Remove the generated messages
+        finally:
+            deleted, _ = Message.objects.filter(
+                search_vector=SearchQuery(tag, config=c.SEARCH_CONFIG)
+            ).delete()
+            self.success(f"Removed {deleted} generated messages")
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+from search.constants import SEARCH_CONFIG
+
+"""
+Migration operations for keeping a model's search_vector column up to date.
+
+Django (4.0) can't declare generated columns, so the search vector is a plain SearchVectorField, filled in by a
+BEFORE INSERT/UPDATE trigger - which has the same effect: whatever the ORM writes to the column is replaced with the
+vector of the row's text. The trigger only fires when one of the text columns (or the vector itself) is written, so
+updates that just touch counters or timestamps don't pay for re-parsing the text.
+
+migrations.AddField(...search_vector...),
+SearchVectorTrigger("chat_message", {"message": "A"}),
+"""
+
+
+class SearchVectorTrigger(migrations.RunSQL):
+    """
+    Creates the trigger that builds a table's search_vector from the given {column: weight} text columns, and fills
+    in the vectors of the existing rows. Reversing it drops the trigger.
+    """
+
+    def __init__(self, table, weighted_columns):
+        name = f"{table}_search_vector_update"
+        vector = " || ".join(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.{column}, '')), '{weight}')"
+            for column, weight in weighted_columns.items()
+        )
+        columns = ", ".join([*weighted_columns, "search_vector"])
+        super().__init__(
+            sql=[
+                f"""
+                CREATE FUNCTION {name}() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := {vector};
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+                """,
+                f"""
+                CREATE TRIGGER {name} BEFORE INSERT OR UPDATE OF {columns} ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE {name}();
+                """,
+                # Writing the vector fires the trigger, which rebuilds it
+                f"UPDATE {table} SET search_vector = NULL;",
+            ],
+            reverse_sql=[
+                f"DROP TRIGGER {name} ON {table};",
+                f"DROP FUNCTION {name}();",
+            ],
+        )
@@ -0,0 +1,153 @@
+import uuid
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Q, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+import search.constants as c
+from chat.models import Message
+from collaborations.models import Collaboration, CollaborationTask
+from groups.constants import MEMBERSHIP_STATUS_ADMIN, MEMBERSHIP_STATUS_CURRENT
+from groups.models import GroupAnnouncement, Membership
+
+
+def get_search_cursor(result) -> str:
+    """Gets the (rank, kind, id) cursor of a search result, as used by get_search_results"""
+    return c.SEARCH_CURSOR_SEPARATOR.join(
+        [repr(result["rank"]), result["kind"], str(result["id"])]
+    )
+
+
+def parse_search_cursor(cursor) -> tuple:
+    """Splits a cursor (see get_search_cursor) into its rank, kind and id, raising ValueError if it isn't valid"""
+    rank, kind, pk = cursor.split(c.SEARCH_CURSOR_SEPARATOR)
+    if kind not in c.SEARCH_RESULT_KINDS:
+        raise ValueError(f"Unknown kind of search result '{kind}'")
+    return float(rank), kind, uuid.UUID(pk)
+
+
+def get_searchable_querysets(user) -> dict:
+    """
+    Gets a queryset of each kind of searchable thing, by kind, limited to the groups the user is an active member of
+    (and the collaborations in them)
+    """
+    groups = Membership.objects.filter(
+        user=user,
+        status__in=[MEMBERSHIP_STATUS_ADMIN, MEMBERSHIP_STATUS_CURRENT],
+        deleted_at__isnull=True,
+        group__deleted_at__isnull=True,
+    ).values("group_id")
+
+    return {
+        c.SEARCH_RESULT_ANNOUNCEMENT: GroupAnnouncement.alive_objects.filter(
+            group__in=groups
+        ),
+        c.SEARCH_RESULT_COLLABORATION: Collaboration.alive_objects.filter(
+            related_group__in=groups
+        ),
+        c.SEARCH_RESULT_MESSAGE: Message.alive_objects.filter(
+            Q(group__in=groups)
+            | Q(
+                collaboration__related_group__in=groups,
+                collaboration__deleted_at__isnull=True,
+            )
+        ),
+        c.SEARCH_RESULT_TASK: CollaborationTask.alive_objects.filter(
+            collaboration__related_group__in=groups,
+            collaboration__deleted_at__isnull=True,
+        ),
+    }
+
+
+def get_result_columns(kind) -> dict:
+    """
+    Gets the columns each kind of result is shown with. Every kind has the same columns, in the same order, so they
+    can be combined into one query.
+    """
+    match kind:
+        case c.SEARCH_RESULT_ANNOUNCEMENT:
+            heading, content = F("title"), F("body")
+            group_slug, collaboration_slug = F("group__slug"), Value(None)
+        case c.SEARCH_RESULT_COLLABORATION:
+            heading, content = F("name"), F("description")
+            group_slug, collaboration_slug = F("related_group__slug"), F("slug")
+        case c.SEARCH_RESULT_MESSAGE:
+            heading, content = Value(""), F("message")
+            group_slug = Coalesce("group__slug", "collaboration__related_group__slug")
+            collaboration_slug = F("collaboration__slug")
+        case _:
+            heading, content = F("name"), F("description")
+            group_slug = F("collaboration__related_group__slug")
+            collaboration_slug = F("collaboration__slug")
+
+    return {
+        "kind": Value(kind, output_field=TextField()),
+        "heading": Cast(heading, output_field=TextField()),
+        "content": Cast(content, output_field=TextField()),
+        "group_slug": Cast(group_slug, output_field=TextField()),
+        "collaboration_slug": Cast(collaboration_slug, output_field=TextField()),
+    }
+
+
+def get_search_results(user, query_string, after=None) -> dict:
+    """
+    Searches the chat messages, announcements, collaborations and tasks of the user's groups, for the search
+    templates, as
+        results - a page of results (best first), each a dict of kind, id, rank, created_at, heading, content,
+                  group_slug and collaboration_slug
+        next_cursor - the cursor for the next page, or None if this is the last one
+
+    The query is parsed as web search syntax (e.g. '"bake sale" -cancelled'), and matched against the search_vector
+    of each kind, using their GIN indexes. Results are ranked with ts_rank (titles are weighted above bodies).
+    Pages are found by (rank, kind, id) cursor, rather than by offset, so each kind only ever gives up a page's worth
+    of rows, however deep the page. Raises ValueError if the cursor given as after isn't valid.
+    """
+    query = SearchQuery(query_string, config=c.SEARCH_CONFIG, search_type="websearch")
+    after = parse_search_cursor(after) if after else None
+
+    # 1: Find the next page's worth of each kind
+    pages = []
+    for kind, queryset in get_searchable_querysets(user).items():
+        queryset = queryset.filter(search_vector=query).annotate(
+            # Ranks are real (float4) in Postgres, so are widened to float8 to survive the round trip via the cursor
+            rank=Cast(SearchRank(F("search_vector"), query), output_field=FloatField()),
+            **get_result_columns(kind),
+        )
+
+        if after:
+            rank, after_kind, pk = after
+            if kind < after_kind:
+                queryset = queryset.filter(rank__lt=rank)
+            elif kind == after_kind:
+                queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=pk))
+            else:
+                queryset = queryset.filter(rank__lte=rank)
+
+        pages.append(
+            queryset.values(
+                "id",
+                "created_at",
+                "rank",
+                "kind",
+                "heading",
+                "content",
+                "group_slug",
+                "collaboration_slug",
+            ).order_by("-rank", "id")[: c.SEARCH_PAGE_SIZE + 1]
+        )
+
+    # 2: Merge them into one page
+    results = list(
+        pages[0]
+        .union(*pages[1:], all=True)
+        .order_by("-rank", "kind", "id")[: c.SEARCH_PAGE_SIZE + 1]
+    )
+
+    return {
+        "results": results[: c.SEARCH_PAGE_SIZE],
+        "next_cursor": (
+            get_search_cursor(results[c.SEARCH_PAGE_SIZE - 1])
+            if len(results) > c.SEARCH_PAGE_SIZE
+            else None
+        ),
+    }
@@ -0,0 +1,32 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+
+from search.utils import get_search_results
+
+
+@login_required()
+@require_http_methods(["GET"])
+def search_view(request):
+    """
+    Searches the chats, announcements, collaborations and tasks of the user's groups, serving both standard and htmx
+    requests - the search box and the 'load more' trigger at the end of each page are sent just the results partial
+    """
+
+    # Get data
+    query_string = request.GET.get("q", "").strip()
+    context = {"query_string": query_string, "results": [], "next_cursor": None}
+
+    if query_string:
+        try:
+            context |= get_search_results(
+                request.user, query_string, after=request.GET.get("after")
+            )
+        except ValueError:
+            return HttpResponseBadRequest()
+
+    # Return Response
+    if request.htmx.target in ("search_results", "search_more"):
+        return render(request, "app/search/partials/results.html", context)
+    return render(request, "app/search/main.html", context)
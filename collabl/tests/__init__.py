@@ -4,3 +4,10 @@ All tests must be imported here.
 
 from .example import *
 from .user import *
+from .collaboration import *
+from .chat import *
+from .group import *
+from .events import *
+from .search import *
+from .deletion import *
+from .purge import *
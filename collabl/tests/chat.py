@@ -0,0 +1,268 @@
+import uuid
+from datetime import datetime, timezone
+from unittest import TestCase, mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from chat.archive import archive_chat_month, decode_message, encode_message
+from chat.models import Message, MessageArchive, ReadCursor
+from chat.partitions import (
+    add_months,
+    get_partition_month,
+    get_partition_name,
+    month_start,
+)
+from chat.unread import (
+    cache_unread_counts,
+    count_message,
+    get_cached_unread_counts,
+    restart_chat_total,
+)
+from chat.utils import get_message_cursor, get_message_page, parse_message_cursor
+from collabl.deletion import tombstone_group
+from collabl.events import group_channel
+from groups.constants import MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_PENDING
+from groups.models import Group, Membership
+
+from .utils import (
+    create_collaboration,
+    create_group,
+    create_user,
+    local_caches,
+    use_memory_events,
+    use_temporary_media,
+)
+
+
+@local_caches
+@mock.patch("chat.constants.CHAT_PAGE_SIZE", 3)
+class MessagePageTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+        use_temporary_media(self)
+
+        self.user = create_user()
+        self.group = create_group(self.user)
+        Group.objects.filter(pk=self.group.pk).update(
+            created_at=datetime(2021, 12, 15, tzinfo=timezone.utc)
+        )
+        self.group.refresh_from_db()
+
+        # Three messages in January (which is archived), two written at the same moment in February, and two in March
+        for created_at in (
+            datetime(2022, 1, 5, 9, 0, 0, 1, tzinfo=timezone.utc),
+            datetime(2022, 1, 20, 9, 0, 0, 2, tzinfo=timezone.utc),
+            datetime(2022, 1, 31, 23, 59, 59, 999999, tzinfo=timezone.utc),
+            datetime(2022, 2, 10, 12, tzinfo=timezone.utc),
+            datetime(2022, 2, 10, 12, tzinfo=timezone.utc),
+            datetime(2022, 3, 1, tzinfo=timezone.utc),
+            datetime(2022, 3, 2, 8, 30, tzinfo=timezone.utc),
+        ):
+            message = Message.objects.create(
+                user=self.user, group=self.group, message=f"{created_at}"
+            )
+            Message.objects.filter(pk=message.pk).update(created_at=created_at)
+        self.messages = sorted(
+            Message.objects.filter(group=self.group),
+            key=lambda message: (message.created_at, message.pk),
+            reverse=True,
+        )
+        archive_chat_month(
+            self.group.pk, None, datetime(2022, 1, 1, tzinfo=timezone.utc)
+        )
+
+    def test_pages_cross_months_and_archive_segments(self):
+        # 1: The first page runs from March back into February, stopping part way through the messages written at the
+        # same moment
+        page = get_message_page(self.group)
+        self.assertEqual(page["chat_messages"], self.messages[:3])
+        self.assertEqual(page["newest_cursor"], get_message_cursor(self.messages[0]))
+        self.assertEqual(page["next_cursor"], get_message_cursor(self.messages[2]))
+
+        # 2: The second picks up the other February message, then carries on into January's archive segment
+        page = get_message_page(self.group, before=page["next_cursor"])
+        self.assertEqual(page["chat_messages"], self.messages[3:6])
+        self.assertEqual(
+            [message.archived for message in page["chat_messages"]],
+            [False, True, True],
+        )
+        self.assertEqual(page["chat_messages"][1].user, self.user)
+
+        # 3: The last page is the rest of the archive segment
+        page = get_message_page(self.group, before=page["next_cursor"])
+        self.assertEqual(page["chat_messages"], self.messages[6:])
+        self.assertTrue(page["chat_messages"][0].archived)
+        self.assertIsNone(page["next_cursor"])
+
+    def test_deleted_messages_are_left_out(self):
+        self.messages[1].remove()
+
+        page = get_message_page(self.group)
+        self.assertEqual(page["chat_messages"], [self.messages[0], *self.messages[2:4]])
+
+    def test_invalid_cursor(self):
+        for cursor in ("nonsense", "2022-03-01T12:00:00~not-a-uuid"):
+            with self.assertRaises(ValueError):
+                parse_message_cursor(cursor)
+
+
+class MessagePartitionTest(TestCase):
+    def test_month_start(self):
+        self.assertEqual(
+            month_start(datetime(2022, 3, 17, 9, 30, tzinfo=timezone.utc)),
+            datetime(2022, 3, 1, tzinfo=timezone.utc),
+        )
+
+    def test_add_months(self):
+        march = datetime(2022, 3, 1, tzinfo=timezone.utc)
+        self.assertEqual(
+            add_months(march, 10), datetime(2023, 1, 1, tzinfo=timezone.utc)
+        )
+        self.assertEqual(
+            add_months(march, -3), datetime(2021, 12, 1, tzinfo=timezone.utc)
+        )
+
+    def test_partition_name_round_trip(self):
+        march = datetime(2022, 3, 1, tzinfo=timezone.utc)
+        self.assertEqual(get_partition_month(get_partition_name(march)), march)
+
+
+class MessageArchiveTest(TestCase):
+    def test_message_round_trip(self):
+        archive = MessageArchive(
+            group_id=uuid.uuid4(), month=datetime(2022, 3, 1, tzinfo=timezone.utc)
+        )
+        message = Message(
+            id=uuid.uuid4(),
+            created_at=datetime(2022, 3, 1, 12, 30, 15, 250, tzinfo=timezone.utc),
+            updated_at=datetime(2022, 3, 2, 8, tzinfo=timezone.utc),
+            user_id=uuid.uuid4(),
+            message="See you at the bake sale \N{SHORTCAKE}",
+            version=7,
+        )
+
+        decoded = decode_message(encode_message(message), archive)
+        for field in (
+            "id",
+            "created_at",
+            "updated_at",
+            "user_id",
+            "message",
+            "version",
+        ):
+            self.assertEqual(getattr(decoded, field), getattr(message, field))
+        self.assertEqual(decoded.group_id, archive.group_id)
+        self.assertTrue(decoded.archived)
+
+
+@override_settings(
+    CACHES={"counters": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class UnreadCountTest(SimpleTestCase):
+    def test_cached_counts_follow_new_messages(self):
+        channel, user_id = f"group:{uuid.uuid4()}", uuid.uuid4()
+
+        # Nothing is cached to begin with, so the count has to be made (and is then cached)
+        unread, totals = get_cached_unread_counts(user_id, [channel])
+        self.assertEqual(unread, {})
+        cache_unread_counts(user_id, {channel: 3}, totals)
+        self.assertEqual(get_cached_unread_counts(user_id, [channel])[0], {channel: 3})
+
+        # New messages add to it, until the chat is read
+        count_message(channel)
+        count_message(channel)
+        unread, totals = get_cached_unread_counts(user_id, [channel])
+        self.assertEqual(unread, {channel: 5})
+        cache_unread_counts(user_id, {channel: 0}, totals)
+        self.assertEqual(get_cached_unread_counts(user_id, [channel])[0], {channel: 0})
+
+    def test_counts_cached_against_an_old_total_are_dropped(self):
+        channel, user_id = f"group:{uuid.uuid4()}", uuid.uuid4()
+        _, totals = get_cached_unread_counts(user_id, [channel])
+        cache_unread_counts(user_id, {channel: 0}, totals)
+
+        # The chat's total being lost restarts it, under a new epoch
+        caches["counters"].delete(f"chat-unread:{channel}:total")
+        self.assertEqual(get_cached_unread_counts(user_id, [channel])[0], {})
+
+    def test_restarted_totals_are_counted_again(self):
+        channel, user_id = f"group:{uuid.uuid4()}", uuid.uuid4()
+        _, totals = get_cached_unread_counts(user_id, [channel])
+        cache_unread_counts(user_id, {channel: 2}, totals)
+        count_message(channel)
+
+        restart_chat_total(channel)
+        unread, totals = get_cached_unread_counts(user_id, [channel])
+        self.assertEqual(unread, {})
+        self.assertEqual(totals[channel][1], 0)
+
+
+@local_caches
+class ChatReadTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        # A member, and a user who has only asked to join
+        self.member = create_user()
+        self.group = create_group(self.member)
+        Membership.objects.create(
+            user=self.member, group=self.group, status=MEMBERSHIP_STATUS_CURRENT
+        )
+        self.visitor = create_user(email="visitor@test.com")
+        Membership.objects.create(
+            user=self.visitor, group=self.group, status=MEMBERSHIP_STATUS_PENDING
+        )
+        Message.objects.create(user=self.member, group=self.group, message="Hello")
+
+    def has_read_cursor(self, user) -> bool:
+        return ReadCursor.objects.filter(
+            user=user, channel=group_channel(self.group.pk)
+        ).exists()
+
+    def test_polling_members_read_the_chat(self):
+        for user in (self.member, self.visitor):
+            self.client.force_login(user)
+            response = self.client.get(
+                reverse("group-message-changes", args=[self.group.slug]),
+                {"since": 0},
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(self.has_read_cursor(self.member))
+        self.assertFalse(self.has_read_cursor(self.visitor))
+
+    def test_deleted_chats_are_not_found(self):
+        collaboration = create_collaboration(self.group)
+        tombstone_group(self.group)
+        self.client.force_login(self.member)
+
+        for request, name, slug in (
+            (self.client.post, "group-message-create", self.group.slug),
+            (self.client.get, "group-message-page", self.group.slug),
+            (self.client.get, "group-message-changes", self.group.slug),
+            (self.client.post, "collaboration-message-create", collaboration.slug),
+            (self.client.get, "collaboration-message-page", collaboration.slug),
+            (self.client.get, "collaboration-message-changes", collaboration.slug),
+        ):
+            response = request(reverse(name, args=[slug]), {"since": 0})
+            self.assertEqual(response.status_code, 404, name)
+
+    def test_removing_a_message_restarts_the_chat_total(self):
+        channel = group_channel(self.group.pk)
+        message = Message.objects.create(
+            user=self.member, group=self.group, message="Goodbye"
+        )
+        _, totals = get_cached_unread_counts(self.member.pk, [channel])
+        cache_unread_counts(self.member.pk, {channel: 1}, totals)
+
+        message.remove()
+        self.assertEqual(get_cached_unread_counts(self.member.pk, [channel])[0], {})
+
+    def test_visitors_leave_no_read_cursor(self):
+        self.client.force_login(self.visitor)
+        response = self.client.get(reverse("group-detail", args=[self.group.slug]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.has_read_cursor(self.visitor))
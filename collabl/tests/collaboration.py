@@ -0,0 +1,1036 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import TestCase, mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+import groups.constants as group_constants
+from collaborations import constants as c
+from collaborations.admin import CollaborationTaskAdminForm
+from collaborations.models import (
+    Collaboration,
+    CollaborationMilestone,
+    CollaborationTask,
+    get_ordered_elements,
+    get_position_between,
+)
+from collaborations.tasks import renormalise_element_positions
+from collaborations.utils import (
+    MilestoneElement,
+    TaskElement,
+    TaskGraph,
+    reconcile_progress_counters,
+)
+from groups.models import Membership
+from users.models import User
+
+from .utils import (
+    create_collaboration,
+    create_group,
+    create_user,
+    local_caches,
+    use_memory_events,
+)
+
+
+class ElementPositionTest(TestCase):
+    def test_position_at_end(self):
+        self.assertEqual(get_position_between(None, None), c.ELEMENT_POSITION_GAP)
+        self.assertEqual(
+            get_position_between(2048, None), 2048 + c.ELEMENT_POSITION_GAP
+        )
+
+    def test_position_between_neighbours(self):
+        self.assertEqual(get_position_between(1024, 2048), 1536)
+        self.assertEqual(get_position_between(None, 1024), 512)
+
+    def test_no_gap(self):
+        self.assertIsNone(get_position_between(5, 6))
+        self.assertIsNone(get_position_between(None, 1))
+
+
+class ElementRowTest(TestCase):
+    def test_task_element(self):
+        task = TaskElement(
+            "pk", 1024, 1, "Task", None, None, None, None, None, None, None, ""
+        )
+        self.assertEqual(task.type, c.COLLABORATION_ELEMENT_TYPE_TASK)
+        self.assertFalse(task.is_complete())
+        self.assertIsNone(task.file)
+
+    def test_milestone_element(self):
+        milestone = MilestoneElement("pk", 2048, "Milestone", None, 2, 3)
+        self.assertEqual(milestone.type, c.COLLABORATION_ELEMENT_TYPE_MILESTONE)
+        self.assertFalse(milestone.is_complete())
+        milestone.tasks_completed = 3
+        self.assertTrue(milestone.is_complete())
+
+
+class MilestoneStatusTest(TestCase):
+    def test_status_read_from_stored_progress(self):
+        # No queries are needed - an unsaved milestone has no database row to count from
+        past = timezone.now() - timedelta(days=1)
+        milestone = CollaborationMilestone(
+            completed_count=2, total_count=3, target_date=past
+        )
+        self.assertEqual(milestone.status, c.MILESTONE_STATUS_BEHIND_TARGET)
+        self.assertEqual(milestone.tasks_outstanding(), 1)
+        self.assertFalse(milestone.is_complete())
+
+        milestone.completed_count, milestone.reached_at = 3, timezone.now()
+        self.assertEqual(milestone.status, c.MILESTONE_STATUS_REACHED)
+        self.assertTrue(milestone.is_complete())
+
+
+class TaskGraphTest(TestCase):
+    def setUp(self):
+        # a -> b -> d, a -> c (b depends on a, and so on), with a complete
+        self.graph = TaskGraph(
+            [("a", True), ("b", False), ("c", False), ("d", False), ("e", False)],
+            [("b", "a"), ("c", "a"), ("d", "b")],
+        )
+
+    def test_topological_order(self):
+        self.assertEqual(self.graph.topological_order, ["a", "b", "c", "d", "e"])
+        self.assertFalse(self.graph.has_cycle)
+
+    def test_ready_and_blocked(self):
+        self.assertEqual(self.graph.ready, {"b", "c", "e"})
+        self.assertEqual(self.graph.blocked, {"d"})
+
+    def test_critical_path_length(self):
+        self.assertEqual(self.graph.critical_path_length, 2)
+
+    def test_cycle_detection(self):
+        self.assertTrue(self.graph.would_create_cycle("a", "d"))
+        self.assertTrue(self.graph.would_create_cycle("b", "b"))
+        self.assertFalse(self.graph.would_create_cycle("e", "d"))
+
+        # Tasks caught in a cycle are left out of the order
+        self.graph.add_edge("a", "d")
+        self.assertEqual(self.graph.topological_order, ["e"])
+        self.assertTrue(self.graph.has_cycle)
+
+
+@local_caches
+class ElementInsertTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+        patcher = mock.patch.object(renormalise_element_positions, "delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.collaboration = create_collaboration(create_group(create_user()))
+        self.t0, self.t1 = (
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=f"Task {index}"
+            )
+            for index in range(2)
+        )
+        self.m0 = CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone"
+        )
+
+    def get_positions(self) -> dict:
+        return {
+            pk: position
+            for pk, _, position in get_ordered_elements(self.collaboration.pk)
+        }
+
+    def test_elements_are_appended(self):
+        self.assertEqual(
+            list(self.get_positions().items()),
+            [
+                (str(self.t0.pk), c.ELEMENT_POSITION_GAP),
+                (str(self.t1.pk), 2 * c.ELEMENT_POSITION_GAP),
+                (str(self.m0.pk), 3 * c.ELEMENT_POSITION_GAP),
+            ],
+        )
+
+    def test_insert_between_neighbours(self):
+        positions = self.get_positions()
+
+        # Only the new task's row is written - its neighbours keep their positions
+        task = CollaborationTask.objects.create(
+            collaboration=self.collaboration, name="Inserted", position=1
+        )
+
+        self.assertEqual(
+            list(self.get_positions().items()),
+            [
+                (str(self.t0.pk), positions[str(self.t0.pk)]),
+                (str(task.pk), (self.t0.position + self.t1.position) // 2),
+                (str(self.t1.pk), positions[str(self.t1.pk)]),
+                (str(self.m0.pk), positions[str(self.m0.pk)]),
+            ],
+        )
+        renormalise_element_positions.delay.assert_not_called()
+
+    def test_insert_renormalises_an_exhausted_gap(self):
+        for position, element in enumerate((self.t0, self.t1), start=1):
+            CollaborationTask.objects.filter(pk=element.pk).update(position=position)
+        CollaborationMilestone.objects.filter(pk=self.m0.pk).update(position=3)
+
+        # There is no position between t0 (1) and t1 (2), so the collaboration is respaced first
+        task = CollaborationTask.objects.create(
+            collaboration=self.collaboration, name="Inserted", position=1
+        )
+
+        self.assertEqual(
+            list(self.get_positions().items()),
+            [
+                (str(self.t0.pk), c.ELEMENT_POSITION_GAP),
+                (str(task.pk), c.ELEMENT_POSITION_GAP * 3 // 2),
+                (str(self.t1.pk), 2 * c.ELEMENT_POSITION_GAP),
+                (str(self.m0.pk), 3 * c.ELEMENT_POSITION_GAP),
+            ],
+        )
+
+
+@local_caches
+class ElementConcurrencyTest(TransactionTestCase):
+    """
+    Elements are moved and removed by several members at once, each in their own transaction (and connection) - the
+    collaboration's lock (see lock_elements) must keep their positions unique and in order.
+    """
+
+    def setUp(self):
+        use_memory_events(self)
+        patcher = mock.patch.object(renormalise_element_positions, "delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Six tasks, split into segments by two milestones: t0 t1 t2 M0 t3 t4 t5 M1
+        self.collaboration = create_collaboration(create_group(create_user()))
+        self.tasks, self.milestones = [], []
+        for segment in range(2):
+            for index in range(3):
+                self.tasks.append(
+                    CollaborationTask.objects.create(
+                        collaboration=self.collaboration,
+                        name=f"Task {segment * 3 + index}",
+                    )
+                )
+            self.milestones.append(
+                CollaborationMilestone.objects.create(
+                    collaboration=self.collaboration, name=f"Milestone {segment}"
+                )
+            )
+
+    def run_concurrently(self, *actions) -> None:
+        """Runs each action in a thread (with its own database connection) at the same time, failing on any error"""
+        barrier, errors = threading.Barrier(len(actions)), []
+
+        def run(action):
+            try:
+                barrier.wait()
+                action()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(action,)) for action in actions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def pack_positions(self) -> None:
+        """Packs every element's position next to the last, so there is no gap left anywhere"""
+        for position, (pk, element_type, _) in enumerate(
+            get_ordered_elements(self.collaboration.pk), start=1
+        ):
+            model = (
+                CollaborationTask
+                if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK
+                else CollaborationMilestone
+            )
+            model.objects.filter(pk=pk).update(position=position)
+
+    def assertElementsConsistent(self, expected_pks) -> list:
+        """
+        Checks the elements' positions are unique and in order, each milestone's prerequisites are the tasks in its
+        segment and the collaboration's counters add up - returning the elements' pks in order
+        """
+        elements = get_ordered_elements(self.collaboration.pk)
+        positions = [position for _, _, position in elements]
+        self.assertEqual(positions, sorted(set(positions)))
+        self.assertEqual(
+            {pk for pk, _, _ in elements}, {str(pk) for pk in expected_pks}
+        )
+
+        segment = set()
+        for pk, element_type, _ in elements:
+            if element_type == c.COLLABORATION_ELEMENT_TYPE_TASK:
+                segment.add(pk)
+                continue
+            milestone = CollaborationMilestone.objects.get(pk=pk)
+            self.assertEqual(
+                {
+                    str(task_pk)
+                    for task_pk in milestone.prerequisites.values_list("pk", flat=True)
+                },
+                segment,
+            )
+            self.assertEqual(milestone.total_count, len(segment))
+            segment = set()
+
+        collaboration = Collaboration.objects.get(pk=self.collaboration.pk)
+        self.assertEqual(
+            collaboration.task_count,
+            CollaborationTask.objects.filter(collaboration=collaboration).count(),
+        )
+        self.assertEqual(
+            collaboration.milestone_count,
+            CollaborationMilestone.objects.filter(collaboration=collaboration).count(),
+        )
+        return [pk for pk, _, _ in elements]
+
+    def test_concurrent_repositions_and_removals(self):
+        t0, t1, t2, t3, t4, t5 = self.tasks
+        m0, m1 = self.milestones
+
+        self.run_concurrently(
+            lambda: CollaborationTask.objects.get(pk=t5.pk).reposition(0),
+            lambda: CollaborationTask.objects.get(pk=t0.pk).reposition(5),
+            lambda: CollaborationTask.objects.get(pk=t3.pk).reposition(1),
+            lambda: CollaborationMilestone.objects.get(pk=m1.pk).reposition(2),
+            lambda: CollaborationTask.objects.get(pk=t1.pk).remove(),
+            lambda: CollaborationMilestone.objects.get(pk=m0.pk).remove(),
+        )
+
+        self.assertElementsConsistent([t0.pk, t2.pk, t3.pk, t4.pk, t5.pk, m1.pk])
+
+    def test_concurrent_repositions_into_the_same_gap(self):
+        # Every move lands between the first two elements
+        self.run_concurrently(
+            *(
+                lambda task=task: CollaborationTask.objects.get(pk=task.pk).reposition(
+                    1
+                )
+                for task in self.tasks[2:]
+            )
+        )
+
+        order = self.assertElementsConsistent(
+            [task.pk for task in self.tasks]
+            + [milestone.pk for milestone in self.milestones]
+        )
+        # The moved tasks all end up between the first task and the one which followed it
+        self.assertEqual(order[0], str(self.tasks[0].pk))
+        self.assertEqual(
+            order[-3:],
+            [
+                str(self.tasks[1].pk),
+                *(str(milestone.pk) for milestone in self.milestones),
+            ],
+        )
+
+    def test_concurrent_repositions_into_an_exhausted_gap(self):
+        self.pack_positions()
+
+        self.run_concurrently(
+            *(
+                lambda task=task: CollaborationTask.objects.get(pk=task.pk).reposition(
+                    1
+                )
+                for task in self.tasks[2:]
+            ),
+            lambda: CollaborationMilestone.objects.get(
+                pk=self.milestones[1].pk
+            ).reposition(1),
+        )
+
+        self.assertElementsConsistent(
+            [task.pk for task in self.tasks]
+            + [milestone.pk for milestone in self.milestones]
+        )
+
+    def test_reposition_renormalises_an_exhausted_gap(self):
+        t0, t1, t2 = self.tasks[:3]
+        self.pack_positions()
+
+        # There is no position between t0 (1) and t1 (2), so the collaboration is respaced first
+        t2.reposition(1)
+
+        order = self.assertElementsConsistent(
+            [task.pk for task in self.tasks]
+            + [milestone.pk for milestone in self.milestones]
+        )
+        self.assertEqual(order[:3], [str(t0.pk), str(t2.pk), str(t1.pk)])
+        t0.refresh_from_db()
+        t1.refresh_from_db()
+        self.assertEqual(t0.position, c.ELEMENT_POSITION_GAP)
+        self.assertEqual(t1.position, 2 * c.ELEMENT_POSITION_GAP)
+        self.assertEqual(t2.position, (t0.position + t1.position) // 2)
+
+    def test_milestone_reposition_renormalises_an_exhausted_gap(self):
+        t0, t1, t2, t3, t4, t5 = self.tasks
+        m0, m1 = self.milestones
+        self.pack_positions()
+
+        # The collaboration is respaced while M1 is being moved - its prerequisites must be handed on from where it
+        # was respaced to, not its packed position
+        CollaborationMilestone.objects.get(pk=m1.pk).reposition(1)
+
+        order = self.assertElementsConsistent(
+            [task.pk for task in self.tasks]
+            + [milestone.pk for milestone in self.milestones]
+        )
+        self.assertEqual(
+            order,
+            [str(element.pk) for element in (t0, m1, t1, t2, m0, t3, t4, t5)],
+        )
+
+    def test_reposition_queues_a_renormalise_when_the_gap_is_tight(self):
+        t0, t1, t2 = self.tasks[:3]
+        CollaborationTask.objects.filter(pk=t1.pk).update(
+            position=t0.position + c.ELEMENT_POSITION_RENORMALISE_THRESHOLD
+        )
+
+        t2.reposition(1)
+
+        renormalise_element_positions.delay.assert_called_once_with(
+            str(self.collaboration.pk)
+        )
+        self.assertElementsConsistent(
+            [task.pk for task in self.tasks]
+            + [milestone.pk for milestone in self.milestones]
+        )
+
+
+@local_caches
+class MilestonePrerequisiteTest(TransactionTestCase):
+    """
+    A milestone's prerequisites are the tasks between it and the milestone before it - they are claimed and released
+    one segment at a time as tasks and milestones are added, moved and removed (see CollaborationMilestone.
+    claim_prerequisites & release_prerequisites)
+    """
+
+    def setUp(self):
+        use_memory_events(self)
+
+        # t0 t1 t2 M0 t3 t4 t5 M1, with t0 & t3 complete
+        self.collaboration = create_collaboration(create_group(create_user()))
+        self.t0, self.t1, self.t2 = self.create_tasks(3)
+        self.m0 = self.create_milestone()
+        self.t3, self.t4, self.t5 = self.create_tasks(3)
+        self.m1 = self.create_milestone()
+        for task in (self.t0, self.t3):
+            task.completed_at = timezone.now()
+            task.save()
+
+    def create_tasks(self, count, **kwargs) -> list:
+        return [
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=f"Task {index}", **kwargs
+            )
+            for index in range(count)
+        ]
+
+    def create_milestone(self, **kwargs):
+        return CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone", **kwargs
+        )
+
+    def assertPrerequisites(self, milestone, tasks, completed) -> None:
+        milestone = CollaborationMilestone.objects.get(pk=milestone.pk)
+        self.assertEqual(set(milestone.prerequisites.all()), set(tasks))
+        self.assertEqual(
+            (milestone.completed_count, milestone.total_count), (completed, len(tasks))
+        )
+
+    def test_adding_tasks(self):
+        (first,) = self.create_tasks(1, position=0)
+        (last,) = self.create_tasks(1)
+
+        self.assertPrerequisites(self.m0, [first, self.t0, self.t1, self.t2], 1)
+        self.assertPrerequisites(self.m1, [self.t3, self.t4, self.t5], 1)
+        self.assertFalse(last.milestone.exists())
+
+    def test_moving_tasks(self):
+        # t3 (complete) back across M0, and t1 on past M1
+        CollaborationTask.objects.get(pk=self.t3.pk).reposition(0)
+        CollaborationTask.objects.get(pk=self.t1.pk).reposition(7)
+
+        self.assertPrerequisites(self.m0, [self.t3, self.t0, self.t2], 2)
+        self.assertPrerequisites(self.m1, [self.t4, self.t5], 0)
+        self.assertFalse(self.t1.milestone.exists())
+
+    def test_removing_tasks(self):
+        CollaborationTask.objects.get(pk=self.t0.pk).remove()
+        CollaborationTask.objects.get(pk=self.t4.pk).remove()
+
+        self.assertPrerequisites(self.m0, [self.t1, self.t2], 0)
+        self.assertPrerequisites(self.m1, [self.t3, self.t5], 1)
+
+    def test_adding_milestones(self):
+        # One part way through the first segment, which claims the tasks before it from M0, and one at the end, with
+        # no tasks left to claim
+        middle = self.create_milestone(position=2)
+        last = self.create_milestone()
+
+        self.assertPrerequisites(middle, [self.t0, self.t1], 1)
+        self.assertPrerequisites(self.m0, [self.t2], 0)
+        self.assertPrerequisites(self.m1, [self.t3, self.t4, self.t5], 1)
+        self.assertPrerequisites(last, [], 0)
+
+    def test_moving_milestones(self):
+        # M0 moves on to between t4 & t5: it hands t0-t2 on to M1, and claims t0-t4 back
+        CollaborationMilestone.objects.get(pk=self.m0.pk).reposition(5)
+        self.assertPrerequisites(
+            self.m0, [self.t0, self.t1, self.t2, self.t3, self.t4], 2
+        )
+        self.assertPrerequisites(self.m1, [self.t5], 0)
+
+        # M1 moves to the top, so has nothing before it - and t5 is left without a milestone
+        CollaborationMilestone.objects.get(pk=self.m1.pk).reposition(0)
+        self.assertPrerequisites(self.m1, [], 0)
+        self.assertPrerequisites(
+            self.m0, [self.t0, self.t1, self.t2, self.t3, self.t4], 2
+        )
+        self.assertFalse(self.t5.milestone.exists())
+
+    def test_removing_milestones(self):
+        # M0's tasks pass on to M1, and once M1 has gone too, no tasks have a milestone
+        CollaborationMilestone.objects.get(pk=self.m0.pk).remove()
+        self.assertPrerequisites(
+            self.m1, [self.t0, self.t1, self.t2, self.t3, self.t4, self.t5], 2
+        )
+
+        CollaborationMilestone.objects.get(pk=self.m1.pk).remove()
+        self.assertFalse(
+            CollaborationMilestone.prerequisites.through.objects.filter(
+                collaborationtask__collaboration=self.collaboration
+            ).exists()
+        )
+
+
+@local_caches
+class ProgressCounterTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        self.collaboration = create_collaboration(create_group(create_user()))
+        self.t0, self.t1 = (
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=f"Task {index}"
+            )
+            for index in range(2)
+        )
+        self.m0 = CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone"
+        )
+
+    def assertCounters(self, collaboration, task, completed_task, milestone) -> None:
+        collaboration = Collaboration.objects.get(pk=collaboration.pk)
+        self.assertEqual(
+            (
+                collaboration.task_count,
+                collaboration.completed_task_count,
+                collaboration.milestone_count,
+            ),
+            (task, completed_task, milestone),
+        )
+
+    def test_counters_follow_element_changes(self):
+        self.assertCounters(self.collaboration, 2, 0, 1)
+
+        # Completing a task (as the toggle view does) counts it, and undoing it takes it off again
+        self.t0.completed_at = timezone.now()
+        self.t0.save()
+        self.assertCounters(self.collaboration, 2, 1, 1)
+        self.t0.completed_at = None
+        self.t0.save()
+        self.assertCounters(self.collaboration, 2, 0, 1)
+
+        # Removing a completed task takes it off both counts
+        self.t1.completed_at = timezone.now()
+        self.t1.save()
+        CollaborationTask.objects.get(pk=self.t1.pk).remove()
+        self.assertCounters(self.collaboration, 1, 0, 1)
+
+        CollaborationMilestone.objects.get(pk=self.m0.pk).remove()
+        self.assertCounters(self.collaboration, 1, 0, 0)
+
+    def test_reconcile_repairs_drifted_counters(self):
+        other = create_collaboration(self.collaboration.related_group, name="Other")
+        CollaborationTask.objects.create(collaboration=other, name="Other")
+        versions = dict(Collaboration.objects.values_list("pk", "elements_version"))
+
+        # The counters (and the milestone's progress) drift, e.g. after a bulk delete which skipped them
+        CollaborationTask.objects.filter(pk=self.t0.pk).delete()
+        Collaboration.objects.filter(pk=self.collaboration.pk).update(
+            completed_task_count=5
+        )
+
+        with mock.patch.object(c, "RECONCILE_BATCH_SIZE", 1):
+            self.assertEqual(reconcile_progress_counters(), 1)
+
+        self.assertCounters(self.collaboration, 1, 0, 1)
+        self.assertCounters(other, 1, 0, 0)
+        self.m0.refresh_from_db()
+        self.assertEqual((self.m0.completed_count, self.m0.total_count), (0, 1))
+
+        # Only the drifted collaboration's cached element list is thrown away
+        self.assertEqual(
+            dict(Collaboration.objects.values_list("pk", "elements_version")),
+            {
+                self.collaboration.pk: versions[self.collaboration.pk] + 1,
+                other.pk: versions[other.pk],
+            },
+        )
+        self.assertEqual(reconcile_progress_counters(), 0)
+
+
+@local_caches
+class CollaborationProgressTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        # Collaborations with none, some and all of their tasks complete, and one with no tasks at all
+        group = create_group(create_user())
+        self.collaborations = {}
+        for name, completed in (
+            (c.COLLABORATION_STATUS_PLANNING, 0),
+            (c.COLLABORATION_STATUS_ONGOING, 1),
+            (c.COLLABORATION_STATUS_COMPLETED, 3),
+        ):
+            collaboration = create_collaboration(group, name=name)
+            for index in range(3):
+                CollaborationTask.objects.create(
+                    collaboration=collaboration,
+                    name=f"Task {index}",
+                    completed_at=timezone.now() if index < completed else None,
+                )
+            CollaborationMilestone.objects.create(
+                collaboration=collaboration, name="Milestone"
+            )
+            self.collaborations[name] = collaboration
+        self.empty = create_collaboration(group, name="Empty")
+
+    def test_with_progress(self):
+        collaborations = {
+            collaboration.pk: collaboration
+            for collaboration in Collaboration.objects.with_progress()
+        }
+        for name, progress_percent in (
+            (c.COLLABORATION_STATUS_PLANNING, 0),
+            (c.COLLABORATION_STATUS_ONGOING, 33),
+            (c.COLLABORATION_STATUS_COMPLETED, 100),
+        ):
+            collaboration = collaborations[self.collaborations[name].pk]
+            self.assertEqual(collaboration.progress_percent, progress_percent)
+            self.assertEqual(
+                collaboration.progress_percent, collaboration.percent_completed
+            )
+            self.assertEqual(collaboration.progress_status, name)
+            self.assertEqual(collaboration.progress_status, collaboration.status)
+            self.assertEqual(collaboration.element_count, 4)
+            self.assertEqual(
+                collaboration.last_activity_at,
+                max(
+                    collaboration.updated_at,
+                    *collaboration.tasks.values_list("updated_at", flat=True),
+                    *collaboration.milestones.values_list("updated_at", flat=True),
+                ),
+            )
+
+        # A collaboration without any tasks is still being planned
+        empty = collaborations[self.empty.pk]
+        self.assertEqual(empty.progress_percent, 0)
+        self.assertEqual(empty.progress_status, c.COLLABORATION_STATUS_PLANNING)
+        self.assertEqual(empty.progress_status, empty.status)
+        self.assertEqual(empty.element_count, 0)
+        self.assertEqual(empty.last_activity_at, empty.updated_at)
+
+    def test_by_status(self):
+        for status, expected in (
+            (
+                c.COLLABORATION_STATUS_PLANNING,
+                {self.collaborations[c.COLLABORATION_STATUS_PLANNING], self.empty},
+            ),
+            (
+                c.COLLABORATION_STATUS_ONGOING,
+                {self.collaborations[c.COLLABORATION_STATUS_ONGOING]},
+            ),
+            (
+                c.COLLABORATION_STATUS_COMPLETED,
+                {self.collaborations[c.COLLABORATION_STATUS_COMPLETED]},
+            ),
+            (
+                c.COLLABORATION_STATUS_ALL,
+                {*self.collaborations.values(), self.empty},
+            ),
+            ("Unknown", set()),
+        ):
+            self.assertEqual(
+                set(Collaboration.objects.with_progress().by_status(status)),
+                expected,
+                status,
+            )
+
+
+@local_caches
+class ElementBatchTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        # t0 t1 t2 M0 t3 t4 M1
+        self.user = create_user()
+        self.collaboration = create_collaboration(create_group(self.user))
+        Membership.objects.create(
+            user=self.user,
+            group=self.collaboration.related_group,
+            status=group_constants.MEMBERSHIP_STATUS_ADMIN,
+        )
+        self.t0, self.t1, self.t2 = self.create_tasks(3)
+        self.m0 = self.create_milestone()
+        self.t3, self.t4 = self.create_tasks(2)
+        self.m1 = self.create_milestone()
+        self.collaboration.refresh_from_db()
+
+    def create_tasks(self, count) -> list:
+        return [
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=f"Task {index}"
+            )
+            for index in range(count)
+        ]
+
+    def create_milestone(self):
+        return CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone"
+        )
+
+    def get_order(self) -> list:
+        return [pk for pk, _, _ in get_ordered_elements(self.collaboration.pk)]
+
+    def test_mixed_batch(self):
+        version = self.collaboration.elements_version
+        other = create_collaboration(self.collaboration.related_group, name="Other")
+        other_task = CollaborationTask.objects.create(collaboration=other, name="Other")
+
+        self.collaboration.apply_element_operations(
+            [
+                (c.MOVE_ELEMENTS, self.t4.pk, 0),
+                (c.COMPLETE_TASK, self.t0.pk, None),
+                (c.COMPLETE_TASK, self.t3.pk, None),
+                (c.DELETE_ELEMENTS, self.t1.pk, None),
+                (c.DELETE_ELEMENTS, self.m0.pk, None),
+                # Ignored - milestones can't be completed, and the task belongs to another collaboration
+                (c.COMPLETE_TASK, self.m1.pk, None),
+                (c.DELETE_ELEMENTS, other_task.pk, None),
+            ],
+            user=self.user,
+        )
+
+        # The remaining elements are respaced in their new order
+        elements = get_ordered_elements(self.collaboration.pk)
+        self.assertEqual(
+            [pk for pk, _, _ in elements],
+            [
+                str(element.pk)
+                for element in (self.t4, self.t0, self.t2, self.t3, self.m1)
+            ],
+        )
+        self.assertEqual(
+            [position for _, _, position in elements],
+            [index * c.ELEMENT_POSITION_GAP for index in range(1, 6)],
+        )
+
+        # The counters are recounted, and the version bumped once for the whole batch
+        self.assertEqual(self.collaboration.task_count, 4)
+        self.assertEqual(self.collaboration.completed_task_count, 2)
+        self.assertEqual(self.collaboration.milestone_count, 1)
+        self.assertEqual(self.collaboration.elements_version, version + 1)
+        self.collaboration.refresh_from_db()
+        self.assertEqual(self.collaboration.elements_version, version + 1)
+
+        # The remaining milestone takes every task before it
+        self.m1.refresh_from_db()
+        self.assertEqual(
+            set(self.m1.prerequisites.all()), {self.t4, self.t0, self.t2, self.t3}
+        )
+        self.assertEqual((self.m1.completed_count, self.m1.total_count), (2, 4))
+        self.t0.refresh_from_db()
+        self.assertEqual(self.t0.completed_by, self.user)
+        self.assertTrue(CollaborationTask.objects.filter(pk=other_task.pk).exists())
+
+    def test_batch_view(self):
+        self.client.force_login(self.user)
+        url = reverse("collaboration-element-batch", args=[self.collaboration.slug])
+        version = self.collaboration.elements_version
+
+        # Move t3 & t4 to the top, then complete them
+        response = self.client.post(
+            url,
+            {
+                "elements": [self.t4.pk, self.t3.pk],
+                "operation": c.MOVE_ELEMENTS,
+                "position": 0,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.get_order(),
+            [
+                str(element.pk)
+                for element in (
+                    self.t3,
+                    self.t4,
+                    self.t0,
+                    self.t1,
+                    self.t2,
+                    self.m0,
+                    self.m1,
+                )
+            ],
+        )
+
+        response = self.client.post(
+            url,
+            {"elements": [self.t3.pk, self.t4.pk], "operation": c.COMPLETE_TASK},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.collaboration.refresh_from_db()
+        self.assertEqual(self.collaboration.task_count, 5)
+        self.assertEqual(self.collaboration.completed_task_count, 2)
+        self.assertEqual(self.collaboration.milestone_count, 2)
+        self.assertEqual(self.collaboration.elements_version, version + 2)
+        self.m0.refresh_from_db()
+        self.assertEqual((self.m0.completed_count, self.m0.total_count), (2, 5))
+
+    def test_batch_view_needs_an_active_membership(self):
+        self.client.force_login(create_user(email="outsider@test.com"))
+        version = self.collaboration.elements_version
+
+        response = self.client.post(
+            reverse("collaboration-element-batch", args=[self.collaboration.slug]),
+            {"elements": [self.t0.pk], "operation": c.DELETE_ELEMENTS},
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(CollaborationTask.objects.filter(pk=self.t0.pk).exists())
+        self.collaboration.refresh_from_db()
+        self.assertEqual(self.collaboration.elements_version, version)
+
+
+@local_caches
+class TaskChangeViewTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        # t0 t1 M0 t2
+        self.user = create_user()
+        self.collaboration = create_collaboration(create_group(self.user))
+        Membership.objects.create(
+            user=self.user,
+            group=self.collaboration.related_group,
+            status=group_constants.MEMBERSHIP_STATUS_ADMIN,
+        )
+        self.t0, self.t1 = [
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=f"Task {index}"
+            )
+            for index in range(2)
+        ]
+        self.m0 = CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone"
+        )
+        self.t2 = CollaborationTask.objects.create(
+            collaboration=self.collaboration, name="Task 2"
+        )
+        self.client.force_login(self.user)
+
+    def assertChanges(self, response, task):
+        """Checks just the task is sent back, with its milestone & the progress widgets swapped in out of band"""
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'<div id="element-{task.pk}">', count=1)
+        self.assertContains(
+            response, f'<div id="element-{self.m0.pk}" hx-swap-oob="true">', count=1
+        )
+        self.assertContains(response, 'id="element_list_finish"', count=1)
+        self.assertContains(response, 'hx-swap-oob="true"', count=2)
+        for other in {self.t0, self.t1, self.t2} - {task}:
+            self.assertNotContains(response, f'id="element-{other.pk}"')
+
+    def test_toggle_view(self):
+        response = self.client.post(
+            reverse(
+                "collaboration-task-toggle",
+                args=[self.collaboration.slug, self.t0.pk, c.COMPLETE_TASK],
+            )
+        )
+
+        self.assertChanges(response, self.t0)
+        self.assertContains(response, "( 1 / 2")
+        self.t0.refresh_from_db()
+        self.assertEqual(self.t0.completed_by, self.user)
+
+    def test_notes_view(self):
+        response = self.client.post(
+            reverse(
+                "collaboration-task-notes", args=[self.collaboration.slug, self.t1.pk]
+            ),
+            {"completion_notes": "Baked"},
+        )
+
+        self.assertChanges(response, self.t1)
+        self.t1.refresh_from_db()
+        self.assertEqual(self.t1.completion_notes, "Baked")
+
+    def test_update_view(self):
+        response = self.client.post(
+            reverse(
+                "collaboration-task-update", args=[self.collaboration.slug, self.t0.pk]
+            ),
+            {"name": "Bake cakes", "description": "Lots of them"},
+        )
+
+        self.assertChanges(response, self.t0)
+        self.assertContains(response, "Bake cakes")
+        self.t0.refresh_from_db()
+        self.assertEqual(self.t0.name, "Bake cakes")
+
+
+@local_caches
+class ElementListCacheTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        self.user = create_user(first_name="Archie")
+        self.collaboration = create_collaboration(create_group(self.user))
+        Membership.objects.create(
+            user=self.user,
+            group=self.collaboration.related_group,
+            status=group_constants.MEMBERSHIP_STATUS_ADMIN,
+        )
+        self.task = CollaborationTask.objects.create(
+            collaboration=self.collaboration, name="Bake cakes", assigned_to=self.user
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("collaboration-element-list", args=[self.collaboration.slug])
+
+    def test_element_changes_invalidate_the_list(self):
+        self.assertContains(self.client.get(self.url), "Bake cakes")
+        self.collaboration.refresh_from_db()
+        version = self.collaboration.elements_version
+
+        # Changing an element bumps the version, so the list is rendered afresh
+        self.task.name = "Ice cakes"
+        self.task.save()
+        self.collaboration.refresh_from_db()
+        self.assertEqual(self.collaboration.elements_version, version + 1)
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "Ice cakes")
+        self.assertNotContains(response, "Bake cakes")
+
+    def test_other_changes_expire(self):
+        self.assertContains(self.client.get(self.url), "Archie")
+
+        # Renaming the assignee doesn't bump the version, so the cached list is served until it expires
+        User.objects.filter(pk=self.user.pk).update(first_name="Jughead")
+        self.assertContains(self.client.get(self.url), "Archie")
+
+        with mock.patch("time.time", return_value=time.time() + 301):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Jughead")
+        self.assertNotContains(response, "Archie")
+
+
+@local_caches
+class TaskAdminTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        # b depends on a
+        self.collaboration = create_collaboration(create_group(create_user()))
+        self.a, self.b, self.c = (
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration, name=name
+            )
+            for name in ("a", "b", "c")
+        )
+        self.b.add_prerequisites(self.a)
+
+    def get_form(self, task, prerequisites):
+        return CollaborationTaskAdminForm(
+            {
+                "collaboration": task.collaboration_id,
+                "reference": task.reference,
+                "name": task.name,
+                "position": task.position,
+                "prerequisites": [prerequisite.pk for prerequisite in prerequisites],
+            },
+            instance=task,
+        )
+
+    def login_admin(self) -> None:
+        self.client.force_login(
+            User.objects.create(
+                email="admin@test.com", is_staff=True, is_superuser=True
+            )
+        )
+
+    def post_prerequisites(self, task, prerequisites):
+        return self.client.post(
+            reverse("admin:collaborations_collaborationtask_change", args=[task.pk]),
+            {
+                "collaboration": self.collaboration.pk,
+                "name": task.name,
+                "position": task.position,
+                "prerequisites": ",".join(
+                    str(prerequisite.pk) for prerequisite in prerequisites
+                ),
+                "_save": "Save",
+            },
+        )
+
+    def test_prerequisites_are_checked(self):
+        self.assertTrue(self.get_form(self.c, [self.a, self.b]).is_valid())
+
+        other = create_collaboration(self.collaboration.related_group, name="Other")
+        other_task = CollaborationTask.objects.create(collaboration=other, name="d")
+        form = self.get_form(self.c, [other_task])
+        self.assertFalse(form.is_valid())
+        self.assertIn("prerequisites", form.errors)
+
+    def test_saving_prerequisites_bumps_the_elements_version(self):
+        # The graph is cached at the current version, as it would be by the collaboration page
+        self.assertEqual(self.collaboration.task_graph.prerequisites[self.c.pk], set())
+        version = self.collaboration.elements_version
+        self.login_admin()
+
+        response = self.post_prerequisites(self.c, [self.a, self.b])
+
+        self.assertEqual(response.status_code, 302)
+        collaboration = Collaboration.objects.get(pk=self.collaboration.pk)
+        self.assertGreater(collaboration.elements_version, version)
+        self.assertEqual(
+            collaboration.task_graph.prerequisites[self.c.pk], {self.a.pk, self.b.pk}
+        )
+
+    def test_cycles_are_rolled_back(self):
+        version = self.collaboration.elements_version
+        self.login_admin()
+
+        # a can't depend on b, which depends on a - the change is undone, and the form shown again with the error
+        url = reverse("admin:collaborations_collaborationtask_change", args=[self.a.pk])
+        response = self.post_prerequisites(self.a, [self.b])
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertContains(
+            self.client.get(url), "These prerequisites would make &#x27;a&#x27; depend"
+        )
+
+        self.assertEqual(set(self.a.prerequisites.all()), set())
+        self.collaboration.refresh_from_db()
+        self.assertEqual(self.collaboration.elements_version, version)
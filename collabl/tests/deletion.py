@@ -0,0 +1,190 @@
+from datetime import datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import collaborations.constants as collaboration_constants
+import groups.constants as c
+from chat.models import Message, MessageArchive
+from collabl.deletion import (
+    get_deletion_progress,
+    tombstone_collaboration,
+    tombstone_group,
+)
+from collabl.tasks import purge_group
+from collaborations.models import (
+    Collaboration,
+    CollaborationMilestone,
+    CollaborationTask,
+)
+from groups.models import Group, GroupAnnouncement, GroupStats, Membership
+
+from .utils import (
+    create_collaboration,
+    create_group,
+    create_user,
+    local_caches,
+    use_temporary_media,
+)
+
+
+@local_caches
+@override_settings(DELETION_BATCH_SIZE=2)
+class GroupDeletionTest(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+
+        # A group with a collaboration, chats (and their archives), an announcement and memberships
+        self.user = create_user()
+        self.group = create_group(
+            self.user, profile_image=ContentFile(b"image", name="profile.png")
+        )
+        self.collaboration = create_collaboration(
+            self.group, image=ContentFile(b"image", name="collaboration.png")
+        )
+        for index in range(3):
+            CollaborationTask.objects.create(
+                collaboration=self.collaboration,
+                name=f"Task {index}",
+                file=ContentFile(b"file", name=f"task-{index}.txt"),
+            )
+        CollaborationMilestone.objects.create(
+            collaboration=self.collaboration, name="Milestone"
+        )
+        for index in range(3):
+            Message.objects.create(
+                user=self.user, group=self.group, message=f"Group {index}"
+            )
+            Message.objects.create(
+                user=self.user,
+                collaboration=self.collaboration,
+                message=f"Collaboration {index}",
+            )
+        for month in (1, 2):
+            MessageArchive.objects.create(
+                group=self.group,
+                month=datetime(2021, month, 1, tzinfo=timezone.utc),
+                file=ContentFile(b"archive", name=f"group-{month}.jsonl.gz"),
+            )
+            MessageArchive.objects.create(
+                collaboration=self.collaboration,
+                month=datetime(2021, month, 1, tzinfo=timezone.utc),
+                file=ContentFile(b"archive", name=f"collaboration-{month}.jsonl.gz"),
+            )
+        GroupAnnouncement.objects.create(
+            user=self.user, group=self.group, title="Welcome", body="Hello"
+        )
+        for index in range(3):
+            Membership.objects.create(
+                user=create_user(email=f"member-{index}@test.com"),
+                group=self.group,
+                status=c.MEMBERSHIP_STATUS_CURRENT,
+            )
+
+    def get_files(self) -> list:
+        """Gets the names of the files referenced by the group's tasks & chat archives"""
+        return [
+            *CollaborationTask.objects.filter(
+                collaboration__related_group=self.group
+            ).values_list("file", flat=True),
+            *MessageArchive.objects.filter(group=self.group).values_list(
+                "file", flat=True
+            ),
+            *MessageArchive.objects.filter(
+                collaboration__related_group=self.group
+            ).values_list("file", flat=True),
+        ]
+
+    def assertGroupDeleted(self):
+        for queryset in (
+            Group.objects.filter(pk=self.group.pk),
+            GroupStats.objects.filter(group_id=self.group.pk),
+            GroupAnnouncement.objects.filter(group_id=self.group.pk),
+            Membership.objects.filter(group_id=self.group.pk),
+            Collaboration.objects.filter(related_group_id=self.group.pk),
+            CollaborationTask.objects.filter(collaboration_id=self.collaboration.pk),
+            CollaborationMilestone.objects.filter(
+                collaboration_id=self.collaboration.pk
+            ),
+            Message.objects.filter(group_id=self.group.pk),
+            Message.objects.filter(collaboration_id=self.collaboration.pk),
+            MessageArchive.objects.filter(group_id=self.group.pk),
+            MessageArchive.objects.filter(collaboration_id=self.collaboration.pk),
+        ):
+            self.assertFalse(queryset.exists(), queryset.model._meta.label)
+
+    def test_delete_group(self):
+        files = self.get_files()
+        images = [self.group.profile_image.name, self.collaboration.image.name]
+        self.assertEqual(len(files), 7)
+
+        tombstone_group(self.group)
+        self.assertFalse(Group.alive_objects.filter(pk=self.group.pk).exists())
+        self.assertFalse(
+            Collaboration.alive_objects.filter(pk=self.collaboration.pk).exists()
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = purge_group(self.group.pk)
+            self.assertGroupDeleted()
+            # The rows' files are only deleted once the batches are committed
+            for name in files:
+                self.assertTrue(default_storage.exists(name), name)
+
+        for name in files + images:
+            self.assertFalse(default_storage.exists(name), name)
+
+        # Every row deleted in a batch is counted towards the progress (all but the collaboration & group rows)
+        self.assertEqual(get_deletion_progress(self.group), deleted - 2)
+
+    def test_second_run_is_a_no_op(self):
+        tombstone_group(self.group)
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_group(self.group.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(purge_group(self.group.pk), 0)
+        self.assertEqual(callbacks, [])
+        self.assertGroupDeleted()
+
+    def test_alive_groups_are_left_alone(self):
+        files = self.get_files()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(purge_group(self.group.pk), 0)
+
+        self.assertTrue(Group.alive_objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(
+            Collaboration.alive_objects.filter(related_group=self.group).count(), 1
+        )
+        self.assertEqual(Membership.objects.filter(group=self.group).count(), 3)
+        self.assertEqual(Message.objects.filter(group=self.group).count(), 3)
+        for name in files:
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_deleted_collaborations_elements_are_not_found(self):
+        task = CollaborationTask.objects.filter(collaboration=self.collaboration)[0]
+        milestone = CollaborationMilestone.objects.get(collaboration=self.collaboration)
+        Membership.objects.create(
+            user=self.user, group=self.group, status=c.MEMBERSHIP_STATUS_ADMIN
+        )
+        tombstone_collaboration(self.collaboration)
+        self.client.force_login(self.user)
+
+        slug = self.collaboration.slug
+        for url in (
+            reverse(
+                "collaboration-task-toggle",
+                args=[slug, task.pk, collaboration_constants.COMPLETE_TASK],
+            ),
+            reverse("collaboration-task-delete", args=[slug, task.pk]),
+            reverse("collaboration-milestone-update", args=[slug, milestone.pk]),
+            reverse("collaboration-milestone-delete", args=[slug, milestone.pk]),
+        ):
+            self.assertEqual(self.client.post(url).status_code, 404, url)
+
+        task.refresh_from_db()
+        self.assertIsNone(task.completed_at)
+        self.assertTrue(CollaborationMilestone.objects.filter(pk=milestone.pk).exists())
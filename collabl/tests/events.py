@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from django.test import override_settings
+
+from collabl.events import (
+    EVENT_CHAT,
+    EVENT_ELEMENTS,
+    Hub,
+    MemoryBackend,
+    RedisBackend,
+    group_channel,
+    send_events,
+)
+
+
+class EventHubTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.hub = Hub()
+        self.backend = MemoryBackend(self.hub)
+
+    async def test_events_reach_every_stream_on_the_channel(self):
+        first = self.hub.subscribe(group_channel(1))
+        second = self.hub.subscribe(group_channel(1))
+        other = self.hub.subscribe(group_channel(2))
+
+        # Published from another thread, as the Redis listener does
+        thread = threading.Thread(
+            target=self.backend.publish, args=(group_channel(1), EVENT_CHAT)
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await asyncio.wait_for(first.get(), 1), EVENT_CHAT)
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), EVENT_CHAT)
+        self.assertTrue(other.empty())
+
+    async def test_unsubscribed_streams_are_forgotten(self):
+        queue = self.hub.subscribe(group_channel(1))
+        self.hub.unsubscribe(group_channel(1), queue)
+        self.backend.publish(group_channel(1), EVENT_CHAT)
+        await asyncio.sleep(0)
+        self.assertTrue(queue.empty())
+        self.assertEqual(self.hub.streams, {})
+
+
+class EventStreamTest(IsolatedAsyncioTestCase):
+    @override_settings(EVENTS_KEEPALIVE_SECONDS=0.05)
+    async def test_events_after_keepalives_are_sent(self):
+        queue, disconnected, sent = asyncio.Queue(), asyncio.Future(), []
+
+        async def send(message):
+            sent.append(message["body"].decode())
+
+        stream = asyncio.ensure_future(send_events(queue, disconnected, send))
+
+        # Sit idle for a few keepalives, then publish
+        await asyncio.sleep(0.18)
+        queue.put_nowait(EVENT_CHAT)
+        queue.put_nowait(EVENT_ELEMENTS)
+        await asyncio.sleep(0.02)
+        disconnected.set_result(None)
+        await asyncio.wait_for(stream, 1)
+
+        self.assertGreaterEqual(sent.count(": keepalive\n\n"), 2)
+        self.assertEqual(
+            [body.split("\n")[0] for body in sent if body.startswith("event:")],
+            [f"event: {EVENT_CHAT}", f"event: {EVENT_ELEMENTS}"],
+        )
+        self.assertTrue(queue.empty())
+
+
+class RedisBackendTest(TestCase):
+    @override_settings(EVENTS_REDIS_TIMEOUT_SECONDS=2)
+    def test_only_publishing_times_out(self):
+        backend = RedisBackend(Hub(), "redis://localhost:6379/0")
+        publishing = backend.client.connection_pool.connection_kwargs
+        subscribing = backend.subscriber.connection_pool.connection_kwargs
+
+        self.assertEqual(publishing["socket_timeout"], 2)
+        self.assertEqual(publishing["socket_connect_timeout"], 2)
+        # The subscription waits for events indefinitely, on its own connections
+        self.assertIsNone(subscribing.get("socket_timeout"))
+        self.assertEqual(subscribing["socket_connect_timeout"], 2)
+        self.assertIsNot(
+            backend.subscriber.connection_pool, backend.client.connection_pool
+        )
@@ -0,0 +1,415 @@
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import groups.constants as c
+from chat.models import Message
+from groups.models import Group, GroupStats, Membership
+from groups.selection import count_selected, get_job_key, process_selection
+from groups.utils import (
+    get_group_search_page,
+    normalise_group_query,
+    parse_group_cursor,
+    reconcile_group_stats,
+)
+from users.models import User
+from users.permissions import (
+    forget_membership_levels,
+    get_generation,
+    get_level_key,
+    request_levels,
+    resolve_membership_level,
+)
+
+from .utils import (
+    create_group,
+    create_user,
+    local_caches,
+    use_memory_events,
+    use_temporary_media,
+)
+
+
+class GroupStatsTest(TestCase):
+    def test_every_status_is_counted(self):
+        self.assertEqual(
+            set(GroupStats.STATUS_FIELDS),
+            {status for status, _ in c.MEMBERSHIP_STATUS_CHOICES},
+        )
+
+    def test_membership_stats(self):
+        membership = Membership(status=c.MEMBERSHIP_STATUS_ADMIN, is_subscribed=True)
+        self.assertEqual(
+            membership.get_stats(), Counter(admin_count=1, subscriber_count=1)
+        )
+
+        # Moving from pending to current takes one off pending, and adds one to current
+        stats = Membership(status=c.MEMBERSHIP_STATUS_CURRENT).get_stats()
+        stats.subtract(Membership(status=c.MEMBERSHIP_STATUS_PENDING).get_stats())
+        self.assertEqual(
+            {field: change for field, change in stats.items() if change},
+            {"member_count": 1, "pending_count": -1},
+        )
+
+
+@local_caches
+class MembershipStatsTest(TransactionTestCase):
+    def setUp(self):
+        self.group = create_group(create_user())
+        self.users = [
+            create_user(email=f"member-{index}@test.com") for index in range(3)
+        ]
+
+    def assertStats(self, **expected):
+        stats = GroupStats.objects.get(group=self.group)
+        self.assertEqual(
+            {field: getattr(stats, field) for field in GroupStats.MEMBERSHIP_FIELDS},
+            {field: expected.get(field, 0) for field in GroupStats.MEMBERSHIP_FIELDS},
+        )
+
+    def test_memberships_adjust_the_stats(self):
+        membership = Membership.objects.create(
+            user=self.users[0], group=self.group, status=c.MEMBERSHIP_STATUS_PENDING
+        )
+        self.assertStats(pending_count=1)
+
+        membership.status = c.MEMBERSHIP_STATUS_CURRENT
+        membership.is_subscribed = True
+        membership.save()
+        self.assertStats(member_count=1, subscriber_count=1)
+
+        membership = Membership.objects.get(pk=membership.pk)
+        membership.status = c.MEMBERSHIP_STATUS_ADMIN
+        membership.save()
+        self.assertStats(admin_count=1, subscriber_count=1)
+
+        # What a membership loaded without its status added isn't known, so its group is recounted instead
+        membership = Membership.objects.defer("status").get(pk=membership.pk)
+        membership.status = c.MEMBERSHIP_STATUS_IGNORED
+        membership.save()
+        self.assertStats(ignored_count=1, subscriber_count=1)
+
+        Membership.objects.get(pk=membership.pk).delete()
+        self.assertStats()
+
+    def test_bulk_changes_recount_the_stats(self):
+        for user in self.users:
+            Membership.objects.create(
+                user=user, group=self.group, status=c.MEMBERSHIP_STATUS_PENDING
+            )
+        self.assertStats(pending_count=3)
+
+        Membership.objects.filter(group=self.group).update(
+            status=c.MEMBERSHIP_STATUS_CURRENT, is_subscribed=True
+        )
+        self.assertStats(member_count=3, subscriber_count=3)
+
+        Membership.objects.filter(user=self.users[0]).delete()
+        self.assertStats(member_count=2, subscriber_count=2)
+
+        # Drift (e.g. from writes which skip the models) is repaired by reconciling
+        GroupStats.objects.filter(group=self.group).update(member_count=0)
+        self.assertEqual(reconcile_group_stats(Group.objects.all()), 1)
+        self.assertStats(member_count=2, subscriber_count=2)
+
+
+class GroupCardTest(TestCase):
+    def test_cards_are_loaded_in_one_query(self):
+        query = Group.alive_objects.as_cards(User(id=uuid.uuid4())).query
+        self.assertEqual(
+            set(query.annotations),
+            {"membership_level", "announcement_count", "collaboration_count"},
+        )
+        self.assertEqual(query.select_related, {"stats": {}})
+
+        # Only the columns the card shows are loaded
+        fields, defer = query.deferred_loading
+        self.assertFalse(defer)
+        self.assertIn("profile_image", fields)
+        self.assertNotIn("chat_version", fields)
+
+
+@local_caches
+class GroupListQueryTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+        use_temporary_media(self)
+
+        self.user = create_user()
+        self.client.force_login(self.user)
+        self.group_count = 0
+        self.add_groups(1)
+
+    def add_groups(self, count) -> None:
+        """Adds groups the user is a member of, each with an unread message"""
+        self.group_count += count
+        for _ in range(count):
+            group = create_group(self.user, name=f"Group {uuid.uuid4()}")
+            Membership.objects.create(
+                user=self.user, group=group, status=c.MEMBERSHIP_STATUS_CURRENT
+            )
+            Message.objects.create(
+                user=create_user(email=f"{uuid.uuid4()}@test.com"),
+                group=group,
+                message="Hello",
+            )
+
+    def count_queries(self) -> dict:
+        """Counts the queries made by the full page, and by the htmx list, with nothing cached beforehand"""
+        counts = {}
+        for name, headers in (
+            ("page", {}),
+            ("list", {"HTTP_HX_REQUEST": "true", "HTTP_HX_TARGET": "list_of_groups"}),
+        ):
+            for cache in ("default", "counters", "permissions"):
+                caches[cache].clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("user-group-list"), **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["groups"]), self.group_count)
+            counts[name] = len(queries)
+        return counts
+
+    def test_query_count_is_fixed(self):
+        counts = self.count_queries()
+
+        # However many groups are listed, the cards (and their unread counts) take the same queries
+        self.add_groups(4)
+        self.assertEqual(self.count_queries(), counts)
+
+
+class MembershipSelectionTest(TestCase):
+    def test_count_selected(self):
+        group = SimpleNamespace(stats=GroupStats(pending_count=1000))
+        deselected = {uuid.uuid4(), uuid.uuid4()}
+
+        # Selecting all counts every matching membership, less any deselected since
+        self.assertEqual(
+            count_selected((True, deselected), group, c.MEMBERSHIP_STATUS_PENDING), 998
+        )
+        self.assertEqual(
+            count_selected((False, deselected), group, c.MEMBERSHIP_STATUS_PENDING), 2
+        )
+        self.assertEqual(
+            count_selected((False, set()), group, c.MEMBERSHIP_STATUS_PENDING), 0
+        )
+
+
+@local_caches
+@mock.patch("groups.constants.MEMBERSHIP_BULK_CHUNK_SIZE", 2)
+class MembershipProcessingTest(TransactionTestCase):
+    def setUp(self):
+        # The job's progress is reported to Redis
+        patcher = mock.patch("groups.selection.client")
+        self.client_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # An admin, a current member, and five pending requests
+        self.admin = create_user()
+        self.group = create_group(self.admin)
+        Membership.objects.create(
+            user=self.admin, group=self.group, status=c.MEMBERSHIP_STATUS_ADMIN
+        )
+        self.member = Membership.objects.create(
+            user=create_user(email="member@test.com"),
+            group=self.group,
+            status=c.MEMBERSHIP_STATUS_CURRENT,
+        )
+        self.pending = [
+            Membership.objects.create(
+                user=create_user(email=f"pending-{index}@test.com"),
+                group=self.group,
+                status=c.MEMBERSHIP_STATUS_PENDING,
+            )
+            for index in range(5)
+        ]
+
+    def process(self, action, all_selected, membership_ids) -> int:
+        return process_selection(
+            "job",
+            self.group.pk,
+            self.admin.pk,
+            action,
+            c.MEMBERSHIP_STATUS_PENDING,
+            all_selected,
+            membership_ids,
+        )
+
+    def get_statuses(self) -> dict:
+        return dict(
+            Membership.objects.filter(group=self.group).values_list("pk", "status")
+        )
+
+    def test_all_selected_less_those_deselected(self):
+        deselected = {self.pending[1].pk, self.pending[3].pk}
+        self.assertEqual(self.process(c.MEMBERSHIP_ACTION_APPROVE, True, deselected), 3)
+
+        statuses = self.get_statuses()
+        for membership in self.pending:
+            self.assertEqual(
+                statuses[membership.pk],
+                c.MEMBERSHIP_STATUS_PENDING
+                if membership.pk in deselected
+                else c.MEMBERSHIP_STATUS_CURRENT,
+            )
+        self.assertEqual(statuses[self.member.pk], c.MEMBERSHIP_STATUS_CURRENT)
+        self.assertEqual(
+            set(
+                Membership.objects.filter(updated_by=self.admin).values_list(
+                    "pk", flat=True
+                )
+            ),
+            {membership.pk for membership in self.pending} - deselected,
+        )
+
+        # The stats are kept in step, and progress reported chunk by chunk
+        stats = GroupStats.objects.get(group=self.group)
+        self.assertEqual(
+            (stats.admin_count, stats.member_count, stats.pending_count), (1, 4, 2)
+        )
+        self.assertEqual(
+            [call.args for call in self.client_mock.hincrby.call_args_list],
+            [(get_job_key("job"), "done", 2), (get_job_key("job"), "done", 1)],
+        )
+        self.client_mock.hset.assert_called_with(get_job_key("job"), "finished", 1)
+
+        # Running the job again finds nothing left to do
+        self.assertEqual(self.process(c.MEMBERSHIP_ACTION_APPROVE, True, deselected), 0)
+
+    def test_only_matching_memberships_are_processed(self):
+        # The current member doesn't match the pending filter, so is left alone
+        selected = {self.pending[0].pk, self.member.pk}
+        self.assertEqual(self.process(c.MEMBERSHIP_ACTION_REMOVE, False, selected), 1)
+
+        statuses = self.get_statuses()
+        self.assertNotIn(self.pending[0].pk, statuses)
+        self.assertEqual(statuses[self.member.pk], c.MEMBERSHIP_STATUS_CURRENT)
+        self.assertEqual(len(statuses), 6)
+
+
+@local_caches
+@mock.patch("groups.constants.GROUP_SEARCH_PAGE_SIZE", 2)
+class GroupSearchTest(TransactionTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+        # Groups with the same name & description (so the same rank), some of which the user already belongs to
+        self.user, other_user = create_user(), create_user(email="other@test.com")
+        self.groups = [
+            create_group(other_user, name="Riverdale Bake Sale") for _ in range(7)
+        ]
+        for group, status in zip(
+            self.groups,
+            (
+                c.MEMBERSHIP_STATUS_ADMIN,
+                c.MEMBERSHIP_STATUS_CURRENT,
+                c.MEMBERSHIP_STATUS_PENDING,
+                c.MEMBERSHIP_STATUS_IGNORED,
+            ),
+        ):
+            Membership.objects.create(user=self.user, group=group, status=status)
+        self.joinable = self.groups[3:]
+        self.chess_club = create_group(other_user, name="Chess Club")
+
+        # Groups created at the same moment are listed by id
+        Group.objects.filter(pk__in=[group.pk for group in self.joinable]).update(
+            created_at=self.joinable[0].created_at
+        )
+
+    def get_all_pages(self, query_string) -> list:
+        """Follows the cursors through every page of groups"""
+        pages, cursor = [], None
+        while True:
+            page = get_group_search_page(self.user, query_string, after=cursor)
+            pages.append(page["groups"])
+            if not (cursor := page["next_cursor"]):
+                return pages
+
+    def test_search_leaves_out_own_groups(self):
+        pages = self.get_all_pages("  bake SALE ")
+
+        # Ignored requests aren't the user's own groups, so can be found again
+        self.assertEqual([len(page) for page in pages], [2, 2])
+        self.assertEqual(
+            [group for page in pages for group in page],
+            sorted(self.joinable, key=lambda group: group.pk),
+        )
+
+    def test_listing_leaves_out_own_groups(self):
+        pages = self.get_all_pages("")
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [group for page in pages for group in page],
+            [*sorted(self.joinable, key=lambda group: group.pk), self.chess_club],
+        )
+
+    def test_normalise_group_query(self):
+        self.assertEqual(normalise_group_query("  Bake\tSALE  "), "bake sale")
+        self.assertEqual(
+            len(normalise_group_query("x" * 100)), c.GROUP_SEARCH_MAX_LENGTH
+        )
+
+    def test_invalid_cursor(self):
+        for cursor, ranked in (
+            ("nonsense", True),
+            ("0.5~not-a-uuid", True),
+            ("0.5~" + str(uuid.uuid4()), False),
+        ):
+            with self.assertRaises(ValueError):
+                parse_group_cursor(cursor, ranked)
+
+
+@override_settings(
+    CACHES={"permissions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class MembershipLevelTest(SimpleTestCase):
+    def test_levels_are_memoised_for_the_request(self):
+        user, group = SimpleNamespace(pk=uuid.uuid4()), SimpleNamespace(pk=uuid.uuid4())
+        key = get_level_key(user.pk, group.pk, get_generation(group.pk))
+        caches["permissions"].set(key, c.MEMBERSHIP_STATUS_ADMIN)
+
+        token = request_levels.set({})
+        try:
+            self.assertEqual(
+                resolve_membership_level(user, group), c.MEMBERSHIP_STATUS_ADMIN
+            )
+            # The rest of the request sees the same level, without going back to the cache
+            caches["permissions"].delete(key)
+            self.assertEqual(
+                resolve_membership_level(user, group), c.MEMBERSHIP_STATUS_ADMIN
+            )
+        finally:
+            request_levels.reset(token)
+
+    def test_non_members_are_cached(self):
+        user, group = SimpleNamespace(pk=uuid.uuid4()), SimpleNamespace(pk=uuid.uuid4())
+        caches["permissions"].set(
+            get_level_key(user.pk, group.pk, get_generation(group.pk)), ""
+        )
+        self.assertIsNone(resolve_membership_level(user, group))
+
+    def test_levels_resolved_before_a_change_are_never_read(self):
+        user, group = SimpleNamespace(pk=uuid.uuid4()), SimpleNamespace(pk=uuid.uuid4())
+        generation = get_generation(group.pk)
+
+        # Forgetting the level moves the group on to a new generation, once the change commits
+        with mock.patch("users.permissions.transaction.on_commit", lambda func: func()):
+            forget_membership_levels([(user.pk, group.pk)])
+        self.assertNotEqual(get_generation(group.pk), generation)
+
+        # So a level resolved before the change, but cached after it, is left alone
+        caches["permissions"].set(
+            get_level_key(user.pk, group.pk, generation), c.MEMBERSHIP_STATUS_ADMIN
+        )
+        caches["permissions"].set(
+            get_level_key(user.pk, group.pk, get_generation(group.pk)), ""
+        )
+        self.assertIsNone(resolve_membership_level(user, group))
@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from chat.models import Message, MessageArchive
+from collabl.purge import get_file_fields, get_soft_delete_models
+from collaborations.models import Collaboration, CollaborationTask
+from groups.models import Group, Membership
+
+
+class PurgeTest(TestCase):
+    def test_soft_delete_models(self):
+        soft_delete_models = get_soft_delete_models()
+        self.assertIn(Message, soft_delete_models)
+        self.assertIn(Membership, soft_delete_models)
+
+        # Groups & collaborations are deleted through collabl.deletion, rather than cascading
+        self.assertNotIn(Group, soft_delete_models)
+        self.assertNotIn(Collaboration, soft_delete_models)
+
+    def test_file_fields(self):
+        self.assertEqual(get_file_fields(CollaborationTask), ["file"])
+        self.assertEqual(get_file_fields(MessageArchive), ["file"])
+        self.assertEqual(get_file_fields(Membership), [])
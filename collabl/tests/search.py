@@ -0,0 +1,97 @@
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from chat.models import Message
+from collaborations.models import CollaborationTask
+from groups.constants import MEMBERSHIP_STATUS_ADMIN, MEMBERSHIP_STATUS_PENDING
+from groups.models import Membership
+from search.utils import get_search_results, parse_search_cursor
+
+from .utils import (
+    create_collaboration,
+    create_group,
+    create_user,
+    local_caches,
+    use_memory_events,
+)
+
+
+@local_caches
+class SearchResultsTest(TransactionTestCase):
+    def setUp(self):
+        use_memory_events(self)
+
+        self.user = create_user()
+        group = create_group(self.user)
+        Membership.objects.create(
+            user=self.user, group=group, status=MEMBERSHIP_STATUS_ADMIN
+        )
+
+        # Matching messages with the same text (so the same rank), and a collaboration & tasks with the same name -
+        # ties within a kind, and across kinds
+        for _ in range(5):
+            Message.objects.create(user=self.user, group=group, message="Bake sale")
+        collaboration = create_collaboration(group, name="Bake sale")
+        for _ in range(3):
+            CollaborationTask.objects.create(
+                collaboration=collaboration, name="Bake sale"
+            )
+        Message.objects.create(user=self.user, group=group, message="Fun run")
+
+        # Groups the user isn't an active member of aren't searched
+        other_user = create_user(email="other@test.com")
+        self.other_group = create_group(other_user, name="Other group")
+        Membership.objects.create(
+            user=self.user, group=self.other_group, status=MEMBERSHIP_STATUS_PENDING
+        )
+        Message.objects.create(
+            user=other_user, group=self.other_group, message="Bake sale"
+        )
+
+    def get_all_pages(self, query_string) -> list:
+        """Follows the cursors through every page of results"""
+        pages, cursor = [], None
+        while True:
+            page = get_search_results(self.user, query_string, after=cursor)
+            pages.append(page["results"])
+            if not (cursor := page["next_cursor"]):
+                return pages
+
+    def test_pages_through_ties_in_rank(self):
+        with mock.patch("search.constants.SEARCH_PAGE_SIZE", 100):
+            (expected,) = self.get_all_pages("bake sale")
+        self.assertEqual(len(expected), 9)
+        self.assertEqual(
+            [(-result["rank"], result["kind"], result["id"]) for result in expected],
+            sorted(
+                (-result["rank"], result["kind"], result["id"]) for result in expected
+            ),
+        )
+
+        # Each page starts where the last left off, whether or not the cursor falls amongst results of equal rank
+        with mock.patch("search.constants.SEARCH_PAGE_SIZE", 2):
+            pages = self.get_all_pages("bake sale")
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 2, 1])
+        self.assertEqual([result for page in pages for result in page], expected)
+
+    def test_other_groups_are_left_out(self):
+        results = get_search_results(self.user, "bake sale")["results"]
+        self.assertEqual(len(results), 9)
+        self.assertNotIn(
+            self.other_group.slug, {result["group_slug"] for result in results}
+        )
+
+        page = get_search_results(self.user, "fun run")
+        self.assertEqual([result["content"] for result in page["results"]], ["Fun run"])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_invalid_cursor(self):
+        for cursor in (
+            "nonsense",
+            f"0.5~nonsense~{uuid.uuid4()}",
+            "0.5~message~not-a-uuid",
+        ):
+            with self.assertRaises(ValueError):
+                parse_search_cursor(cursor)
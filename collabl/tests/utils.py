@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+
+from collabl.events import Hub, MemoryBackend
+from collaborations.models import Collaboration
+from groups.models import Group
+from users.models import User
+
+"""
+Helpers shared by the tests which need a database.
+"""
+
+# The Redis backed caches are swapped for local memory ones, so the tests only need the database
+local_caches = override_settings(
+    CACHES={
+        name: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": name,
+        }
+        for name in ("default", "fragments", "counters", "permissions")
+    }
+)
+
+
+def use_memory_events(test) -> None:
+    """Publishes a test's events in-process (see collabl.events.MemoryBackend), rather than to Redis"""
+    patcher = mock.patch("collabl.events.backend", MemoryBackend(Hub()))
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+def use_temporary_media(test) -> None:
+    """Stores a test's files on the local file system, in a directory which is removed afterwards"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    media_settings = override_settings(
+        DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+        MEDIA_ROOT=media_root,
+    )
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+
+
+def create_user(email="test@test.com", first_name="test-user"):
+    return User.objects.create(
+        first_name=first_name, last_name="test-user", email=email
+    )
+
+
+def create_group(user, name="Riverdale Parents Group", **kwargs):
+    return Group.objects.create(
+        name=name, description="A group for testing", created_by=user, **kwargs
+    )
+
+
+def create_collaboration(group, name="Charity Bake Sale", **kwargs):
+    return Collaboration.objects.create(
+        name=name, related_group=group, created_by=group.created_by, **kwargs
+    )
@@ -0,0 +1,101 @@
+import contextvars
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+import groups.constants as c
+
+"""
+Resolves users' membership levels of groups (see groups.utils.get_membership_level), which every permission check is
+made from. A resolved level is:
+    - memoised for the rest of the request (see MembershipLevelMiddleware), so checking the same group again (e.g.
+      user_has_active_membership, then get_membership_level for the template) is free
+    - cached across requests in the "permissions" cache (Redis, shared by every web node), so most requests don't
+      query memberships at all
+Both are dropped as memberships change (see forget_membership_levels, called by groups.models.Membership and its
+querysets), so a permission check costs at most one query per request.
+Cached levels are keyed on their group's generation, which is replaced once a change to its memberships commits. A
+level resolved from the memberships as they were before the change is then cached under the old generation, where it
+is never read - rather than landing after the change has dropped it, and being served until it expires.
+"""
+
+# Cached for users who aren't members of a group, so they aren't looked up again either
+NO_MEMBERSHIP = ""
+
+# The levels resolved during the current request, by (user id, group id) (None outside of a request)
+request_levels = contextvars.ContextVar("request_levels", default=None)
+
+
+def get_generation_key(group_id) -> str:
+    return f"membership-level:{group_id}:generation"
+
+
+def get_level_key(user_id, group_id, generation) -> str:
+    return f"membership-level:{group_id}:{generation}:{user_id}"
+
+
+def get_generation(group_id) -> str:
+    """Returns the group's current generation of cached levels, starting one if it hasn't got one"""
+    cache, key = caches["permissions"], get_generation_key(group_id)
+    if (generation := cache.get(key)) is None:
+        generation = uuid.uuid4().hex
+        # Another request may have just started one
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def resolve_membership_level(user, group) -> str | None:
+    """Returns the status of the user's membership of the group, or None if they aren't a member"""
+    memo_key, levels = (user.pk, group.pk), request_levels.get()
+    if levels is not None and memo_key in levels:
+        return levels[memo_key]
+
+    # The generation is read before the memberships, so a level read before a change commits is cached where it's
+    # never read again
+    generation = get_generation(group.pk)
+    cache, key = caches["permissions"], get_level_key(user.pk, group.pk, generation)
+    if (level := cache.get(key)) is None:
+        level = (
+            group.memberships.filter(user=user).values_list("status", flat=True).first()
+            or NO_MEMBERSHIP
+        )
+        cache.set(key, level, timeout=c.MEMBERSHIP_LEVEL_CACHE_SECONDS)
+
+    level = level or None
+    if levels is not None:
+        levels[memo_key] = level
+    return level
+
+
+def forget_membership_levels(memberships) -> None:
+    """
+    Drops the resolved levels of the given (user_id, group_id) pairs - straight away for this request, and from the
+    cache (by replacing the generation of every group given) once the transaction changing them commits
+    """
+    memberships = list(memberships)
+    if levels := request_levels.get():
+        for membership in memberships:
+            levels.pop(membership, None)
+
+    generations = {
+        get_generation_key(group_id): uuid.uuid4().hex for _, group_id in memberships
+    }
+    transaction.on_commit(
+        lambda: caches["permissions"].set_many(generations, timeout=None)
+    )
+
+
+class MembershipLevelMiddleware:
+    """Gives each request its own memo of resolved membership levels (see resolve_membership_level)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request_levels.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            request_levels.reset(token)
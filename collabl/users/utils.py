@@ -1,9 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from six import text_type
-from django.db.models import Count, When, Case, IntegerField
 from collaborations.models import Collaboration
-import collaborations.constants as collaboration_constants
 from groups.constants import MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN
 
 """
@@ -34,47 +32,15 @@ def get_users_filtered_collaborations(user, collaboration_list_filter):
         status__in=[MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN],
     ).values_list("group", flat=True)
 
-    # Annotate the user's groups' collaborations with the number of complete/incomplete tasks,
-    unfiltered_collaborations = (
-        Collaboration.objects.filter(
-            related_group__in=active_memberships,
-        )
-        .annotate(
-            tasks_complete=Count(
-                Case(
-                    When(tasks__completed_at__isnull=False, then=1),
-                    output_field=IntegerField(),
-                )
-            ),
-            tasks_incomplete=Count(
-                Case(
-                    When(tasks__completed_at__isnull=True, then=1),
-                    output_field=IntegerField(),
-                )
-            ),
-        )
+    # Annotate the user's groups' collaborations with their progress, and filter them by status
+    return (
+        Collaboration.alive_objects.filter(related_group__in=active_memberships)
+        .with_progress()
+        .by_status(collaboration_list_filter)
+        .select_related("related_group")
         .order_by("-created_at")
     )
 
-    # Filter the collaborations, depending on the filter parameter chosen
-    match collaboration_list_filter:
-        case collaboration_constants.COLLABORATION_STATUS_ALL:
-            collaborations = unfiltered_collaborations
-        case collaboration_constants.COLLABORATION_STATUS_PLANNING:
-            collaborations = unfiltered_collaborations.filter(tasks_complete=0)
-        case collaboration_constants.COLLABORATION_STATUS_ONGOING:
-            collaborations = unfiltered_collaborations.filter(
-                tasks_incomplete__gt=0
-            ).exclude(tasks_complete=0)
-        case collaboration_constants.COLLABORATION_STATUS_COMPLETED:
-            collaborations = unfiltered_collaborations.filter(
-                tasks_incomplete=0
-            ).exclude(tasks_complete=0)
-        case _:
-            collaborations = Collaboration.objects.none()
-
-    return collaborations
-
 
 class ActivationTokenGenerator(PasswordResetTokenGenerator):
     def _make_hash_value(self, user_auth, timestamp):
@@ -9,6 +9,7 @@ from django.utils.http import urlsafe_base64_encode
 from django.views.decorators.http import require_http_methods
 from django.views.generic import UpdateView, ListView
 
+from chat.utils import get_unread_counts
 from users.models import User
 from users.utils import account_activation_token
 from collabl.tasks import send_email
@@ -147,13 +148,39 @@ class UserGroupListView(ListView):
             pending_memberships = Membership.objects.filter(
                 user=self.request.user, status=MEMBERSHIP_STATUS_PENDING
             ).values_list("group", flat=True)
-            return Group.objects.filter(pk__in=pending_memberships)
+            return Group.alive_objects.filter(pk__in=pending_memberships).as_cards(
+                self.request.user
+            )
         else:
             active_memberships = Membership.objects.filter(
                 user=self.request.user,
                 status__in=[MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN],
             ).values_list("group", flat=True)
-            return Group.objects.filter(pk__in=active_memberships)
+            return Group.alive_objects.filter(pk__in=active_memberships).as_cards(
+                self.request.user
+            )
+
+    def get_context_data(self, **kwargs):
+        """
+        We override get_context_data to add the user's unread chat count to each group (unless these are the groups
+        they are pending in, whose chats they can't read yet)
+        """
+        context = super(UserGroupListView, self).get_context_data(**kwargs)
+
+        if not self.request.GET.get("show_pending", None):
+            joined = dict(
+                Membership.objects.filter(
+                    user=self.request.user,
+                    status__in=[MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN],
+                ).values_list("group", "created_at")
+            )
+            unread_counts = get_unread_counts(
+                self.request.user, context["groups"], joined
+            )
+            for group in context["groups"]:
+                group.unread_count = unread_counts[group.pk]
+
+        return context
 
 
 @method_decorator(login_required, name="dispatch")
@@ -198,4 +225,34 @@ class UserCollaborationListView(ListView):
             status__in=[MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN],
         ).values_list("group", flat=True)
 
-        return Collaboration.objects.filter(related_group__in=active_memberships)
+        return (
+            Collaboration.alive_objects.filter(related_group__in=active_memberships)
+            .with_progress()
+            .select_related("related_group")
+        )
+
+    def get_context_data(self, **kwargs):
+        """
+        We override get_context_data to add the user's unread chat count to each collaboration
+        """
+        context = super(UserCollaborationListView, self).get_context_data(**kwargs)
+
+        joined = dict(
+            Membership.objects.filter(
+                user=self.request.user,
+                status__in=[MEMBERSHIP_STATUS_CURRENT, MEMBERSHIP_STATUS_ADMIN],
+            ).values_list("group", "created_at")
+        )
+        collaborations = context["collaboration_list"]
+        unread_counts = get_unread_counts(
+            self.request.user,
+            collaborations,
+            {
+                collaboration.pk: joined.get(collaboration.related_group_id)
+                for collaboration in collaborations
+            },
+        )
+        for collaboration in collaborations:
+            collaboration.unread_count = unread_counts[collaboration.pk]
+
+        return context